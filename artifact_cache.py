@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import downloader
+
+# 설정
+CACHE_DIR = os.environ.get("HARDWAY_ARTIFACT_CACHE", "/root/hardway/artifacts")  # Bastion 의 아티팩트 캐시
+INDEX_FILE = "index.json"
+OFFLINE = os.environ.get("HARDWAY_OFFLINE", "").lower() in ("1", "true", "yes")  # 인터넷에서 받지 않고 캐시만 사용
+MIRROR = os.environ.get("HARDWAY_ARTIFACT_MIRROR", "")  # 노드에서 사용할 캐시 주소 (예: http://172.31.1.1:8098)
+MIRROR_PORT = 8098
+CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_fetch_locks = {}
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[CACHE]: {message}", flush=True)
+
+
+# 캐시 키: 스킴을 뺀 URL (호스트/경로, 버전이 경로에 들어 있음)
+def cache_key(url):
+    key = url.split("://", 1)[-1]
+    if not key or key.startswith("/") or ".." in key.split("/"):
+        raise ValueError(f"잘못된 아티팩트 URL: {url}")
+    return key
+
+
+# 노드에서 내려받을 주소 (HARDWAY_ARTIFACT_MIRROR 가 있으면 Bastion 캐시로 바꿈)
+def mirror_url(url, mirror=MIRROR):
+    return f"{mirror.rstrip('/')}/{cache_key(url)}" if mirror else url
+
+
+def _index_path(cache_dir):
+    return os.path.join(cache_dir, INDEX_FILE)
+
+
+def load_index(cache_dir=CACHE_DIR):
+    try:
+        with open(_index_path(cache_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# 파일 잠금 (스레드와 프로세스 모두)
+# cert_create.ensure_kubectl 과 fanout 처럼 별도 프로세스가 같은 캐시를 동시에 채울 수 있습니다.
+@contextlib.contextmanager
+def _flocked(lock_path):
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+# 인덱스 항목 갱신 (잠금 안에서 읽고, 고유한 임시 파일에 쓴 뒤 rename 으로 교체)
+def _update_index(cache_dir, key, entry):
+    with _lock, _flocked(f"{_index_path(cache_dir)}.lock"):
+        index = load_index(cache_dir)
+        index[key] = entry
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{INDEX_FILE}.", dir=cache_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=2, sort_keys=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, _index_path(cache_dir))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 캐시에 있는 파일과 기록된 sha256 (크기가 기록과 다르면 없는 것으로 봅니다)
+def lookup(url, cache_dir=CACHE_DIR):
+    key = cache_key(url)
+    entry = load_index(cache_dir).get(key)
+    path = os.path.join(cache_dir, key)
+    if entry and os.path.exists(path) and os.path.getsize(path) == entry["size"]:
+        return path, entry["sha256"]
+    return None, None
+
+
+# 로컬 파일을 캐시에 등록 (오프라인 준비용)
+def add(url, src_path, cache_dir=CACHE_DIR):
+    key = cache_key(url)
+    path = os.path.join(cache_dir, key)
+    if os.path.abspath(src_path) != os.path.abspath(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(src_path, f"{path}.part")
+        os.replace(f"{path}.part", path)
+    sha256 = sha256_of(path)
+    _update_index(cache_dir, key, {"url": url, "sha256": sha256, "size": os.path.getsize(path),
+                                   "cached_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    return path, sha256
+
+
+# 아티팩트 가져오기 (캐시에 없을 때만 인터넷에서 한 번 내려받음)
+# 키마다 스레드 잠금과 <파일>.lock flock 을 잡으므로 다른 프로세스와도 같은 파일을 동시에 받지 않습니다.
+# offline 이면 캐시에 없는 아티팩트는 오류입니다.
+def fetch(url, cache_dir=CACHE_DIR, offline=OFFLINE):
+    key = cache_key(url)
+    with _lock:
+        fetch_lock = _fetch_locks.setdefault(key, threading.Lock())
+    with fetch_lock, _flocked(f"{os.path.join(cache_dir, key)}.lock"):
+        path, sha256 = lookup(url, cache_dir)
+        if path:
+            return path
+        if offline:
+            raise FileNotFoundError(f"오프라인 모드: 캐시에 없는 아티팩트입니다: {url}")
+        path = os.path.join(cache_dir, key)
+        log_message(f"⬇️ 다운로드 중: {url}")
+        downloader.download(url, path, mode=0o644)  # 이어받기, 공개된 sha256 확인
+        sha256 = sha256_of(path)
+        _update_index(cache_dir, key, {"url": url, "sha256": sha256, "size": os.path.getsize(path),
+                                       "cached_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        log_message(f"✅ 캐시 저장: {key} (sha256 {sha256[:16]})")
+        return path
+
+
+# 캐시 디렉토리 점검
+# 미리 복사해 둔 파일 중 기록이 없는 것은 등록하고, 기록과 내용이 다른 것은 알려줍니다.
+def verify(cache_dir=CACHE_DIR):
+    index = load_index(cache_dir)
+    broken = []
+    for root, _, files in os.walk(cache_dir):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            key = os.path.relpath(path, cache_dir)
+            if key == INDEX_FILE or file_name.startswith(f".{INDEX_FILE}.") or file_name.endswith(
+                    (".part", ".tmp", ".lock")):
+                continue
+            entry = index.get(key)
+            if entry is None:
+                add(f"https://{key}", path, cache_dir)
+                log_message(f"➕ 등록: {key}")
+            elif sha256_of(path) != entry["sha256"]:
+                broken.append(key)
+                log_message(f"❌ sha256 불일치: {key}")
+    return broken
+
+
+# 미러가 캐시에 없을 때 받아 줄 수 있는 URL (fanout 의 릴리스 아티팩트 목록)
+# fanout 이 이 모듈을 import 하므로 실행 시점에 import 합니다.
+def release_urls():
+    import fanout
+    return fanout.release_urls()
+
+
+# Range 헤더의 시작 위치 (bytes=N- 또는 bytes=N-M, 끝 위치는 무시하고 끝까지 보냅니다)
+# 형식이 틀리면 ValueError, bytes=-N (끝에서 N 바이트) 은 지원하지 않으므로 처음부터 보냅니다.
+def range_start(header):
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        raise ValueError(f"잘못된 Range 헤더: {header}")
+    return int(match.group(1)) if match.group(1) else 0
+
+
+def make_handler(cache_dir, offline, allowed_urls):
+    allowed = {cache_key(url): url for url in allowed_urls}
+
+    class MirrorHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            key = urllib.parse.unquote(self.path.lstrip("/"))
+            checksum = key.endswith(".sha256")
+            if checksum:
+                key = key[:-len(".sha256")]
+            # 인덱스에 있거나 알려진 릴리스 URL 만 받아 줍니다. (임의 URL 을 대신 받아 캐시를 채우지 않도록)
+            entry = load_index(cache_dir).get(key)
+            url = entry["url"] if entry else allowed.get(key)
+            if url is None:
+                return self.send_error(404, explain=f"미러에서 제공하지 않는 아티팩트입니다: {key}")
+            try:
+                path = fetch(url, cache_dir, offline)
+            except (ValueError, FileNotFoundError) as e:
+                return self.send_error(404, explain=str(e))
+            except OSError as e:
+                return self.send_error(502, explain=str(e))
+            _, sha256 = lookup(url, cache_dir)
+
+            if checksum:
+                body = f"{sha256}  {os.path.basename(key)}\n".encode("ascii")
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            # Range 요청은 이어받기용으로 시작 위치만 지원합니다. (bytes=N-)
+            size = os.path.getsize(path)
+            start = 0
+            if self.headers.get("Range") is not None:
+                try:
+                    start = range_start(self.headers["Range"])
+                except ValueError:
+                    return self.send_error(416)
+                if start >= size:
+                    return self.send_error(416)
+            self.send_response(206 if start else 200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(size - start))
+            if start:
+                self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+            self.send_header("X-Checksum-Sha256", sha256)
+            self.end_headers()
+            with open(path, "rb") as f:
+                f.seek(start)
+                shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MirrorHandler
+
+
+# LAN 미러 서버
+# GET /<호스트/경로> 는 파일을, /<호스트/경로>.sha256 은 기록된 sha256 을 돌려줍니다.
+# 캐시에 없는 릴리스 아티팩트는 (오프라인이 아닐 때) 그 자리에서 받아 캐시에 넣고 돌려줍니다.
+# 인덱스에도 릴리스 목록에도 없는 경로는 404 입니다.
+def serve(bind="0.0.0.0", port=MIRROR_PORT, cache_dir=CACHE_DIR, offline=OFFLINE, allowed_urls=None):
+    allowed_urls = release_urls() if allowed_urls is None else allowed_urls
+    server = ThreadingHTTPServer((bind, port), make_handler(cache_dir, offline, allowed_urls))
+    log_message(f"🚀 아티팩트 미러 시작: http://{bind}:{port}/ (캐시: {cache_dir}{', 오프라인' if offline else ''})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def show(cache_dir=CACHE_DIR):
+    for key, entry in sorted(load_index(cache_dir).items()):
+        print(f"{entry['sha256'][:16]}  {entry['size']:>12}  {key}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bastion 아티팩트 캐시")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--offline", action="store_true", default=OFFLINE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fetch_parser = subparsers.add_parser("fetch", help="URL 을 캐시에 받아 둡니다")
+    fetch_parser.add_argument("urls", nargs="+")
+    add_parser = subparsers.add_parser("add", help="로컬 파일을 URL 의 캐시로 등록합니다 (오프라인 준비)")
+    add_parser.add_argument("url")
+    add_parser.add_argument("path")
+    subparsers.add_parser("verify", help="캐시 디렉토리의 sha256 을 점검하고 기록이 없는 파일을 등록합니다")
+    subparsers.add_parser("list")
+    serve_parser = subparsers.add_parser("serve", help="노드용 HTTP 미러")
+    serve_parser.add_argument("--bind", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=MIRROR_PORT)
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        for url in args.urls:
+            print(fetch(url, args.cache_dir, args.offline))
+    elif args.command == "add":
+        print(add(args.url, args.path, args.cache_dir)[1])
+    elif args.command == "verify":
+        raise SystemExit(1 if verify(args.cache_dir) else 0)
+    elif args.command == "list":
+        show(args.cache_dir)
+    else:
+        serve(args.bind, args.port, args.cache_dir, args.offline)
@@ -0,0 +1,144 @@
+import argparse
+import functools
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+import urllib.request
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# 설정
+RELAY_DIR = "/root/hardway/relay"  # 전달받은 아티팩트를 보관하고 다른 노드에 제공하는 디렉토리
+CHUNK_SIZE = 1024 * 1024
+FETCH_TIMEOUT = 60
+FETCH_RETRIES = 5  # 부모 노드의 릴레이 서버가 막 시작된 경우를 대비한 재시도 횟수
+TOKEN_ENV = "HARDWAY_RELAY_TOKEN"  # 배포 실행마다 새로 만드는 토큰 (릴레이 프로세스 명령줄에 남지 않도록 환경 변수로 전달)
+TOKEN_HEADER = "X-Relay-Token"
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(message, flush=True)
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 아티팩트 내려받기
+# 받으면서 해시를 계산하고, 일치할 때만 최종 경로로 rename 합니다.
+def fetch(url, dest, expected_sha256):
+    if os.path.exists(dest) and sha256_of(dest) == expected_sha256:
+        log_message(f"✅ 이미 최신입니다: {dest}")
+        return True
+
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = f"{dest}.part"
+    for attempt in range(1, FETCH_RETRIES + 1):
+        digest = hashlib.sha256()
+        try:
+            request = urllib.request.Request(url, headers={TOKEN_HEADER: os.environ.get(TOKEN_ENV, "")})
+            with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response, open(tmp_path, "wb") as f:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+            break
+        except OSError as e:
+            if attempt == FETCH_RETRIES:
+                log_message(f"❌ 수신 실패: {url} ({e})")
+                return False
+            log_message(f"🔄 재시도 {attempt}/{FETCH_RETRIES}: {url} ({e})")
+            time.sleep(attempt)
+
+    if digest.hexdigest() != expected_sha256:
+        os.unlink(tmp_path)
+        log_message(f"❌ 체크섬 불일치: {url} (expected {expected_sha256}, got {digest.hexdigest()})")
+        return False
+    os.replace(tmp_path, dest)
+    log_message(f"✅ 수신 완료: {url} -> {dest}")
+    return True
+
+
+def verify(path, expected_sha256):
+    if not os.path.exists(path):
+        log_message(f"❌ 파일 없음: {path}")
+        return False
+    actual = sha256_of(path)
+    if actual != expected_sha256:
+        log_message(f"❌ 체크섬 불일치: {path} (expected {expected_sha256}, got {actual})")
+        return False
+    return True
+
+
+# 아티팩트 제공 서버
+# RELAY_DIR 만 읽기 전용으로 제공하며, 요청이 없는 상태가 idle_timeout 초 이어지면 종료합니다.
+# 토큰 헤더가 이번 배포의 토큰과 같은 요청만 받습니다.
+def serve(directory, bind, port, idle_timeout, token):
+    if not token:
+        raise SystemExit(f"❌ {TOKEN_ENV} 가 없어 릴레이 서버를 시작하지 않습니다.")
+    last_request = [time.time()]
+
+    class RelayHandler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), token):
+                return self.send_error(403)
+            last_request[0] = time.time()
+            super().do_GET()
+
+        def do_HEAD(self):
+            self.send_error(405)
+
+        def list_directory(self, path):
+            self.send_error(403)
+
+        def log_message(self, format, *args):
+            pass
+
+    handler = functools.partial(RelayHandler, directory=directory)
+    server = ThreadingHTTPServer((bind, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log_message(f"🔁 릴레이 서버 시작: {bind}:{port} ({directory})")
+    while time.time() - last_request[0] < idle_timeout:
+        time.sleep(1)
+    server.shutdown()
+    log_message("🔁 릴레이 서버 종료")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="노드 간 아티팩트 전달 (fan-out)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fetch_parser = subparsers.add_parser("fetch")
+    fetch_parser.add_argument("url")
+    fetch_parser.add_argument("dest")
+    fetch_parser.add_argument("sha256")
+
+    verify_parser = subparsers.add_parser("verify")
+    verify_parser.add_argument("path")
+    verify_parser.add_argument("sha256")
+
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("--dir", default=RELAY_DIR)
+    serve_parser.add_argument("--bind", required=True, help="노드의 클러스터 IP")
+    serve_parser.add_argument("--port", type=int, required=True)
+    serve_parser.add_argument("--idle-timeout", type=int, default=120)
+
+    args = parser.parse_args()
+    if args.command == "fetch":
+        ok = fetch(args.url, args.dest, args.sha256)
+    elif args.command == "verify":
+        ok = verify(args.path, args.sha256)
+    else:
+        serve(args.dir, args.bind, args.port, args.idle_timeout, os.environ.get(TOKEN_ENV, ""))
+        ok = True
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import remote_stream
+import ssh_pool
+
+# 설정
+MAX_CONCURRENCY = 20  # sshd MaxStartups(기본 10:30:100) 를 고려한 동시 접속 수
+HOST_TIMEOUT = 3600  # 호스트 하나에 허용하는 최대 작업 시간 (초)
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"\n[LOG]: {message}")
+
+
+# 원격 실행 결과 생성
+def make_result(host, status, exit_status=None, log_path=None, error=None):
+    return {"host": host, "status": status, "exit_status": exit_status, "log": log_path, "error": error}
+
+
+# paramiko 기반 실행기
+# paramiko 는 블로킹 API 이므로 채널 I/O 는 제한된 스레드 풀에서 처리하고,
+# 스케줄링/타임아웃/취소는 이벤트 루프에서 관리합니다.
+class ParamikoBackend:
+    def __init__(self, username, password, max_workers=MAX_CONCURRENCY):
+        self.username = username
+        self.password = password
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def _call(self, func):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func)
+
+    async def put(self, host, local_path, remote_path):
+        def upload():
+            sftp = ssh_pool.open_sftp(host, self.username, self.password)
+            try:
+                sftp.put(local_path, remote_path)
+            finally:
+                sftp.close()
+
+        await self._call(upload)
+
+    async def get(self, host, remote_path, local_path):
+        def download():
+            sftp = ssh_pool.open_sftp(host, self.username, self.password)
+            try:
+                sftp.get(remote_path, local_path)
+            finally:
+                sftp.close()
+
+        await self._call(download)
+
+    async def run(self, host, command, output):
+        channels = []
+
+        def execute():
+            stdin, stdout, stderr = ssh_pool.exec_command(host, self.username, self.password, command)
+            channels.append(stdout.channel)
+            return remote_stream.stream_channel(stdout.channel, output)
+
+        try:
+            return await self._call(execute)
+        except asyncio.CancelledError:
+            # 채널을 닫으면 스트리밍 중인 스레드도 곧바로 빠져나옵니다.
+            for channel in channels:
+                channel.close()
+            raise
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 프로세스 내부 SSH 대역
+# 실제 서버 없이 지연 시간만 흉내 내어 오케스트레이션 자체의 비용을 측정하거나 검증할 때 사용합니다.
+class LoopbackBackend:
+    def __init__(self, latency=0.0, handler=None):
+        self.latency = latency
+        self.handler = handler or (lambda host, command: (0, [f"{host}: {command}"]))
+        self.files = {}
+
+    async def put(self, host, local_path, remote_path):
+        await asyncio.sleep(self.latency)
+        with open(local_path, "rb") as f:
+            self.files[(host, remote_path)] = f.read()
+
+    async def get(self, host, remote_path, local_path):
+        await asyncio.sleep(self.latency)
+        data = self.files[(host, remote_path)]
+        with open(local_path, "wb") as f:
+            f.write(data)
+
+    async def run(self, host, command, output):
+        await asyncio.sleep(self.latency)
+        exit_status, lines = self.handler(host, command)
+        for line in lines:
+            output.write_line(line)
+        return exit_status
+
+    def close(self):
+        pass
+
+
+# 출력을 버리고 마지막 몇 줄만 남기는 대상 (짧은 점검 명령 및 벤치마크용)
+class NullOutput:
+    def __init__(self, host):
+        self.host = host
+        self.log_path = None
+        self.tail = deque(maxlen=10)
+
+    def write_line(self, line, is_error=False):
+        self.tail.append(line)
+
+    def close(self):
+        pass
+
+
+# 이벤트 루프 기반 실행 엔진
+class Engine:
+    def __init__(self, backend, max_concurrency=MAX_CONCURRENCY, host_timeout=HOST_TIMEOUT):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.host_timeout = host_timeout
+
+    async def _run_host(self, semaphore, host, task):
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(task(self.backend, host), self.host_timeout)
+            except asyncio.TimeoutError:
+                log_message(f"⏰ {host} 작업이 {self.host_timeout}s 안에 끝나지 않아 취소했습니다.")
+                return make_result(host, "failed", error=f"timeout after {self.host_timeout}s")
+            except Exception as e:
+                log_message(f"❌ {host} 작업 실패: {e}")
+                return make_result(host, "failed", error=str(e))
+
+    # 호스트 목록 실행
+    # max_unavailable: 지정하면 이 개수만큼씩 끊어서 순차적으로 실행합니다 (rolling batch)
+    # max_failures: 실패가 이 개수에 도달하면 진행 중인 작업을 취소하고 남은 호스트는 건너뜁니다
+    async def run_on_hosts(self, hosts, task, max_unavailable=None, max_failures=None):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = {}
+        failures = 0
+        tripped = False
+        batch_size = max_unavailable or len(hosts) or 1
+        batches = [hosts[i:i + batch_size] for i in range(0, len(hosts), batch_size)]
+
+        for index, batch in enumerate(batches, start=1):
+            if tripped:
+                break
+            if len(batches) > 1:
+                log_message(f"🔁 배치 {index}/{len(batches)} 실행: {len(batch)}대")
+
+            pending = {asyncio.create_task(self._run_host(semaphore, host, task)) for host in batch}
+            try:
+                while pending and not tripped:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for finished in done:
+                        result = finished.result()
+                        results[result["host"]] = result
+                        if result["status"] == "failed":
+                            failures += 1
+                            tripped = max_failures is not None and failures >= max_failures
+                if tripped:
+                    log_message(f"⛔ 실패 {failures}건으로 남은 작업을 중단합니다.")
+            finally:
+                for remaining in pending:
+                    remaining.cancel()
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+
+        return {host: results.get(host, make_result(host, "skipped")) for host in hosts}
+
+
+# 오케스트레이션 오버헤드 측정
+# 호스트당 put 1회 + run 1회를 LoopbackBackend 로 실행하고, 이상적인 지연 시간과의 차이를 출력합니다.
+def benchmark(host_counts, latency, max_concurrency):
+    with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as f:
+        f.write(b"print('ok')\n")
+        script_path = f.name
+
+    async def task(backend, host):
+        await backend.put(host, script_path, "/root/bench.py")
+        exit_status = await backend.run(host, "python3 -u /root/bench.py", NullOutput(host))
+        return make_result(host, "ok" if exit_status == 0 else "failed", exit_status)
+
+    try:
+        print(f"{'hosts':>8} {'elapsed(s)':>12} {'ideal(s)':>10} {'overhead/host(us)':>18}")
+        for count in host_counts:
+            hosts = [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(count)]
+            engine = Engine(LoopbackBackend(latency), max_concurrency=max_concurrency)
+            started = time.perf_counter()
+            results = asyncio.run(engine.run_on_hosts(hosts, task))
+            elapsed = time.perf_counter() - started
+            ideal = -(-count // max_concurrency) * latency * 2
+            assert all(result["status"] == "ok" for result in results.values())
+            print(f"{count:>8} {elapsed:>12.3f} {ideal:>10.3f} {(elapsed - ideal) / count * 1e6:>18.1f}")
+    finally:
+        os.unlink(script_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="asyncio 실행 엔진 오버헤드 벤치마크 (LoopbackBackend)")
+    parser.add_argument("--hosts", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--latency", type=float, default=0.01, help="가상 왕복 지연 시간 (초)")
+    parser.add_argument("--max-concurrency", type=int, default=1000)
+    args = parser.parse_args()
+    benchmark(args.hosts, args.latency, args.max_concurrency)
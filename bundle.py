@@ -0,0 +1,137 @@
+import ast
+import hashlib
+import io
+import os
+import secrets
+import tempfile
+import threading
+import zipfile
+
+import async_engine
+
+# 설정
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_DIR = "/root/hardway/bundle"  # Bastion 과 각 노드에서 번들을 보관하는 디렉토리
+BUNDLE_PREFIX = "k8s-hardway-"
+
+# 노드에서 실행되는 스크립트 (번들 진입점)
+NODE_ENTRY_POINTS = [
+    "etcd_setup",
+    "etcd_tuning",
+    "etcd_verify",
+    "control_plane_setup",
+    "worker_node_setup",
+    "sub_worker_node_setup",
+    "artifact_relay",
+    "csr_enroll",
+]
+
+# 번들 실행기: python3 bundle.pyz <진입점> [인자...]
+BUNDLE_MAIN = """import runpy
+import sys
+
+entry = sys.argv[1]
+sys.argv = [entry + ".py"] + sys.argv[2:]
+runpy.run_module(entry, run_name="__main__", alter_sys=True)
+"""
+
+# 호스트별 업로드 완료 기록 (프로세스 단위)
+_uploaded = set()
+_built = {}
+_build_lock = threading.Lock()  # 여러 단계가 동시에 번들을 준비할 수 있습니다.
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"\n[LOG]: {message}")
+
+
+# 진입점이 import 하는 같은 디렉토리의 모듈까지 재귀적으로 수집
+def collect_modules(entry_points):
+    modules = set()
+    queue = list(entry_points)
+    while queue:
+        name = queue.pop()
+        path = os.path.join(SOURCE_DIR, f"{name}.py")
+        if name in modules or not os.path.exists(path):
+            continue
+        modules.add(name)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                queue.extend(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                queue.append(node.module.split(".")[0])
+    return sorted(modules)
+
+
+# zipapp 생성
+# 타임스탬프를 고정해 내용이 같으면 항상 같은 해시가 나오도록 합니다.
+def build_bundle(entry_points=NODE_ENTRY_POINTS):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        members = [("__main__.py", BUNDLE_MAIN.encode("utf-8"))]
+        for name in collect_modules(entry_points):
+            with open(os.path.join(SOURCE_DIR, f"{name}.py"), "rb") as f:
+                members.append((f"{name}.py", f.read()))
+        for member_name, data in members:
+            info = zipfile.ZipInfo(member_name, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data)
+    data = buffer.getvalue()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+# 로컬 번들 파일 준비 (프로세스당 한 번 생성)
+# 임시 파일은 mkstemp 로 만들어 다른 프로세스가 같은 번들을 쓰고 있어도 겹치지 않습니다.
+def local_bundle():
+    with _build_lock:
+        if "path" not in _built:
+            data, digest = build_bundle()
+            os.makedirs(BUNDLE_DIR, exist_ok=True)
+            path = os.path.join(BUNDLE_DIR, f"{BUNDLE_PREFIX}{digest[:16]}.pyz")
+            if not os.path.exists(path):
+                fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=BUNDLE_DIR)
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(data)
+                    os.chmod(tmp_path, 0o644)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            _built.update(path=path, digest=digest)
+            log_message(f"📦 노드 번들 준비 완료: {path} (sha256 {digest[:16]}, {len(data)} bytes)")
+        return _built["path"], _built["digest"]
+
+
+# 원격 번들 보장
+# 해시가 같은 번들이 이미 있으면 업로드하지 않고, 새로 올린 경우 이전 번들은 정리합니다.
+# 여러 단계가 같은 호스트에 동시에 올릴 수 있으므로 업로드마다 고유한 임시 이름을 쓰고,
+# 그 사이 다른 단계가 먼저 설치했으면 임시 파일만 지웁니다.
+async def ensure_bundle(backend, host):
+    local_path, digest = local_bundle()
+    remote_path = f"{BUNDLE_DIR}/{os.path.basename(local_path)}"
+    if (host, digest) in _uploaded:
+        return remote_path
+
+    exists = await backend.run(host, f"mkdir -p {BUNDLE_DIR} && test -f {remote_path}",
+                               async_engine.NullOutput(host))
+    if exists != 0:
+        log_message(f"📦 {host}로 노드 번들 전송 중... ({digest[:16]})")
+        tmp_path = f"{remote_path}.{os.getpid()}-{secrets.token_hex(4)}.tmp"
+        await backend.put(host, local_path, tmp_path)
+        status = await backend.run(
+            host,
+            f"{{ if test -f {remote_path}; then rm -f {tmp_path}; else mv {tmp_path} {remote_path}; fi; }} && "
+            f"find {BUNDLE_DIR} -name '{BUNDLE_PREFIX}*.pyz' ! -name {os.path.basename(remote_path)} -delete",
+            async_engine.NullOutput(host))
+        if status != 0:
+            raise RuntimeError(f"{host} 번들 설치 실패 (종료 코드 {status})")
+    else:
+        log_message(f"✅ {host}에 같은 번들이 이미 있습니다. ({digest[:16]})")
+
+    _uploaded.add((host, digest))
+    return remote_path
@@ -1,5 +1,11 @@
 import os
+import shutil
 import subprocess
+import importlib.util
+import artifact_cache
+import kubeconfig
+import step_state
+import tracing
 
 # 설정
 BASE_DIR = "/root/hardway"
@@ -12,6 +18,7 @@ KUBE_CLUSTER_NAME = "minje-k8s-hardway"
 VIP = "172.31.1.8"  # VIP 변수
 KUBE_API_SERVER_ADDRESS = VIP  # VIP 활용
 KUBECTL_VERSION = "v1.29.7"
+KUBECTL_URL = f"https://storage.googleapis.com/kubernetes-release/release/{KUBECTL_VERSION}/bin/linux/amd64/kubectl"
 
 # IP 및 DNS 설정
 MASTER_IPS = ["172.31.1.2", "172.31.1.3", "172.31.1.4"]
@@ -23,6 +30,34 @@ SAN_DNS = [
 ]
 ETCD_IPS = MASTER_IPS + [LOCAL_IP]
 
+# Bastion 초기 세팅 명령어
+BASTION_SETUP_COMMANDS = [
+    "apt update -y",
+    "apt upgrade -y",
+    "apt install net-tools htop vim openssl ipset python3-pip -y",
+    "pip install scp paramiko cryptography"
+]
+BASTION_TOOLS = ["netstat", "htop", "vim", "openssl", "ipset", "pip"]
+BASTION_PYTHON_PACKAGES = ["scp", "paramiko", "cryptography"]
+
+# 키 알고리즘 프로필 (rsa-2048, rsa-4096, ecdsa-p256, ed25519)
+# CA, 서버, peer, 클라이언트 인증서에 모두 같은 프로필을 사용합니다.
+KEY_PROFILE = os.environ.get("HARDWAY_KEY_PROFILE", "rsa-2048")
+
+# 인증서 Subject (CN, O)
+CA_COMMON_NAME = "KUBERNETES-CA"
+COMPONENT_SUBJECTS = {
+    "admin": ("admin", "system:masters"),
+    "kube-controller-manager": ("system:kube-controller-manager", None),
+    "kube-scheduler": ("system:kube-scheduler", None),
+    "kube-proxy": ("system:kube-proxy", None),
+    "service-account": ("service-accounts", None),
+}
+
+# 생성되는 인증서 이름
+COMPONENT_CERTS = ["ca", "admin", "kube-controller-manager", "kube-scheduler", "kube-proxy", "service-account"]
+KUBECONFIGS = ["admin", "kube-controller-manager", "kube-scheduler", "kube-proxy"]
+
 # 디렉토리 보장
 def ensure_directories():
     os.makedirs(CERT_DIR, exist_ok=True)
@@ -36,12 +71,13 @@ def log_message(message):
 
 # 명령 실행
 def run_command(command):
-    try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        log_message(result.stdout.decode().strip())
-    except subprocess.CalledProcessError as e:
-        log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
-        raise
+    with tracing.span(command, category="command"):
+        try:
+            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            log_message(result.stdout.decode().strip())
+        except subprocess.CalledProcessError as e:
+            log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
+            raise
 
 # 환경변수 확인 및 설정
 def ensure_environment():
@@ -59,17 +95,25 @@ def ensure_environment():
 # bastion 초기 세팅
 def bastion_initial_setup():
     log_message("🛠️ Bastion 초기 세팅 시작...")
-    commands = [
-        "apt update -y",
-        "apt upgrade -y",
-        "apt install net-tools htop vim openssl ipset python3-pip -y",
-        "pip install scp paramiko"
-    ]
-    for command in commands:
+    for command in BASTION_SETUP_COMMANDS:
         log_message(f"실행 중: {command}")
         run_command(command)
     log_message("✅ Bastion 초기 세팅 완료")
 
+# Bastion 초기 세팅 완료 여부 확인
+def bastion_tools_ready():
+    return (all(shutil.which(tool) for tool in BASTION_TOOLS)
+            and all(importlib.util.find_spec(package) for package in BASTION_PYTHON_PACKAGES))
+
+# 인증서 파일 존재 여부 확인
+def cert_files_exist(names, extensions=("crt", "key")):
+    return all(os.path.exists(os.path.join(CERT_DIR, f"{name}.{ext}")) for name in names for ext in extensions)
+
+# 인증서 해시 목록 (이후 단계의 입력 지문으로 사용)
+def cert_digests(names, extensions=("crt", "key")):
+    return {f"{name}.{ext}": step_state.file_digest(os.path.join(CERT_DIR, f"{name}.{ext}"))
+            for name in names for ext in extensions}
+
 # kubectl 확인 및 설치
 def ensure_kubectl():
     log_message("🔍 kubectl 확인 중...")
@@ -79,100 +123,45 @@ def ensure_kubectl():
         log_message(f"✅ kubectl 설치 확인: {result.stdout.decode().strip()}")
     except (subprocess.CalledProcessError, FileNotFoundError):
         log_message("⚠️ kubectl이 설치되지 않았습니다. 다운로드를 시작합니다...")
-        commands = [
-            f"wget -q --show-progress --https-only --timestamping https://storage.googleapis.com/kubernetes-release/release/{KUBECTL_VERSION}/bin/linux/amd64/kubectl",
-            "chmod +x kubectl",
-            "mv kubectl /usr/local/bin/"
-        ]
-        for command in commands:
-            run_command(command)
+        run_command(f"install -m 0755 {artifact_cache.fetch(KUBECTL_URL)} /usr/local/bin/kubectl")
         log_message("✅ kubectl 설치 완료")
 
 # 인증서 생성
+# pki 모듈은 bastion_initial_setup 에서 설치되는 cryptography 를 사용하므로 실행 시점에 import 합니다.
 def generate_certificates():
+    import pki
     log_message("🔨 인증서 생성 시작...")
-    cert_commands = [
-        f"openssl genrsa -out {CERT_DIR}/ca.key 2048",
-        f"openssl req -new -key {CERT_DIR}/ca.key -subj '/CN=KUBERNETES-CA' -out {CERT_DIR}/ca.csr",
-        f"openssl x509 -req -in {CERT_DIR}/ca.csr -signkey {CERT_DIR}/ca.key -CAcreateserial -out {CERT_DIR}/ca.crt -days 3650",
-
-        f"openssl genrsa -out {CERT_DIR}/admin.key 2048",
-        f"openssl req -new -key {CERT_DIR}/admin.key -subj '/CN=admin/O=system:masters' -out {CERT_DIR}/admin.csr",
-        f"openssl x509 -req -in {CERT_DIR}/admin.csr -CA {CERT_DIR}/ca.crt -CAkey {CERT_DIR}/ca.key -CAcreateserial -out {CERT_DIR}/admin.crt -days 365",
-
-        f"openssl genrsa -out {CERT_DIR}/kube-controller-manager.key 2048",
-        f"openssl req -new -key {CERT_DIR}/kube-controller-manager.key -subj '/CN=system:kube-controller-manager' -out {CERT_DIR}/kube-controller-manager.csr",
-        f"openssl x509 -req -in {CERT_DIR}/kube-controller-manager.csr -CA {CERT_DIR}/ca.crt -CAkey {CERT_DIR}/ca.key -CAcreateserial -out {CERT_DIR}/kube-controller-manager.crt -days 365",
-
-        f"openssl genrsa -out {CERT_DIR}/kube-scheduler.key 2048",
-        f"openssl req -new -key {CERT_DIR}/kube-scheduler.key -subj '/CN=system:kube-scheduler' -out {CERT_DIR}/kube-scheduler.csr",
-        f"openssl x509 -req -in {CERT_DIR}/kube-scheduler.csr -CA {CERT_DIR}/ca.crt -CAkey {CERT_DIR}/ca.key -CAcreateserial -out {CERT_DIR}/kube-scheduler.crt -days 365",
-
-        f"openssl genrsa -out {CERT_DIR}/kube-proxy.key 2048",
-        f"openssl req -new -key {CERT_DIR}/kube-proxy.key -subj '/CN=system:kube-proxy' -out {CERT_DIR}/kube-proxy.csr",
-        f"openssl x509 -req -in {CERT_DIR}/kube-proxy.csr -CA {CERT_DIR}/ca.crt -CAkey {CERT_DIR}/ca.key -CAcreateserial -out {CERT_DIR}/kube-proxy.crt -days 365",
-
-        f"openssl genrsa -out {CERT_DIR}/service-account.key 2048",
-        f"openssl req -new -key {CERT_DIR}/service-account.key -subj '/CN=service-accounts' -out {CERT_DIR}/service-account.csr",
-        f"openssl x509 -req -in {CERT_DIR}/service-account.csr -CA {CERT_DIR}/ca.crt -CAkey {CERT_DIR}/ca.key -CAcreateserial -out {CERT_DIR}/service-account.crt -days 365",
-    ]
-    for command in cert_commands:
-        log_message(f"실행 중: {command}")
-        run_command(command)
+    # 키는 프로세스 풀에서 병렬로 만들고, 먼저 나온 키부터 CA 와 각 인증서에 사용합니다.
+    # 이미 있는 CA 는 다시 만들지 않습니다. (CA 를 바꾸면 클러스터 전체 인증서가 무효가 됩니다.)
+    ca_exists = cert_files_exist(["ca"])
+    keys = pki.generate_keys(len(COMPONENT_SUBJECTS) + (0 if ca_exists else 1), KEY_PROFILE)
+    if ca_exists:
+        pki.load_ca(CERT_DIR)
+        log_message("✅ 기존 CA 를 사용합니다.")
+    else:
+        pki.init_ca(CERT_DIR, CA_COMMON_NAME, key=next(keys))
+        log_message(f"✅ ca 인증서 생성 완료 ({KEY_PROFILE})")
+    for (name, (common_name, organization)), key in zip(COMPONENT_SUBJECTS.items(), keys):
+        profile = pki.service_account_profile(KEY_PROFILE) if name == "service-account" else KEY_PROFILE
+        pki.issue_to_dir(CERT_DIR, name, common_name, organization,
+                         key=key if profile == KEY_PROFILE else None, profile=profile)
+        log_message(f"✅ {name} 인증서 생성 완료")
     log_message("✅ 인증서 생성 완료")
 
 # SAN 인증서 생성
 def generate_san_certificates():
+    import pki
     log_message("🔨 SAN 인증서 생성 시작...")
-    kube_apiserver_config = os.path.join(CERT_DIR, "openssl-kube-apiserver.cnf")
-    with open(kube_apiserver_config, "w") as f:
-        f.write("[req]\n")
-        f.write("req_extensions = v3_req\n")
-        f.write("distinguished_name = req_distinguished_name\n")
-        f.write("\n[req_distinguished_name]\n")
-        f.write("\n[v3_req]\n")
-        f.write("basicConstraints = CA:FALSE\n")
-        f.write("keyUsage = nonRepudiation, digitalSignature, keyEncipherment\n")
-        f.write("subjectAltName = @alt_names\n")
-        f.write("\n[alt_names]\n")
-        for i, dns in enumerate(SAN_DNS, start=1):
-            f.write(f"DNS.{i} = {dns}\n")
-        for i, ip in enumerate(SAN_IPS, start=len(SAN_DNS) + 1):
-            f.write(f"IP.{i} = {ip}\n")
-    commands = [
-        f"openssl genrsa -out {CERT_DIR}/kube-apiserver.key 2048",
-        f"openssl req -new -key {CERT_DIR}/kube-apiserver.key -subj '/CN=kube-apiserver' -out {CERT_DIR}/kube-apiserver.csr -config {kube_apiserver_config}",
-        f"openssl x509 -req -in {CERT_DIR}/kube-apiserver.csr -CA {CERT_DIR}/ca.crt -CAkey {CERT_DIR}/ca.key -CAcreateserial -out {CERT_DIR}/kube-apiserver.crt -extensions v3_req -extfile {kube_apiserver_config} -days 365"
-    ]
-    for command in commands:
-        log_message(f"실행 중: {command}")
-        run_command(command)
+    pki.issue_to_dir(CERT_DIR, "kube-apiserver", "kube-apiserver", dns_names=SAN_DNS, ip_addresses=SAN_IPS,
+                     profile=KEY_PROFILE)
     log_message("✅ SAN 인증서 생성 완료")
 
 # etcd 인증서 생성
 def generate_etcd_certificates():
+    import pki
     log_message("🔨 etcd 인증서 생성 시작...")
-    etcd_config = os.path.join(CERT_DIR, "openssl-etcd.cnf")
-    with open(etcd_config, "w") as f:
-        f.write("[req]\n")
-        f.write("req_extensions = v3_req\n")
-        f.write("distinguished_name = req_distinguished_name\n")
-        f.write("\n[req_distinguished_name]\n")
-        f.write("\n[v3_req]\n")
-        f.write("basicConstraints = CA:FALSE\n")
-        f.write("keyUsage = nonRepudiation, digitalSignature, keyEncipherment\n")
-        f.write("subjectAltName = @alt_names\n")
-        f.write("\n[alt_names]\n")
-        for i, ip in enumerate(ETCD_IPS, start=1):
-            f.write(f"IP.{i} = {ip}\n")
-    commands = [
-        f"openssl genrsa -out {CERT_DIR}/etcd-server.key 2048",
-        f"openssl req -new -key {CERT_DIR}/etcd-server.key -subj '/CN=etcd-server' -out {CERT_DIR}/etcd-server.csr -config {etcd_config}",
-        f"openssl x509 -req -in {CERT_DIR}/etcd-server.csr -CA {CERT_DIR}/ca.crt -CAkey {CERT_DIR}/ca.key -CAcreateserial -out {CERT_DIR}/etcd-server.crt -extensions v3_req -extfile {etcd_config} -days 3650"
-    ]
-    for command in commands:
-        log_message(f"실행 중: {command}")
-        run_command(command)
+    pki.issue_to_dir(CERT_DIR, "etcd-server", "etcd-server", ip_addresses=ETCD_IPS, days=3650,
+                     profile=KEY_PROFILE)
     log_message("✅ etcd 인증서 생성 완료")
 
 # kubeconfig 생성
@@ -205,15 +194,11 @@ def create_kubeconfigs():
         },
     ]
     for config in configs:
-        commands = [
-            f"kubectl config set-cluster {KUBE_CLUSTER_NAME} --certificate-authority={CERT_DIR}/ca.crt --embed-certs=true --server=https://{KUBE_API_SERVER_ADDRESS}:6443 --kubeconfig={CERT_DIR}/{config['name']}",
-            f"kubectl config set-credentials {config['user']} --client-certificate={CERT_DIR}/{config['cert']} --client-key={CERT_DIR}/{config['key']} --embed-certs=true --kubeconfig={CERT_DIR}/{config['name']}",
-            f"kubectl config set-context default --cluster={KUBE_CLUSTER_NAME} --user={config['user']} --kubeconfig={CERT_DIR}/{config['name']}",
-            f"kubectl config use-context default --kubeconfig={CERT_DIR}/{config['name']}"
-        ]
-        for command in commands:
-            log_message(f"실행 중: {command}")
-            run_command(command)
+        kubeconfig.write_kubeconfig(os.path.join(CERT_DIR, config["name"]), KUBE_CLUSTER_NAME,
+                                    f"https://{KUBE_API_SERVER_ADDRESS}:6443", os.path.join(CERT_DIR, "ca.crt"),
+                                    config["user"], os.path.join(CERT_DIR, config["cert"]),
+                                    os.path.join(CERT_DIR, config["key"]))
+        log_message(f"✅ {config['name']} 생성 완료")
 
     # admin.kubeconfig 복사
     admin_kubeconfig_path = os.path.join(CERT_DIR, "admin.kubeconfig")
@@ -228,16 +213,35 @@ def create_kubeconfigs():
     log_message("✅ kubeconfig 생성 완료")
 
 # 메인 함수
+# 입력(설정값, 인증서 해시)이 바뀌지 않았고 결과 파일이 남아 있는 단계는 건너뜁니다.
 def main():
     ensure_directories()
-    bastion_initial_setup()
+    step_state.run_step("bastion_initial_setup", {"commands": BASTION_SETUP_COMMANDS},
+                        bastion_initial_setup, postcondition=bastion_tools_ready, log=log_message)
     ensure_environment()
     log_message("=== 스크립트 시작 ===")
     ensure_kubectl()
-    generate_certificates()
-    generate_san_certificates()
-    generate_etcd_certificates()
-    create_kubeconfigs()
+    step_state.run_step("generate_certificates",
+                        {"cert_dir": CERT_DIR, "certs": COMPONENT_CERTS, "key_profile": KEY_PROFILE,
+                         "ca_common_name": CA_COMMON_NAME, "subjects": COMPONENT_SUBJECTS},
+                        generate_certificates, postcondition=lambda: cert_files_exist(COMPONENT_CERTS),
+                        log=log_message)
+    step_state.run_step("generate_san_certificates",
+                        {"master_ips": MASTER_IPS, "vip": VIP, "san_ips": SAN_IPS, "san_dns": SAN_DNS,
+                         "ca": cert_digests(["ca"]),
+                         "key_profile": KEY_PROFILE},
+                        generate_san_certificates, postcondition=lambda: cert_files_exist(["kube-apiserver"]),
+                        log=log_message)
+    step_state.run_step("generate_etcd_certificates", {"etcd_ips": ETCD_IPS, "ca": cert_digests(["ca"]),
+                                                       "key_profile": KEY_PROFILE},
+                        generate_etcd_certificates, postcondition=lambda: cert_files_exist(["etcd-server"]),
+                        log=log_message)
+    step_state.run_step("create_kubeconfigs",
+                        {"cluster": KUBE_CLUSTER_NAME, "server": KUBE_API_SERVER_ADDRESS,
+                         "certs": cert_digests(COMPONENT_CERTS)},
+                        create_kubeconfigs,
+                        postcondition=lambda: cert_files_exist(KUBECONFIGS, extensions=("kubeconfig",)),
+                        log=log_message)
     log_message("=== 모든 작업 완료 ===")
 
 if __name__ == "__main__":
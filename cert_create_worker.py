@@ -1,8 +1,16 @@
+import argparse
+import json
 import os
 import subprocess
-import paramiko
-from scp import SCPClient
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import cert_inventory
+import key_pool
+import kubeconfig
+import pki
+import tar_transfer
 import time
+import tracing
 
 # 설정
 WORKER_NODES = [
@@ -16,6 +24,8 @@ CLUSTER_NAME = "minje-k8s-hardway"
 API_SERVER_ADDRESS = "172.31.1.8"
 SSH_USER = "root"
 SSH_PASSWORD = "1234"
+KEY_PROFILE = os.environ.get("HARDWAY_KEY_PROFILE", "rsa-2048")  # cert_create.py 와 같은 키 알고리즘 프로필
+TRANSFER_CONCURRENCY = 20  # 동시에 전송하는 노드 수
 
 
 # 로그 작성 함수
@@ -28,12 +38,13 @@ def log_message(message):
 
 # 명령 실행 함수
 def run_command(command):
-    try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        log_message(result.stdout.decode().strip())
-    except subprocess.CalledProcessError as e:
-        log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
-        raise
+    with tracing.span(command, category="command"):
+        try:
+            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            log_message(result.stdout.decode().strip())
+        except subprocess.CalledProcessError as e:
+            log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
+            raise
 
 
 # 디렉토리 생성 함수
@@ -45,99 +56,97 @@ def create_cert_directory():
         log_message(f"⚠️ 디렉토리가 이미 존재합니다: {CERT_DIR}")
 
 
-# Worker Node 1 인증서 생성
-def create_worker_certificates(node):
-    log_message(f"🔄 {node['hostname']} 인증서 생성 중...")
-    openssl_config = f"{CERT_DIR}/openssl-{node['hostname']}.cnf"
-
-    # OpenSSL 구성 파일 생성
-    with open(openssl_config, "w") as config_file:
-        config_file.write(f"""
-[req]
-req_extensions = v3_req
-distinguished_name = req_distinguished_name
-
-[req_distinguished_name]
-
-[v3_req]
-basicConstraints = CA:FALSE
-keyUsage = nonRepudiation, digitalSignature, keyEncipherment
-subjectAltName = @alt_names
-
-[alt_names]
-IP.1 = {node['ip']}
-DNS.1 = {node['hostname']}
-""")
-    # 개인 키 생성
-    run_command(f"openssl genrsa -out {CERT_DIR}/{node['hostname']}.key 2048")
-    # CSR 생성
-    run_command(
-        f"openssl req -new -key {CERT_DIR}/{node['hostname']}.key -subj \"/CN=system:node:{node['hostname']}/O=system:nodes\" "
-        f"-out {CERT_DIR}/{node['hostname']}.csr -config {openssl_config}"
-    )
-    # 인증서 서명
-    run_command(
-        f"openssl x509 -req -in {CERT_DIR}/{node['hostname']}.csr -CA {CERT_DIR}/ca.crt -CAkey {CERT_DIR}/ca.key "
-        f"-CAcreateserial -out {CERT_DIR}/{node['hostname']}.crt -extensions v3_req -extfile {openssl_config} -days 365"
-    )
-    log_message(f"✅ {node['hostname']} 인증서 생성 완료")
-
-
-# kubeconfig 생성 함수
-def create_worker_kubeconfig(node):
-    log_message(f"🔄 {node['hostname']} kubeconfig 생성 중...")
-    kubeconfig_file = f"{CERT_DIR}/{node['hostname']}.kubeconfig"
-
-    # 클러스터 설정
-    run_command(
-        f"kubectl config set-cluster {CLUSTER_NAME} "
-        f"--certificate-authority={CERT_DIR}/ca.crt --embed-certs=true "
-        f"--server=https://{API_SERVER_ADDRESS}:6443 --kubeconfig={kubeconfig_file}"
-    )
-    # 사용자 자격 증명 설정
-    run_command(
-        f"kubectl config set-credentials system:node:{node['hostname']} "
-        f"--client-certificate={CERT_DIR}/{node['hostname']}.crt --client-key={CERT_DIR}/{node['hostname']}.key "
-        f"--embed-certs=true --kubeconfig={kubeconfig_file}"
-    )
-    # 컨텍스트 설정
-    run_command(
-        f"kubectl config set-context default "
-        f"--cluster={CLUSTER_NAME} --user=system:node:{node['hostname']} --kubeconfig={kubeconfig_file}"
-    )
-    # 기본 컨텍스트 설정
-    run_command(f"kubectl config use-context default --kubeconfig={kubeconfig_file}")
-    log_message(f"✅ {node['hostname']} kubeconfig 생성 완료")
-
-
-# 인증서 전송 함수
-def transfer_certificates(node):
+# 노드 목록 파일 읽기
+# JSON 형식: [{"hostname": "k8s-hardway-worker04", "ip": "172.31.1.9"}, ...]
+def load_worker_inventory(path):
+    with open(path, encoding="utf-8") as f:
+        return [{"hostname": node["hostname"], "ip": node["ip"], "manual_cert": True} for node in json.load(f)]
+
+
+# Worker 인증서 일괄 발급
+# CA 는 한 번만 읽고, 키는 키 풀에서 꺼내 서명만 합니다. kubeconfig 도 메모리에서 만들어
+# 노드별 전송 목록 [(파일 이름, 노드 경로, 내용, 권한), ...] 으로 돌려줍니다.
+# use_pool=False 이면 키 풀을 쓰지 않고 키를 그 자리에서 생성합니다. (비교 측정용)
+def issue_worker_certificates(nodes, cert_dir=CERT_DIR, use_pool=True):
+    ca_key, ca_cert = pki.load_ca(cert_dir)
+    ca_pem = pki.cert_to_pem(ca_cert)
+    server = f"https://{API_SERVER_ADDRESS}:6443"
+    bundles = {}
+    keys = key_pool.take(len(nodes), KEY_PROFILE) if use_pool else pki.generate_keys(len(nodes), KEY_PROFILE)
+    for node, key in zip(nodes, keys):
+        hostname = node["hostname"]
+        user = f"system:node:{hostname}"
+        key, cert = pki.issue(ca_key, ca_cert, user, "system:nodes", [hostname], [node["ip"]], key=key,
+                              profile=KEY_PROFILE)
+        key_pem, cert_pem = pki.key_to_pem(key), pki.cert_to_pem(cert)
+        config = kubeconfig.render(CLUSTER_NAME, server, ca_pem, user, cert_pem, key_pem)
+
+        # 재발급/재전송(cert_inventory)에 쓰이도록 Bastion 에도 저장합니다.
+        pki.write_file(os.path.join(cert_dir, f"{hostname}.key"), key_pem, 0o600)
+        pki.write_file(os.path.join(cert_dir, f"{hostname}.crt"), cert_pem)
+        kubeconfig.write(os.path.join(cert_dir, f"{hostname}.kubeconfig"), config)
+
+        bundles[hostname] = [
+            (f"{hostname}.crt", f"/etc/kubernetes/ssl/{hostname}.crt", cert_pem, 0o644),
+            (f"{hostname}.key", f"/etc/kubernetes/ssl/{hostname}.key", key_pem, 0o600),
+            ("ca.crt", "/etc/kubernetes/ssl/ca.crt", ca_pem, 0o644),
+            (f"{hostname}.kubeconfig", f"/etc/kubernetes/{hostname}.kubeconfig", config.encode("utf-8"), 0o600),
+        ]
+    return bundles
+
+
+# 인증서 전송 함수 (메모리에 있는 내용을 tar 하나로 묶어 바로 전송)
+def transfer_certificates(node, files):
     log_message(f"📦 {node['hostname']}({node['ip']})에 인증서 전송 중...")
-
-    try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(hostname=node["ip"], username=SSH_USER, password=SSH_PASSWORD)
-
-        with SCPClient(ssh.get_transport()) as scp:
-            ssh.exec_command(f"mkdir -p /etc/kubernetes/ssl")
-            cert_files = [
-                f"{node['hostname']}.crt",
-                f"{node['hostname']}.key",
-                "ca.crt",
-                f"{node['hostname']}.kubeconfig"
-            ]
-            for cert in cert_files:
-                src_path = os.path.join(CERT_DIR, cert)
-                dest_path = f"/etc/kubernetes/ssl/{cert}" if cert != f"{node['hostname']}.kubeconfig" else f"/etc/kubernetes/{cert}"
-                scp.put(src_path, dest_path)
-                log_message(f"✅ {cert} 전송 완료: {node['hostname']}({node['ip']}) -> {dest_path}")
-
-        ssh.close()
-
-    except Exception as e:
-        log_message(f"❌ {node['hostname']}({node['ip']})에 인증서 전송 실패: {e}")
-        raise
+    tar_transfer.send(node["ip"], SSH_USER, SSH_PASSWORD,
+                      [(dest_path, data, mode) for _, dest_path, data, mode in files])
+    log_message(f"✅ {node['hostname']}({node['ip']}) 인증서 전송 완료")
+    return {file_name: dest_path for file_name, dest_path, _, _ in files}
+
+
+# 병렬 전송
+def transfer_all(nodes, bundles, max_workers=TRANSFER_CONCURRENCY):
+    deliveries, failed = {}, []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(transfer_certificates, node, bundles[node["hostname"]]): node for node in nodes}
+        for future in as_completed(futures):
+            node = futures[future]
+            try:
+                deliveries[node["ip"]] = future.result()
+            except Exception as e:
+                log_message(f"❌ {node['hostname']}({node['ip']})에 인증서 전송 실패: {e}")
+                failed.append(node["hostname"])
+    cert_inventory.record_bulk_deliveries(deliveries, CERT_DIR)
+    return failed
+
+
+# 대량 발급 처리량 측정 (임시 CA 와 임시 키 풀 사용, 전송 없음)
+# 키 풀 없이(그 자리에서 병렬 생성) 한 번, 미리 채운 임시 키 풀로 한 번 발급해 비교합니다.
+# 실제 풀의 키와 통계는 건드리지 않습니다. low watermark 만큼 더 채워 두어 측정 중 보충이 시작되지 않도록 합니다.
+def benchmark(count):
+    nodes = [{"hostname": f"bench-worker{index:04d}",
+              "ip": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"}
+             for index in range(count)]
+    pool_dir = key_pool.POOL_DIR
+    timings = {}
+    with tempfile.TemporaryDirectory() as cert_dir:
+        key_pool.POOL_DIR = os.path.join(cert_dir, "key-pool")
+        try:
+            pki.init_ca(cert_dir, profile=KEY_PROFILE)
+            started = time.perf_counter()
+            issue_worker_certificates(nodes, cert_dir, use_pool=False)
+            timings["키 풀 없음"] = time.perf_counter() - started
+
+            key_pool.refill(KEY_PROFILE, target=count + key_pool.LOW_WATERMARK)
+            started = time.perf_counter()
+            issue_worker_certificates(nodes, cert_dir)
+            timings["키 풀 사용"] = time.perf_counter() - started
+        finally:
+            key_pool.POOL_DIR = pool_dir
+    for label, elapsed in timings.items():
+        log_message(f"📋 {label}: {count}개 노드 인증서 + kubeconfig 발급 {elapsed:.2f}s "
+                    f"({count / elapsed:.0f} nodes/s, 노드당 {elapsed / count * 1000:.1f}ms, {KEY_PROFILE})")
+    log_message(f"📋 키 풀 효과: {timings['키 풀 없음'] / timings['키 풀 사용']:.1f}x")
 
 
 # TLS Bootstrapping 구성 생성 함수
@@ -166,14 +175,35 @@ stringData:
 
 # 메인 함수
 def main():
+    parser = argparse.ArgumentParser(description="Worker Node 인증서 생성 및 전송")
+    parser.add_argument("--inventory", help="대량 발급할 Worker 목록 JSON 파일")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="N 개 노드 발급 처리량만 측정합니다")
+    parser.add_argument("--no-transfer", action="store_true", help="발급만 하고 전송하지 않습니다")
+    args = parser.parse_args()
+    if args.benchmark:
+        create_cert_directory()
+        benchmark(args.benchmark)
+        return
+
     log_message("=== Worker Node 인증서 생성 및 TLS Bootstrapping 구성 시작 ===")
     create_cert_directory()
-
-    for node in WORKER_NODES:
-        if node["manual_cert"]:
-            create_worker_certificates(node)
-            create_worker_kubeconfig(node)
-            transfer_certificates(node)
+    nodes = (load_worker_inventory(args.inventory) if args.inventory
+             else [node for node in WORKER_NODES if node["manual_cert"]])
+
+    started = time.perf_counter()
+    bundles = issue_worker_certificates(nodes)
+    issued = time.perf_counter() - started
+    cert_inventory.record_workers(nodes)  # cert_inventory reconcile 이 같은 노드 목록을 점검합니다.
+    log_message(f"✅ {len(nodes)}개 노드 인증서 및 kubeconfig 생성 완료 ({issued:.2f}s)")
+
+    if not args.no_transfer:
+        started = time.perf_counter()
+        failed = transfer_all(nodes, bundles)
+        transferred = time.perf_counter() - started
+        log_message(f"📋 전송 {len(nodes) - len(failed)}/{len(nodes)}대 완료 ({transferred:.1f}s), "
+                    f"실패 {failed or '없음'}")
+        if failed:
+            raise SystemExit(1)
 
     configure_tls_bootstrap()
     log_message("=== 모든 작업 완료 ===")
@@ -0,0 +1,314 @@
+import argparse
+import contextlib
+import datetime
+import fcntl
+import hashlib
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+
+import cert_create
+import kubeconfig
+import pki
+import tar_transfer
+
+# 설정
+CERT_DIR = cert_create.CERT_DIR
+INVENTORY_FILE = os.environ.get("HARDWAY_CERT_INVENTORY", os.path.join(CERT_DIR, "inventory.json"))
+RENEW_BEFORE_DAYS = 30  # 만료까지 이 기간보다 적게 남으면 재발급합니다.
+SSH_USER = "root"
+SSH_PASSWORD = "1234"
+WORKER_NODES = [
+    {"hostname": "k8s-hardway-worker01", "ip": "172.31.1.5", "manual_cert": True},
+    {"hostname": "k8s-hardway-worker02", "ip": "172.31.1.6", "manual_cert": False},
+    {"hostname": "k8s-hardway-worker03", "ip": "172.31.1.7", "manual_cert": False},
+]
+
+_lock = threading.Lock()
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[INVENTORY]: {message}", flush=True)
+
+
+def load():
+    if not os.path.exists(INVENTORY_FILE):
+        return {"certs": {}, "files": {}}
+    try:
+        with open(INVENTORY_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"certs": {}, "files": {}}
+
+
+# 인벤토리 잠금
+# cert_transfer 와 cert_sub_worker_node_transfer 처럼 별도 프로세스가 동시에 기록하므로
+# 스레드 잠금과 함께 잠금 파일에 flock 을 잡고 읽기-수정-쓰기를 합니다.
+@contextlib.contextmanager
+def _locked():
+    os.makedirs(os.path.dirname(INVENTORY_FILE), exist_ok=True)
+    with _lock, open(f"{INVENTORY_FILE}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+# 같은 디렉토리의 고유한 임시 파일에 쓴 뒤 rename 으로 교체
+def _save(inventory):
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(INVENTORY_FILE)}.",
+                                    dir=os.path.dirname(INVENTORY_FILE))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(inventory, f, indent=2, sort_keys=True, ensure_ascii=False)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, INVENTORY_FILE)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_cert(path):
+    with open(path, "rb") as f:
+        return x509.load_pem_x509_certificate(f.read())
+
+
+def cert_sans(cert):
+    try:
+        sans = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+    except x509.ExtensionNotFound:
+        return {"dns": [], "ips": []}
+    return {"dns": sorted(sans.get_values_for_type(x509.DNSName)),
+            "ips": sorted(str(ip) for ip in sans.get_values_for_type(x509.IPAddress))}
+
+
+# 인증서 정보 (인벤토리 기록용)
+def describe(cert):
+    return {
+        "subject": cert.subject.rfc4514_string(),
+        "issuer": cert.issuer.rfc4514_string(),
+        "sans": cert_sans(cert),
+        "serial": format(cert.serial_number, "x"),
+        "fingerprint": cert.fingerprint(hashes.SHA256()).hex(),
+        "not_after": cert.not_valid_after_utc.isoformat(),
+    }
+
+
+# 인증서 디렉토리를 읽어 인벤토리 갱신
+def refresh(cert_dir=CERT_DIR):
+    with _locked():
+        inventory = load()
+        certs = {}
+        for file_name in sorted(os.listdir(cert_dir)):
+            if file_name.endswith(".crt"):
+                name = file_name[:-len(".crt")]
+                certs[name] = describe(load_cert(os.path.join(cert_dir, file_name)))
+        inventory["certs"] = certs
+        _save(inventory)
+    return certs
+
+
+# 노드로 전송한 파일 기록
+# deliveries: {파일 이름: 노드의 경로}
+def record_deliveries(host, deliveries, cert_dir=CERT_DIR):
+    record_bulk_deliveries({host: deliveries}, cert_dir)
+
+
+# 여러 노드의 전송 기록을 한 번에 저장
+# deliveries_by_host: {호스트: {파일 이름: 노드의 경로}}
+def record_bulk_deliveries(deliveries_by_host, cert_dir=CERT_DIR):
+    delivered_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with _locked():
+        inventory = load()
+        for host, deliveries in deliveries_by_host.items():
+            for file_name, dest_path in deliveries.items():
+                inventory["files"].setdefault(file_name, {})[host] = {
+                    "path": dest_path,
+                    "sha256": _file_sha256(os.path.join(cert_dir, file_name)),
+                    "delivered_at": delivered_at,
+                }
+        _save(inventory)
+
+
+# 발급한 Worker 노드 기록 (cert_create_worker --inventory 로 추가된 노드 포함)
+def record_workers(nodes):
+    with _locked():
+        inventory = load()
+        workers = inventory.setdefault("workers", {})
+        for node in nodes:
+            workers[node["hostname"]] = {"ip": node["ip"]}
+        _save(inventory)
+
+
+# 인증서를 직접 발급하는 Worker 목록: 설정값의 manual_cert 노드 + 인벤토리에 기록된 노드
+def worker_nodes():
+    nodes = {node["hostname"]: node for node in WORKER_NODES if node["manual_cert"]}
+    for hostname, info in load().get("workers", {}).items():
+        nodes.setdefault(hostname, {"hostname": hostname, "ip": info["ip"], "manual_cert": True})
+    return list(nodes.values())
+
+
+# 설정값과 인벤토리 기준으로 있어야 할 인증서 목록
+def desired_certs():
+    specs = {name: {"common_name": common_name, "organization": organization, "dns": [], "ips": [],
+                    "days": pki.CERT_DAYS}
+             for name, (common_name, organization) in cert_create.COMPONENT_SUBJECTS.items()}
+    specs["kube-apiserver"] = {"common_name": "kube-apiserver", "organization": None,
+                               "dns": cert_create.SAN_DNS, "ips": cert_create.SAN_IPS, "days": pki.CERT_DAYS}
+    specs["etcd-server"] = {"common_name": "etcd-server", "organization": None,
+                            "dns": [], "ips": cert_create.ETCD_IPS, "days": 3650}
+    for node in worker_nodes():
+        specs[node["hostname"]] = {"common_name": f"system:node:{node['hostname']}",
+                                   "organization": "system:nodes",
+                                   "dns": [node["hostname"]], "ips": [node["ip"]], "days": pki.CERT_DAYS}
+    return specs
+
+
+def _normalized_sans(spec):
+    return {"dns": sorted(spec["dns"]), "ips": sorted(str(ipaddress.ip_address(ip)) for ip in spec["ips"])}
+
+
+# 재발급이 필요한 인증서 확인
+# 없거나, 곧 만료되거나, SAN/Subject 가 설정과 다르거나, 현재 CA 가 서명하지 않은 인증서를 돌려줍니다.
+def check(specs, ca_cert, renew_before_days=RENEW_BEFORE_DAYS, cert_dir=CERT_DIR):
+    renew_after = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=renew_before_days)
+    stale = {}
+    for name, spec in specs.items():
+        path = os.path.join(cert_dir, f"{name}.crt")
+        if not os.path.exists(path) or not os.path.exists(os.path.join(cert_dir, f"{name}.key")):
+            stale[name] = "missing"
+            continue
+        cert = load_cert(path)
+        if cert.subject != pki.make_name(spec["common_name"], spec["organization"]):
+            stale[name] = f"subject mismatch ({cert.subject.rfc4514_string()})"
+        elif cert_sans(cert) != _normalized_sans(spec):
+            stale[name] = f"SAN mismatch ({cert_sans(cert)})"
+        elif cert.not_valid_after_utc < renew_after:
+            stale[name] = f"expiring {cert.not_valid_after_utc:%Y-%m-%d}"
+        else:
+            try:
+                cert.verify_directly_issued_by(ca_cert)
+            except (InvalidSignature, ValueError, TypeError):
+                stale[name] = "not issued by current CA"
+    return stale
+
+
+# 재발급한 파일을 이전에 받았던 노드로 다시 전송
+def redistribute(file_names, cert_dir=CERT_DIR):
+    files = load()["files"]
+    by_host = {}
+    for file_name in file_names:
+        for host, delivery in files.get(file_name, {}).items():
+            by_host.setdefault(host, {})[file_name] = delivery["path"]
+
+    failed = []
+    for host, deliveries in sorted(by_host.items()):
+        try:
+            tar_transfer.send(host, SSH_USER, SSH_PASSWORD, tar_transfer.read_files(
+                [(os.path.join(cert_dir, file_name), dest_path) for file_name, dest_path in deliveries.items()]))
+            record_deliveries(host, deliveries, cert_dir)
+            log_message(f"✅ {host}: {', '.join(sorted(deliveries))} 재전송 완료")
+        except Exception as e:
+            log_message(f"❌ {host}: 재전송 실패: {e}")
+            failed.append(host)
+    if by_host:
+        log_message("⚠️ 노드에서 해당 설정 단계를 다시 실행해야 서비스에 반영됩니다.")
+    return not failed
+
+
+# 인증서 정리: 필요한 것만 재발급하고 재전송
+# CA 는 없을 때만 새로 만듭니다. (CA 를 바꾸면 클러스터 전체 인증서가 무효가 됩니다.)
+# 새 CA 를 만들면 ca.crt 를 받았던 모든 노드에 ca.crt 를, ca.key 를 받았던 control plane 노드에 ca.key 를 함께 재전송합니다.
+# 전송 기록은 있는데 ca.crt 기록이 없는 노드가 있으면 새 CA 를 줄 수 없으므로 재발급하지 않습니다.
+def reconcile(dry_run=False, renew_before_days=RENEW_BEFORE_DAYS, cert_dir=CERT_DIR):
+    ca_created = False
+    if not all(os.path.exists(os.path.join(cert_dir, f"ca.{ext}")) for ext in ("crt", "key")):
+        files = load()["files"]
+        hosts = {host for deliveries in files.values() for host in deliveries}
+        untracked = sorted(hosts - set(files.get("ca.crt", {})))
+        if untracked:
+            log_message(f"❌ CA 가 없고, ca.crt 전송 기록이 없는 노드가 있어 재발급하지 않습니다: {', '.join(untracked)} "
+                        f"(새 CA 를 먼저 모든 노드에 배포해야 합니다)")
+            return False
+        log_message("⚠️ CA 가 없습니다. 새 CA 를 생성하고 모든 노드에 다시 전송합니다.")
+        if dry_run:
+            return True
+        pki.init_ca(cert_dir, cert_create.CA_COMMON_NAME, profile=cert_create.KEY_PROFILE)
+        ca_created = True
+    ca_key, ca_cert = pki.load_ca(cert_dir)
+    if ca_cert.not_valid_after_utc < datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+            days=renew_before_days):
+        log_message(f"⚠️ CA 만료 임박 ({ca_cert.not_valid_after_utc:%Y-%m-%d}): 자동 재발급하지 않습니다.")
+
+    specs = desired_certs()
+    stale = check(specs, ca_cert, renew_before_days, cert_dir)
+    if not stale:
+        log_message("✅ 모든 인증서가 최신입니다.")
+        refresh(cert_dir)
+        return True
+    for name, reason in sorted(stale.items()):
+        log_message(f"🔄 {name}: {reason}")
+    if dry_run:
+        return True
+
+    changed = ["ca.crt", "ca.key"] if ca_created else []
+    for name in sorted(stale):
+        spec = specs[name]
+        profile = (pki.service_account_profile(cert_create.KEY_PROFILE) if name == "service-account"
+                   else cert_create.KEY_PROFILE)
+        pki.issue_to_dir(cert_dir, name, spec["common_name"], spec["organization"], spec["dns"], spec["ips"],
+                         spec["days"], profile=profile)
+        changed += [f"{name}.crt", f"{name}.key"]
+
+    # 재발급한 클라이언트 인증서를 포함하는 kubeconfig 도 다시 만듭니다.
+    if stale.keys() & set(cert_create.KUBECONFIGS):
+        cert_create.create_kubeconfigs()
+        changed += [f"{name}.kubeconfig" for name in cert_create.KUBECONFIGS]
+    for node in worker_nodes():
+        if node["hostname"] in stale:
+            hostname = node["hostname"]
+            kubeconfig.write_kubeconfig(
+                os.path.join(cert_dir, f"{hostname}.kubeconfig"), cert_create.KUBE_CLUSTER_NAME,
+                f"https://{cert_create.KUBE_API_SERVER_ADDRESS}:6443", os.path.join(cert_dir, "ca.crt"),
+                f"system:node:{hostname}", os.path.join(cert_dir, f"{hostname}.crt"),
+                os.path.join(cert_dir, f"{hostname}.key"))
+            changed.append(f"{hostname}.kubeconfig")
+
+    refresh(cert_dir)
+    log_message(f"✅ {len(stale)}개 인증서 재발급 완료")
+    return redistribute(changed, cert_dir)
+
+
+# 인벤토리 출력
+def show(cert_dir=CERT_DIR):
+    certs = refresh(cert_dir)
+    files = load()["files"]
+    print(f"{'name':<28} {'expires':<11} {'serial':<12} hosts")
+    for name, info in certs.items():
+        hosts = sorted(files.get(f"{name}.crt", {}))
+        print(f"{name:<28} {info['not_after'][:10]:<11} {info['serial'][:10]:<12} {', '.join(hosts) or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="인증서 인벤토리")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("show", help="인증서 목록과 전송된 노드 출력")
+    reconcile_parser = subparsers.add_parser("reconcile", help="없거나 만료 임박, SAN 이 다른 인증서만 재발급")
+    reconcile_parser.add_argument("--dry-run", action="store_true")
+    reconcile_parser.add_argument("--renew-before-days", type=int, default=RENEW_BEFORE_DAYS)
+    args = parser.parse_args()
+    if args.command == "show":
+        show()
+    else:
+        raise SystemExit(0 if reconcile(args.dry_run, args.renew_before_days) else 1)
@@ -1,6 +1,7 @@
+import argparse
 import os
-import paramiko
-from scp import SCPClient
+import cert_inventory
+import tar_transfer
 
 # 설정
 WORKER_NODES = [
@@ -25,32 +26,31 @@ def log_message(message):
     print(message)
 
 # 파일 전송 함수
-def transfer_files_to_worker(worker):
+# full 이 아니면 노드의 sha256 을 먼저 조회해 내용이나 권한이 다른 파일만 보냅니다.
+def transfer_files_to_worker(worker, full=False):
     log_message(f"📦 {worker['hostname']}({worker['ip']})로 파일 전송 중...")
 
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(hostname=worker["ip"], username=SSH_USER, password=SSH_PASSWORD)
+        sources = [(os.path.join(CERTS_DIR, file_name), f"{DEST_DIR}/ssl/{file_name}")
+                   for file_name in SSL_FILES_TO_TRANSFER]
+        sources += [(os.path.join(CERTS_DIR, file_name), f"{DEST_DIR}/{file_name}")
+                    for file_name in KUBE_FILES_TO_TRANSFER]
 
-        with SCPClient(ssh.get_transport()) as scp:
-            # SSL 디렉토리 생성 및 파일 전송
-            ssh.exec_command(f"mkdir -p {DEST_DIR}/ssl")
-            for file_name in SSL_FILES_TO_TRANSFER:
-                src_path = os.path.join(CERTS_DIR, file_name)
-                dest_path = f"{DEST_DIR}/ssl/{file_name}"
-                scp.put(src_path, dest_path)
-                log_message(f"✅ {file_name} 전송 완료: {src_path} -> {dest_path}")
+        # SSL 파일과 kube-proxy.kubeconfig 를 tar 하나로 전송 (디렉토리 생성 포함)
+        files = tar_transfer.read_files(sources)
+        if full:
+            tar_transfer.send(worker["ip"], SSH_USER, SSH_PASSWORD, files)
+            changed = [dest_path for dest_path, _, _ in files]
+        else:
+            changed, _ = tar_transfer.sync(worker["ip"], SSH_USER, SSH_PASSWORD, files)
+        deliveries = {}
+        for src_path, dest_path in sources:
+            deliveries[os.path.basename(src_path)] = dest_path
+            if dest_path in changed:
+                log_message(f"✅ {os.path.basename(src_path)} 전송 완료: {src_path} -> {dest_path}")
+        log_message(f"📋 {worker['hostname']}({worker['ip']}): 변경 {len(changed)}개, 동일 {len(sources) - len(changed)}개")
 
-            # kube-proxy.kubeconfig 파일 전송
-            ssh.exec_command(f"mkdir -p {DEST_DIR}")
-            for file_name in KUBE_FILES_TO_TRANSFER:
-                src_path = os.path.join(CERTS_DIR, file_name)
-                dest_path = f"{DEST_DIR}/{file_name}"
-                scp.put(src_path, dest_path)
-                log_message(f"✅ {file_name} 전송 완료: {src_path} -> {dest_path}")
-
-        ssh.close()
+        cert_inventory.record_deliveries(worker["ip"], deliveries, CERTS_DIR)
         log_message(f"✅ {worker['hostname']}({worker['ip']})로 모든 파일 전송 완료")
 
     except Exception as e:
@@ -59,9 +59,13 @@ def transfer_files_to_worker(worker):
 
 # 메인 함수
 def main():
+    parser = argparse.ArgumentParser(description="서브 워커 노드로 인증서 전송")
+    parser.add_argument("--full", action="store_true", help="노드의 파일과 비교하지 않고 모두 다시 전송")
+    args = parser.parse_args()
+
     log_message("=== 파일 전송 스크립트 시작 ===")
     for worker in WORKER_NODES:
-        transfer_files_to_worker(worker)
+        transfer_files_to_worker(worker, args.full)
     log_message("=== 모든 파일 전송 완료 ===")
 
 if __name__ == "__main__":
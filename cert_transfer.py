@@ -1,6 +1,11 @@
+import argparse
 import os
-import paramiko
-from scp import SCPClient
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import cert_inventory
+import ssh_pool
+import tar_transfer
 import time
 
 # 설정
@@ -19,14 +24,27 @@ CERT_DIR = "/root/hardway/certs"
 LOG_FILE = f"{CERT_DIR}/node_cert_transfer.log"
 SSH_USER = "root"
 SSH_PASSWORD = "1234"
+TRANSFER_CONCURRENCY = int(os.environ.get("HARDWAY_TRANSFER_CONCURRENCY", "6"))  # 동시에 전송할 노드 수
+NODE_TIMEOUT = int(os.environ.get("HARDWAY_TRANSFER_TIMEOUT", "120"))  # 노드 하나의 전체 전송 제한 시간(초, 조회+전송 합계)
+MASTER_CERT_FILES = [
+    "ca.crt", "ca.key", "kube-apiserver.key", "kube-apiserver.crt",
+    "service-account.key", "service-account.crt",
+    "etcd-server.key", "etcd-server.crt",
+    "admin.kubeconfig", "kube-controller-manager.kubeconfig", "kube-scheduler.kubeconfig"
+]
+WORKER_CERT_FILES = ["ca.crt", "kube-proxy.kubeconfig"]
+REMOTE_CERT_DIR = "/home/ubuntu/hardway/certs"
+
+_log_lock = threading.Lock()
 
 
 # 로그 작성 함수
 def log_message(message):
     timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-    with open(LOG_FILE, "a", encoding="utf-8") as log:
-        log.write(f"{timestamp} - {message}\n")
-    print(message)
+    with _log_lock:
+        with open(LOG_FILE, "a", encoding="utf-8") as log:
+            log.write(f"{timestamp} - {message}\n")
+        print(message, flush=True)
 
 
 # 디렉토리 생성 함수
@@ -38,50 +56,76 @@ def create_cert_directory():
         log_message(f"⚠️ 디렉토리가 이미 존재합니다: {CERT_DIR}")
 
 
-# 인증서 전송 함수
-def transfer_certificates():
-    log_message("🔄 모든 노드로 인증서 전송 시작...")
-
+# 노드 하나로 인증서 전송
+# 노드의 파일 묶음을 tar 하나로 보내 한 번의 왕복으로 설치합니다.
+# 조회와 전송을 합쳐 timeout 초 안에 끝나지 않으면 (조금씩 계속 전송되는 경우 포함) TimeoutError 를 냅니다.
+# full 이 아니면 노드의 sha256 을 먼저 한 번에 조회해 내용이나 권한이 다른 파일만 보냅니다.
+def transfer_node_certificates(node, timeout=NODE_TIMEOUT, full=False):
+    deadline = time.monotonic() + timeout
+    cert_files = MASTER_CERT_FILES if "master" in node["hostname"] else WORKER_CERT_FILES
+    sources = [(os.path.join(CERT_DIR, cert), f"{REMOTE_CERT_DIR}/{cert}") for cert in cert_files]
+    files = tar_transfer.read_files(sources)
     try:
-        for node in ALL_NODES:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(hostname=node["ip"], username=SSH_USER, password=SSH_PASSWORD)
-
-            with SCPClient(ssh.get_transport()) as scp:
-                ssh.exec_command("mkdir -p /home/ubuntu/hardway/certs")
-
-                if "master" in node["hostname"]:
-                    cert_files = [
-                        "ca.crt", "ca.key", "kube-apiserver.key", "kube-apiserver.crt",
-                        "service-account.key", "service-account.crt",
-                        "etcd-server.key", "etcd-server.crt",
-                        "admin.kubeconfig", "kube-controller-manager.kubeconfig", "kube-scheduler.kubeconfig"
-                    ]
-                else:
-                    cert_files = ["ca.crt", "kube-proxy.kubeconfig"]
+        if full:
+            tar_transfer.send(node["ip"], SSH_USER, SSH_PASSWORD, files, timeout=timeout, deadline=deadline)
+            changed = [dest_path for dest_path, _, _ in files]
+        else:
+            changed, _ = tar_transfer.sync(node["ip"], SSH_USER, SSH_PASSWORD, files, timeout=timeout,
+                                           deadline=deadline)
+    except (socket.timeout, TimeoutError) as e:
+        raise TimeoutError(f"{timeout}초 안에 전송을 마치지 못했습니다") from e
+    deliveries = {cert: dest_path for cert, (_, dest_path) in zip(cert_files, sources)}
+    if changed:
+        log_message(f"✅ {len(changed)}개 파일 전송 완료: {node['hostname']}({node['ip']}) -> {REMOTE_CERT_DIR}")
+    return deliveries, [os.path.basename(dest_path) for dest_path in changed]
 
-                for cert in cert_files:
-                    src_path = os.path.join(CERT_DIR, cert)
-                    dest_path = f"/home/ubuntu/hardway/certs/{cert}"
-                    scp.put(src_path, dest_path)
-                    log_message(f"✅ {cert} 전송 완료: {node['hostname']}({node['ip']}) -> {dest_path}")
 
-            ssh.close()
-
-    except Exception as e:
-        log_message(f"❌ 인증서 전송 실패: {e}")
-        raise
-
-    log_message("✅ 모든 노드로 인증서 전송 완료")
+# 인증서 전송 함수
+# 노드별로 동시에 전송하고, 한 노드가 실패해도 나머지는 계속 진행한 뒤 결과를 모아 보고합니다.
+def transfer_certificates(nodes=ALL_NODES, max_workers=TRANSFER_CONCURRENCY, timeout=NODE_TIMEOUT, full=False):
+    mode = "전체 전송" if full else "변경분만 전송"
+    log_message(f"🔄 모든 노드로 인증서 전송 시작... ({mode}, 동시 {max_workers}개, 노드당 제한 {timeout}s)")
+
+    results, deliveries = {}, {}
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(transfer_node_certificates, node, timeout, full): node for node in nodes}
+        for future in as_completed(futures):
+            node = futures[future]
+            try:
+                deliveries[node["ip"]], changed = future.result()
+                detail = f"변경 {len(changed)}개" + (f" ({', '.join(changed)})" if changed else "")
+                results[node["hostname"]] = (True, f"{detail}, 동일 {len(deliveries[node['ip']]) - len(changed)}개")
+            except Exception as e:
+                results[node["hostname"]] = (False, f"{type(e).__name__}: {e}")
+                log_message(f"❌ {node['hostname']}({node['ip']}) 인증서 전송 실패: {e}")
+                ssh_pool.invalidate(node["ip"], SSH_USER)
+    cert_inventory.record_bulk_deliveries(deliveries, CERT_DIR)
+
+    log_message("📋 노드별 전송 결과")
+    for node in nodes:
+        succeeded, detail = results[node["hostname"]]
+        log_message(f"  {'✅' if succeeded else '❌'} {node['hostname']}({node['ip']}): {detail}")
+    failed = [hostname for hostname, (succeeded, _) in results.items() if not succeeded]
+    if failed:
+        log_message(f"❌ {len(failed)}/{len(nodes)}개 노드 전송 실패: {', '.join(sorted(failed))}")
+    else:
+        log_message(f"✅ 모든 노드로 인증서 전송 완료 ({time.monotonic() - started:.1f}s)")
+    return failed
 
 
 # 메인 함수
 def main():
+    parser = argparse.ArgumentParser(description="노드로 인증서 전송")
+    parser.add_argument("--full", action="store_true", help="노드의 파일과 비교하지 않고 모두 다시 전송")
+    args = parser.parse_args()
+
     log_message("=== 인증서 전송 스크립트 시작 ===")
     create_cert_directory()
-    transfer_certificates()
+    failed = transfer_certificates(full=args.full)
     log_message("=== 인증서 전송 스크립트 완료 ===")
+    if failed:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
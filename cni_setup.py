@@ -1,6 +1,8 @@
 import os
 import subprocess
 import time
+import artifact_cache
+import tracing
 
 # 설정
 HELM_VERSION = "v3.9.4"
@@ -19,19 +21,19 @@ def log_message(message):
 
 # 명령 실행 함수
 def run_command(command):
-    try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        log_message(result.stdout.decode().strip())
-    except subprocess.CalledProcessError as e:
-        log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
-        raise
+    with tracing.span(command, category="command"):
+        try:
+            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            log_message(result.stdout.decode().strip())
+        except subprocess.CalledProcessError as e:
+            log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
+            raise
 
 # Helm 설치 함수
 def install_helm():
     log_message("🔄 Helm 설치 중...")
-    helm_tarball = "/tmp/helm.tar.gz"
     if not os.path.exists(HELM_BINARY):
-        run_command(f"wget -q -O {helm_tarball} {HELM_URL}")
+        helm_tarball = artifact_cache.fetch(HELM_URL)
         run_command(f"tar -xvf {helm_tarball} -C /tmp")
         run_command(f"mv /tmp/linux-amd64/helm {HELM_BINARY}")
         log_message("✅ Helm 설치 완료")
@@ -1,6 +1,10 @@
 import os
 import subprocess
 import time
+import artifact_cache
+import downloader
+import step_state
+import tracing
 
 # 설정
 KUBE_VERSION = "v1.29.7"
@@ -31,35 +35,30 @@ def log_and_print(message):
 
 # 명령 실행 함수
 def run_command(command):
-    try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        log_and_print(result.stdout.decode().strip())
-    except subprocess.CalledProcessError as e:
-        log_and_print(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
-        raise
+    with tracing.span(command, category="command"):
+        try:
+            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            log_and_print(result.stdout.decode().strip())
+        except subprocess.CalledProcessError as e:
+            log_and_print(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
+            raise
 
 # 바이너리 다운로드 및 설치
 def download_and_install_binaries():
     log_and_print("🔄 Kubernetes 바이너리 다운로드 및 설치 중...")
     os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
-    for binary in BINARIES:
-        binary_path = os.path.join(DOWNLOAD_DIR, binary)
-        install_path = os.path.join(INSTALL_DIR, binary)
-
-        if os.path.exists(install_path):
-            log_and_print(f"✅ {binary} 이미 설치됨: {install_path}")
-            continue
-
-        if not os.path.exists(binary_path):
-            run_command(f"wget -q -O {binary_path} {DOWNLOAD_URL}{binary}")
-            log_and_print(f"✅ {binary} 다운로드 완료: {binary_path}")
-        else:
-            log_and_print(f"⚠️ {binary} 이미 다운로드됨: {binary_path}")
-
-        run_command(f"chmod +x {binary_path}")
-        run_command(f"sudo mv {binary_path} {INSTALL_DIR}/")
-        log_and_print(f"✅ {binary} 설치 완료: {install_path}")
+    # 모든 바이너리를 동시에 받아 공개된 sha256 으로 확인한 뒤 설치합니다.
+    # 이미 설치된 파일이 공개된 sha256 과 같으면 그대로 두고, 다르면 (예: KUBE_VERSION 변경) 교체합니다.
+    # DOWNLOAD_DIR 에 미리 배포된 파일이 있으면 내려받지 않고 그 파일을 사용합니다.
+    jobs = [{"url": artifact_cache.mirror_url(DOWNLOAD_URL + binary), "dest": os.path.join(INSTALL_DIR, binary),
+             "staged": os.path.join(DOWNLOAD_DIR, binary)} for binary in BINARIES]
+    with tracing.span(f"download {len(jobs)} binaries", category="command"):
+        installed = downloader.download_all(jobs)
+    for job in jobs:
+        if os.path.exists(job["staged"]):
+            os.remove(job["staged"])
+    log_and_print(f"✅ 바이너리 {len(installed)}개 설치, {len(jobs) - len(installed)}개 최신 유지")
 
 # 인증서 및 kubeconfig 파일 복사, 공개키 생성 추가
 def setup_certificates_and_kubeconfigs():
@@ -84,7 +83,7 @@ def setup_certificates_and_kubeconfigs():
     service_account_key = "/etc/kubernetes/ssl/service-account.key"
     service_account_pub = "/etc/kubernetes/ssl/service-account.pub"
     if not os.path.exists(service_account_pub):
-        run_command(f"openssl rsa -in {service_account_key} -pubout -out {service_account_pub}")
+        run_command(f"openssl pkey -in {service_account_key} -pubout -out {service_account_pub}")
         log_and_print(f"✅ 공개키 생성 완료: {service_account_pub}")
     else:
         log_and_print(f"⚠️ {service_account_pub} 파일이 이미 존재합니다.")
@@ -189,7 +188,10 @@ def start_services():
 # 메인 함수
 def main():
     log_and_print("=== Kubernetes Control Plane 설정 시작 ===")
-    download_and_install_binaries()
+    step_state.run_step("install_control_plane_binaries", {"version": KUBE_VERSION, "binaries": BINARIES},
+                        download_and_install_binaries,
+                        postcondition=lambda: all(os.path.exists(os.path.join(INSTALL_DIR, b)) for b in BINARIES),
+                        log=log_and_print)
     setup_certificates_and_kubeconfigs()
     create_systemd_services()
     start_services()
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import urllib.error
+import urllib.request
+
+import kubeconfig
+
+# 설정
+SIGNER_URL = os.environ.get("HARDWAY_SIGNER_URL", "https://172.31.1.1:8443")  # Bastion CSR 서명 서비스 주소로 바꾸세요.
+BOOTSTRAP_TOKEN = os.environ.get("HARDWAY_BOOTSTRAP_TOKEN", "07401b.f395accd246ae52d")
+KEY_PROFILE = os.environ.get("HARDWAY_KEY_PROFILE", "rsa-2048")
+CA_FILE = "/etc/kubernetes/ssl/ca.crt"
+SSL_DIR = "/etc/kubernetes/ssl"
+KUBE_DIR = "/etc/kubernetes"
+CLUSTER_NAME = "minje-k8s-hardway"
+API_SERVER = "https://172.31.1.8:6443"
+REQUEST_TIMEOUT = 30
+
+# 키 프로필별 openssl req 옵션
+OPENSSL_NEWKEY = {
+    "rsa-2048": ["-newkey", "rsa:2048"],
+    "rsa-4096": ["-newkey", "rsa:4096"],
+    "ecdsa-p256": ["-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1"],
+    "ed25519": ["-newkey", "ed25519"],
+}
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(message, flush=True)
+
+
+# 노드에서 키와 CSR 생성 (개인 키는 노드 밖으로 나가지 않습니다)
+def create_csr(hostname, ip, profile=KEY_PROFILE):
+    with tempfile.TemporaryDirectory() as work_dir:
+        key_path = os.path.join(work_dir, "node.key")
+        result = subprocess.run(["openssl", "req", "-new", "-nodes", *OPENSSL_NEWKEY[profile],
+                                 "-keyout", key_path, "-subj", f"/CN=system:node:{hostname}/O=system:nodes",
+                                 "-addext", f"subjectAltName=DNS:{hostname},IP:{ip}"],
+                                check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with open(key_path, "rb") as f:
+            return f.read(), result.stdout
+
+
+# 서명 요청
+# 성공하면 {"certificate": PEM, "ca": PEM} 을 돌려줍니다.
+def request_certificate(csr_pem, signer_url=SIGNER_URL, token=BOOTSTRAP_TOKEN, ca_file=CA_FILE):
+    context = ssl.create_default_context(cafile=ca_file)
+    request = urllib.request.Request(f"{signer_url}/sign", data=csr_pem, method="POST",
+                                     headers={"Authorization": f"Bearer {token}",
+                                              "Content-Type": "application/pkcs10"})
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT, context=context) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"서명 거부 ({e.code}): {e.read().decode(errors='replace').strip()}") from e
+
+
+def _write(path, data, mode):
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+# 노드 등록: 키/CSR 생성 -> 서명 요청 -> 인증서와 kubeconfig 저장
+def enroll(hostname, ip, signer_url=SIGNER_URL, token=BOOTSTRAP_TOKEN, ca_file=CA_FILE,
+           ssl_dir=SSL_DIR, kube_dir=KUBE_DIR, profile=KEY_PROFILE):
+    key_pem, csr_pem = create_csr(hostname, ip, profile)
+    response = request_certificate(csr_pem, signer_url, token, ca_file)
+    cert_pem = response["certificate"].encode("ascii")
+
+    os.makedirs(ssl_dir, exist_ok=True)
+    _write(os.path.join(ssl_dir, f"{hostname}.key"), key_pem, 0o600)
+    _write(os.path.join(ssl_dir, f"{hostname}.crt"), cert_pem, 0o644)
+    kubeconfig.write(os.path.join(kube_dir, f"{hostname}.kubeconfig"),
+                     kubeconfig.render(CLUSTER_NAME, API_SERVER, response["ca"].encode("ascii"),
+                                       f"system:node:{hostname}", cert_pem, key_pem))
+    log_message(f"✅ {hostname} 인증서 발급 완료 (serial {response.get('serial', '?')})")
+    return cert_pem
+
+
+def _default_ip():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect((API_SERVER.split("//")[1].split(":")[0], 6443))
+        return sock.getsockname()[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bastion CSR 서명 서비스로 노드 인증서 발급")
+    parser.add_argument("--hostname", default=socket.gethostname())
+    parser.add_argument("--ip")
+    parser.add_argument("--signer-url", default=SIGNER_URL)
+    parser.add_argument("--profile", choices=sorted(OPENSSL_NEWKEY), default=KEY_PROFILE)
+    args = parser.parse_args()
+    try:
+        enroll(args.hostname, args.ip or _default_ip(), args.signer_url, profile=args.profile)
+    except Exception as e:
+        log_message(f"❌ 인증서 발급 실패: {e}")
+        sys.exit(1)
@@ -0,0 +1,293 @@
+import argparse
+import datetime
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import ssl
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.x509.oid import NameOID
+
+import csr_enroll
+import pki
+
+# 설정
+CERT_DIR = "/root/hardway/certs"
+BIND_ADDRESS = "0.0.0.0"
+PORT = 8443
+BOOTSTRAP_TOKEN = os.environ.get("HARDWAY_BOOTSTRAP_TOKEN", "07401b.f395accd246ae52d")  # tls_setup.py 의 토큰
+SERVICE_CERT_NAME = "csr-signing-service"
+AUDIT_LOG = "/root/hardway/logs/csr-audit.jsonl"
+RATE_PER_SECOND = 2.0  # 클라이언트 IP 당 초당 허용 요청 수
+RATE_BURST = 10  # 클라이언트 IP 당 순간 허용 요청 수
+MAX_CSR_BYTES = 16 * 1024
+NODE_ORGANIZATION = "system:nodes"
+NODE_PREFIX = "system:node:"
+REQUEST_TIMEOUT = 10  # 연결 하나가 TLS 핸드셰이크와 요청을 마쳐야 하는 시간 (초)
+RENEW_BEFORE_DAYS = 30  # 서비스 인증서 만료까지 이 기간보다 적게 남으면 새로 발급
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[SIGNER]: {message}", flush=True)
+
+
+# 클라이언트 IP 별 토큰 버킷
+class RateLimiter:
+    def __init__(self, rate=RATE_PER_SECOND, burst=RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def allow(self, client):
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self.buckets[client] = (tokens, now)
+                return False
+            self.buckets[client] = (tokens - 1, now)
+            return True
+
+
+# 감사 로그 (JSON lines)
+class AuditLog:
+    def __init__(self, path=AUDIT_LOG):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(self, **record):
+        line = json.dumps(dict(time=time.strftime("%Y-%m-%dT%H:%M:%S"), **record), ensure_ascii=False)
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class SigningError(Exception):
+    def __init__(self, status, reason):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+# CSR 검증 후 서명
+# Subject 는 system:node:<이름> / system:nodes 여야 하고, IP SAN 은 요청을 보낸 노드 자신의 주소만 허용합니다.
+def sign_csr(csr_pem, client_ip, ca_key, ca_cert):
+    try:
+        csr = x509.load_pem_x509_csr(csr_pem)
+    except ValueError as e:
+        raise SigningError(400, f"CSR 파싱 실패: {e}")
+    if not csr.is_signature_valid:
+        raise SigningError(400, "CSR 서명이 올바르지 않습니다")
+
+    common_names = csr.subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+    organizations = [attribute.value for attribute in csr.subject.get_attributes_for_oid(NameOID.ORGANIZATION_NAME)]
+    common_name = common_names[0].value if common_names else ""
+    if not common_name.startswith(NODE_PREFIX) or organizations != [NODE_ORGANIZATION]:
+        raise SigningError(403, f"허용되지 않는 subject: {csr.subject.rfc4514_string()}")
+    hostname = common_name[len(NODE_PREFIX):]
+
+    try:
+        sans = csr.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+        dns_names = sans.get_values_for_type(x509.DNSName)
+        ip_addresses = [str(ip) for ip in sans.get_values_for_type(x509.IPAddress)]
+    except x509.ExtensionNotFound:
+        dns_names, ip_addresses = [], []
+    if any(name != hostname for name in dns_names):
+        raise SigningError(403, f"허용되지 않는 DNS SAN: {dns_names}")
+    if any(ipaddress.ip_address(ip) != ipaddress.ip_address(client_ip) for ip in ip_addresses):
+        raise SigningError(403, f"요청 주소({client_ip})와 다른 IP SAN: {ip_addresses}")
+
+    cert = pki.sign_public_key(ca_key, ca_cert, csr.public_key(), common_name, NODE_ORGANIZATION,
+                               dns_names, ip_addresses)
+    return hostname, cert
+
+
+def make_handler(ca_key, ca_cert, token, limiter, audit):
+    ca_pem = pki.cert_to_pem(ca_cert).decode("ascii")
+
+    class SigningHandler(BaseHTTPRequestHandler):
+        timeout = REQUEST_TIMEOUT
+
+        def _reply(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _reject(self, status, reason, **record):
+            audit.write(client=self.client_address[0], status=status, reason=reason, **record)
+            self._reply(status, {"error": reason})
+
+        def do_POST(self):
+            client_ip = self.client_address[0]
+            if self.path != "/sign":
+                return self._reject(404, "not found", path=self.path)
+            if not limiter.allow(client_ip):
+                return self._reject(429, "rate limited")
+            supplied = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8")):
+                return self._reject(401, "invalid bootstrap token")
+            length = int(self.headers.get("Content-Length") or 0)
+            if not 0 < length <= MAX_CSR_BYTES:
+                return self._reject(413 if length else 400, f"invalid CSR size {length}")
+
+            try:
+                hostname, cert = sign_csr(self.rfile.read(length), client_ip, ca_key, ca_cert)
+            except SigningError as e:
+                return self._reject(e.status, e.reason)
+            serial = format(cert.serial_number, "x")
+            audit.write(client=client_ip, status=200, node=hostname, serial=serial,
+                        not_after=cert.not_valid_after_utc.isoformat())
+            self._reply(200, {"certificate": pki.cert_to_pem(cert).decode("ascii"), "ca": ca_pem, "serial": serial})
+
+        def log_message(self, format, *args):
+            pass
+
+    return SigningHandler
+
+
+# 기존 서비스 인증서를 그대로 쓸 수 있는지 확인 (SAN 이 같고, 현재 CA 가 서명했고, 곧 만료되지 않음)
+def _service_certificate_current(cert_file, key_file, ca_cert, dns_names, ips):
+    if not (os.path.exists(cert_file) and os.path.exists(key_file)):
+        return False
+    with open(cert_file, "rb") as f:
+        cert = x509.load_pem_x509_certificate(f.read())
+    try:
+        sans = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+        cert.verify_directly_issued_by(ca_cert)
+    except (x509.ExtensionNotFound, InvalidSignature, ValueError, TypeError):
+        return False
+    renew_after = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=RENEW_BEFORE_DAYS)
+    return (sorted(sans.get_values_for_type(x509.DNSName)) == sorted(dns_names)
+            and sorted(str(ip) for ip in sans.get_values_for_type(x509.IPAddress)) == ips
+            and cert.not_valid_after_utc > renew_after)
+
+
+# 서비스용 서버 인증서 (CA 로 서명, 없거나 주소가 바뀌었거나 만료가 가까우면 새로 발급)
+def ensure_service_certificate(cert_dir, addresses):
+    ca_key, ca_cert = pki.load_ca(cert_dir)
+    dns_names = sorted({"localhost", socket.gethostname()})
+    ips = sorted(str(ipaddress.ip_address(ip)) for ip in {"127.0.0.1", *addresses})
+    cert_file = os.path.join(cert_dir, f"{SERVICE_CERT_NAME}.crt")
+    key_file = os.path.join(cert_dir, f"{SERVICE_CERT_NAME}.key")
+    if _service_certificate_current(cert_file, key_file, ca_cert, dns_names, ips):
+        log_message(f"✅ 기존 서비스 인증서 사용: {cert_file}")
+    else:
+        pki.issue_to_dir(cert_dir, SERVICE_CERT_NAME, SERVICE_CERT_NAME, dns_names=dns_names, ip_addresses=ips)
+        log_message(f"✅ 서비스 인증서 발급: {cert_file} ({', '.join(dns_names + ips)})")
+    return cert_file, key_file
+
+
+# HTTPS 서버
+# 수락 루프에서는 소켓만 감싸고, TLS 핸드셰이크는 요청마다 만들어지는 스레드에서 시간 제한을 두고 수행합니다.
+# (핸드셰이크를 끝내지 않는 클라이언트 하나가 다른 노드의 등록을 막지 않도록)
+class TLSServer(ThreadingHTTPServer):
+    def __init__(self, address, handler, context):
+        super().__init__(address, handler)
+        self.context = context
+
+    def get_request(self):
+        connection, address = self.socket.accept()
+        return self.context.wrap_socket(connection, server_side=True, do_handshake_on_connect=False), address
+
+    def finish_request(self, request, client_address):
+        request.settimeout(REQUEST_TIMEOUT)
+        try:
+            request.do_handshake()
+        except (ssl.SSLError, OSError):
+            return
+        super().finish_request(request, client_address)
+
+
+# HTTPS 서버 생성 (CA 는 시작할 때 한 번만 읽어 메모리에 둡니다)
+def create_server(cert_dir=CERT_DIR, bind=BIND_ADDRESS, port=PORT, token=BOOTSTRAP_TOKEN, addresses=(),
+                  rate=RATE_PER_SECOND, burst=RATE_BURST, audit_log=AUDIT_LOG):
+    ca_key, ca_cert = pki.load_ca(cert_dir)
+    cert_file, key_file = ensure_service_certificate(cert_dir, addresses)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+
+    handler = make_handler(ca_key, ca_cert, token, RateLimiter(rate, burst), AuditLog(audit_log))
+    return TLSServer((bind, port), handler, context)
+
+
+def serve(args):
+    server = create_server(bind=args.bind, port=args.port, addresses=args.address)
+    log_message(f"🚀 CSR 서명 서비스 시작: https://{args.bind}:{args.port}/sign (감사 로그: {AUDIT_LOG})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# localhost 자체 점검
+# 임시 CA 로 서비스를 띄우고 노드 클라이언트(csr_enroll)로 동시에 등록해 처리량을 확인합니다.
+def selftest(nodes, concurrency, profile):
+    with tempfile.TemporaryDirectory() as work_dir:
+        pki.init_ca(work_dir, profile=profile)
+        server = create_server(work_dir, "127.0.0.1", 0, rate=1e9, burst=1e9,
+                               audit_log=os.path.join(work_dir, "audit.jsonl"))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"https://127.0.0.1:{server.server_address[1]}"
+
+        def enroll(index):
+            node_dir = os.path.join(work_dir, f"node{index}")
+            return csr_enroll.enroll(f"node{index:04d}", "127.0.0.1", url, ca_file=os.path.join(work_dir, "ca.crt"),
+                                     ssl_dir=node_dir, kube_dir=node_dir, profile=profile)
+
+        started = time.perf_counter()
+        failures = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in as_completed([executor.submit(enroll, index) for index in range(nodes)]):
+                try:
+                    future.result()
+                except Exception as e:
+                    failures += 1
+                    log_message(f"❌ {e}")
+        elapsed = time.perf_counter() - started
+
+        try:
+            csr_enroll.request_certificate(b"", url, "bad.token", os.path.join(work_dir, "ca.crt"))
+            log_message("❌ 잘못된 토큰이 거부되지 않았습니다")
+            failures += 1
+        except RuntimeError as e:
+            log_message(f"✅ 잘못된 토큰 거부 확인: {e}")
+        server.shutdown()
+        with open(os.path.join(work_dir, "audit.jsonl"), encoding="utf-8") as f:
+            audited = sum(1 for _ in f)
+    log_message(f"📋 {nodes}개 노드 등록: {elapsed:.2f}s ({nodes / elapsed:.0f} nodes/s), 실패 {failures}, 감사 기록 {audited}건")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bastion CSR 서명 서비스")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("--bind", default=BIND_ADDRESS)
+    serve_parser.add_argument("--port", type=int, default=PORT)
+    serve_parser.add_argument("--address", action="append", default=[],
+                              help="노드가 접속할 Bastion IP (서버 인증서 SAN 에 추가, 여러 번 지정 가능)")
+    selftest_parser = subparsers.add_parser("selftest", help="localhost 에서 동시 등록 점검")
+    selftest_parser.add_argument("--nodes", type=int, default=100)
+    selftest_parser.add_argument("--concurrency", type=int, default=16)
+    selftest_parser.add_argument("--profile", choices=pki.KEY_PROFILES, default="ecdsa-p256")
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+    else:
+        raise SystemExit(0 if selftest(args.nodes, args.concurrency, args.profile) else 1)
@@ -0,0 +1,157 @@
+import argparse
+import hashlib
+import http.client
+import os
+import shutil
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 설정
+DOWNLOAD_WORKERS = 6  # 동시에 내려받는 파일 수
+CHUNK_SIZE = 1024 * 1024
+TIMEOUT = 60
+RETRIES = 5  # 끊기면 받은 곳부터 이어받기를 다시 시도하는 횟수
+RETRY_DELAY = 2
+# 공개된 체크섬 위치 (앞에서부터 시도)
+# Kubernetes/CNI 는 <파일>.sha256, Helm 은 <파일>.sha256sum, etcd 는 같은 디렉토리의 SHA256SUMS 를 제공합니다.
+CHECKSUM_SUFFIXES = [".sha256", ".sha256sum"]
+CHECKSUM_LISTS = ["SHA256SUMS"]
+# 공개된 체크섬을 찾지 못한 파일도 설치할지 여부 (기본값: 설치하지 않고 오류)
+ALLOW_UNVERIFIED = os.environ.get("HARDWAY_ALLOW_UNVERIFIED", "").lower() in ("1", "true", "yes")
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[DOWNLOAD]: {message}", flush=True)
+
+
+def _read_url(url):
+    with urllib.request.urlopen(url, timeout=TIMEOUT) as response:
+        return response.read().decode("utf-8", errors="replace")
+
+
+# 공개된 sha256 조회 (없으면 None)
+def published_sha256(url):
+    name = os.path.basename(url)
+    for suffix in CHECKSUM_SUFFIXES:
+        try:
+            return _read_url(f"{url}{suffix}").split()[0].lower()
+        except (OSError, IndexError):
+            continue
+    for list_name in CHECKSUM_LISTS:
+        try:
+            lines = _read_url(f"{url.rsplit('/', 1)[0]}/{list_name}").splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if len(fields) == 2 and fields[1].lstrip("*") == name:
+                return fields[0].lower()
+    return None
+
+
+def _hash_file(path, digest):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+
+# .part 파일로 이어받기
+# 이미 받은 부분은 다시 해시만 하고, 서버가 Range 를 지원하면 나머지만 받습니다.
+def _fetch_resumable(url, part_path):
+    for attempt in range(1, RETRIES + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        request = urllib.request.Request(url, headers={"Range": f"bytes={offset}-"} if offset else {})
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+                if offset and response.status != 206:
+                    offset = 0  # Range 미지원: 처음부터 다시 받습니다.
+                digest = _hash_file(part_path, hashlib.sha256()) if offset else hashlib.sha256()
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                        f.write(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+                length = response.headers.get("Content-Length")
+                if length is not None and os.path.getsize(part_path) != offset + int(length):
+                    raise http.client.IncompleteRead(b"", int(length))
+                return digest.hexdigest()
+        except urllib.error.HTTPError as e:
+            if e.code == 416:  # 이미 끝까지 받은 .part
+                return _hash_file(part_path, hashlib.sha256()).hexdigest()
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            if attempt == RETRIES:
+                raise
+            log_message(f"⚠️ {os.path.basename(url)}: {e}, 이어받기 재시도 ({attempt}/{RETRIES})")
+            time.sleep(RETRY_DELAY)
+
+
+# 파일 하나 내려받아 설치
+# 공개된 sha256 과 비교한 뒤 권한을 맞추고 rename 으로 교체합니다. (staged 가 있으면 내려받지 않고 그 파일을 사용)
+# dest 가 이미 같은 sha256 이면 그대로 두고 False, 새로 설치하면 True 를 돌려줍니다.
+# 공개된 체크섬이 없으면 ValueError 를 냅니다. allow_unverified (HARDWAY_ALLOW_UNVERIFIED) 로만 건너뛸 수 있습니다.
+def download(url, dest, mode=0o755, sha256=None, staged=None, allow_unverified=ALLOW_UNVERIFIED):
+    expected = sha256 or published_sha256(url)
+    if expected is None:
+        if not allow_unverified:
+            raise ValueError(f"{os.path.basename(url)}: 공개된 체크섬을 찾지 못했습니다 "
+                             f"(확인 없이 설치하려면 HARDWAY_ALLOW_UNVERIFIED=1)")
+        log_message(f"⚠️ {os.path.basename(url)}: 공개된 체크섬이 없어 무결성 확인 없이 설치합니다. (HARDWAY_ALLOW_UNVERIFIED)")
+    if os.path.exists(dest) and expected and _hash_file(dest, hashlib.sha256()).hexdigest() == expected:
+        log_message(f"✅ {os.path.basename(dest)} 이미 최신입니다: {dest}")
+        return False
+
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    part_path = f"{dest}.part"
+    if staged and os.path.exists(staged) and (
+            expected is None or _hash_file(staged, hashlib.sha256()).hexdigest() == expected):
+        shutil.copyfile(staged, part_path)
+        actual = _hash_file(part_path, hashlib.sha256()).hexdigest()
+        source = staged
+    else:
+        actual = _fetch_resumable(url, part_path)
+        source = url
+    if expected and actual != expected:
+        os.unlink(part_path)
+        raise ValueError(f"{os.path.basename(dest)} sha256 불일치: {actual} != {expected}")
+    os.chmod(part_path, mode)
+    os.replace(part_path, dest)
+    log_message(f"✅ {os.path.basename(dest)} 설치 완료: {dest} (출처: {source}, sha256 {actual[:16]})")
+    return True
+
+
+# 여러 파일 동시 다운로드
+# jobs: [{"url": ..., "dest": ..., "mode": 0o755, "staged": 미리 배포된 경로(선택)}]
+# 이미 설치된 파일은 공개된 sha256 과 같을 때만 그대로 두므로, 버전이 바뀌면 교체됩니다.
+# 반환값: 새로 설치한 dest 목록
+def download_all(jobs, max_workers=DOWNLOAD_WORKERS):
+    failed, installed = {}, []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        futures = {executor.submit(download, job["url"], job["dest"], job.get("mode", 0o755),
+                                   job.get("sha256"), job.get("staged")): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                if future.result():
+                    installed.append(futures[future]["dest"])
+            except Exception as e:
+                failed[futures[future]["dest"]] = e
+                log_message(f"❌ {futures[future]['url']} 다운로드 실패: {e}")
+    if failed:
+        raise RuntimeError(f"{len(failed)}개 파일 다운로드 실패: {', '.join(sorted(failed))}")
+    return sorted(installed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="병렬 이어받기 다운로더 (sha256 확인)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    get_parser = subparsers.add_parser("get")
+    get_parser.add_argument("items", nargs="+", metavar="URL=DEST")
+    get_parser.add_argument("--mode", default="0755")
+    args = parser.parse_args()
+    download_all([{"url": item.split("=", 1)[0], "dest": item.split("=", 1)[1], "mode": int(args.mode, 8)}
+                  for item in args.items])
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import getpass
+import json
+import os
+import shlex
+
+import async_engine
+import bundle
+import etcd_setup
+import etcd_tuning
+import step_state
+import tar_transfer
+
+# 설정
+SSH_USER = "root"
+PROFILE_FILE = "/root/hardway/state/etcd-tuning.json"  # Bastion 에 보관하는 클러스터 공통 etcd 설정
+MEASURE_TIMEOUT = 600  # 노드 하나의 측정 제한 시간 (초)
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[ETCD PROFILE]: {message}", flush=True)
+
+
+# 노드 출력을 호스트 이름과 함께 보여 주고, 측정 결과 줄만 따로 보관합니다.
+class MeasurementOutput(async_engine.NullOutput):
+    def __init__(self, host):
+        super().__init__(host)
+        self.measurement = None
+
+    def write_line(self, line, is_error=False):
+        super().write_line(line, is_error)
+        if line.startswith(etcd_tuning.MEASUREMENT_PREFIX):
+            self.measurement = json.loads(line[len(etcd_tuning.MEASUREMENT_PREFIX):])
+        else:
+            print(f"[{self.host}] {line}", flush=True)
+
+
+def _measure_command(bundle_path, host):
+    peers = [node["ip"] for node in etcd_setup.MASTER_NODES if node["ip"] != host]
+    options = [f"--data-dir={etcd_setup.ETCD_DATA_DIR}",
+               f"--threshold-ms={etcd_tuning.FSYNC_THRESHOLD_MS:g}", f"--mode={etcd_tuning.FSYNC_PREFLIGHT_MODE}"]
+    if etcd_setup.ETCD_WAL_DIR:
+        options.append(f"--wal-dir={etcd_setup.ETCD_WAL_DIR}")
+    return " ".join(["python3", bundle_path, "etcd_tuning", "--measure", *map(shlex.quote, options), *peers])
+
+
+async def _measure(backend, host):
+    output = MeasurementOutput(host)
+    status = await backend.run(host, _measure_command(await bundle.ensure_bundle(backend, host), host), output)
+    if status != 0 or output.measurement is None:
+        raise RuntimeError(f"{host} 측정 실패 (종료 코드 {status}): {' | '.join(output.tail)}")
+    return async_engine.make_result(host, "ok", status), output.measurement
+
+
+# 모든 master 에서 디스크 사전 점검과 피어 RTT 를 동시에 측정
+def measure_all(hosts, password):
+    backend = async_engine.ParamikoBackend(SSH_USER, password)
+    engine = async_engine.Engine(backend, host_timeout=MEASURE_TIMEOUT)
+    measurements = {}
+
+    async def task(backend, host):
+        result, measurements[host] = await _measure(backend, host)
+        return result
+
+    try:
+        results = asyncio.run(engine.run_on_hosts(hosts, task))
+    finally:
+        backend.close()
+    failed = sorted(host for host, result in results.items() if result["status"] != "ok")
+    if failed:
+        raise RuntimeError(f"{len(failed)}개 노드 측정 실패: {', '.join(failed)}")
+    return measurements
+
+
+# 측정 후 클러스터 공통 설정을 Bastion 에 저장
+def build_profile(password):
+    hosts = [node["ip"] for node in etcd_setup.MASTER_NODES]
+    log_message(f"🔄 {len(hosts)}개 master 에서 디스크/피어 RTT 측정 중...")
+    profile = etcd_tuning.cluster_profile(measure_all(hosts, password), log=log_message)
+    os.makedirs(os.path.dirname(PROFILE_FILE), exist_ok=True)
+    tmp_path = f"{PROFILE_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2, sort_keys=True, ensure_ascii=False)
+    os.replace(tmp_path, PROFILE_FILE)
+    log_message(f"✅ 클러스터 공통 etcd 설정 저장: {PROFILE_FILE}")
+
+
+# 같은 설정 파일을 모든 master 로 전송 (내용이 같으면 보내지 않음)
+def distribute(password):
+    with open(PROFILE_FILE, "rb") as f:
+        files = [(etcd_setup.ETCD_TUNING_FILE, f.read(), 0o644)]
+    failed = []
+    for node in etcd_setup.MASTER_NODES:
+        try:
+            changed, _ = tar_transfer.sync(node["ip"], SSH_USER, password, files, timeout=MEASURE_TIMEOUT)
+            log_message(f"✅ {node['name']}({node['ip']}): {'전송 완료' if changed else '변경 없음'}")
+        except Exception as e:
+            log_message(f"❌ {node['name']}({node['ip']}) 전송 실패: {e}")
+            failed.append(node["name"])
+    return failed
+
+
+# 메인 함수
+# 측정은 입력(노드 목록, 디렉토리, 사전 점검 기준)이 바뀌었거나 --retune 일 때만 다시 합니다.
+# 다시 측정하지 않으면 설정 값도 그대로이므로 각 노드의 etcd unit 도 다시 쓰이지 않습니다.
+def main():
+    parser = argparse.ArgumentParser(description="클러스터 공통 etcd 설정 측정 및 배포")
+    parser.add_argument("--retune", action="store_true", help="이전 측정값을 버리고 다시 측정합니다")
+    args = parser.parse_args()
+    password = os.environ.get("HARDWAY_SSH_PASSWORD") or getpass.getpass("\nSSH 비밀번호 입력: ")
+
+    if args.retune:
+        step_state.forget("etcd_cluster_profile")
+    inputs = {"masters": etcd_setup.MASTER_NODES, "data_dir": etcd_setup.ETCD_DATA_DIR,
+              "wal_dir": etcd_setup.ETCD_WAL_DIR, "threshold_ms": etcd_tuning.FSYNC_THRESHOLD_MS,
+              "mode": etcd_tuning.FSYNC_PREFLIGHT_MODE}
+    try:
+        step_state.run_step("etcd_cluster_profile", inputs, lambda: build_profile(password),
+                            postcondition=lambda: os.path.exists(PROFILE_FILE), log=log_message)
+    except RuntimeError as e:
+        log_message(f"❌ {e}")
+        raise SystemExit(1)
+    if distribute(password):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
+import json
 import os
 import subprocess
 import time
+import artifact_cache
+import downloader
+import step_state
+import tar_extract
+import tracing
 
 # 기본 설정
 ETCD_VERSION = "v3.5.17"
 ETCD_DOWNLOAD_URL = f"https://github.com/etcd-io/etcd/releases/download/{ETCD_VERSION}/etcd-{ETCD_VERSION}-linux-amd64.tar.gz"
 DOWNLOAD_DIR = "/home/ubuntu/hardway/certs"
 ETCD_BIN_DIR = "/usr/local/bin"
+ETCD_BINARIES = ["etcd", "etcdctl", "etcdutl"]  # 릴리스 압축 파일에서 설치할 파일
 ETCD_SSL_DIR = "/etc/ssl/etcd/ssl"
-ETCD_DATA_DIR = "/var/lib/etcd"
+ETCD_DATA_DIR = os.environ.get("HARDWAY_ETCD_DATA_DIR", "/var/lib/etcd")
+ETCD_WAL_DIR = os.environ.get("HARDWAY_ETCD_WAL_DIR", "")  # 전용 디스크에 WAL 을 둘 경우 (비우면 data-dir 안에 둠)
 SYSTEMD_SERVICE_FILE = "/etc/systemd/system/etcd.service"
+ETCD_TUNING_FILE = "/root/hardway/etcd-tuning.json"  # Bastion 의 etcd_profile.py 가 배포하는 클러스터 공통 설정
 LOG_FILE = "/root/hardway/etcd_setup.log"
 
 # 클러스터 설정
@@ -43,12 +52,13 @@ def log_and_print(message):
 
 # 명령 실행 함수
 def run_command(command):
-    try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        log_and_print(result.stdout.decode().strip())
-    except subprocess.CalledProcessError as e:
-        log_and_print(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
-        raise
+    with tracing.span(command, category="command"):
+        try:
+            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            log_and_print(result.stdout.decode().strip())
+        except subprocess.CalledProcessError as e:
+            log_and_print(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
+            raise
 
 # 환경 변수 설정 및 영구 적용
 def setup_environment_variables():
@@ -76,20 +86,16 @@ def install_etcd():
     log_and_print("🔄 etcd 다운로드 및 설치 중...")
     os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
+    # 미리 배포된 압축 파일이 있고 sha256 이 맞으면 다시 내려받지 않습니다.
     etcd_tarball = os.path.join(DOWNLOAD_DIR, f"etcd-{ETCD_VERSION}-linux-amd64.tar.gz")
-    if not os.path.exists(etcd_tarball):
-        run_command(f"wget -q -O {etcd_tarball} {ETCD_DOWNLOAD_URL}")
-        log_and_print(f"✅ etcd 다운로드 완료: {etcd_tarball}")
-    else:
-        log_and_print(f"✅ etcd 이미 다운로드됨: {etcd_tarball}")
-
-    extracted_dir = os.path.join(DOWNLOAD_DIR, f"etcd-{ETCD_VERSION}-linux-amd64")
-    if not os.path.exists(extracted_dir):
-        run_command(f"tar -xvf {etcd_tarball} -C {DOWNLOAD_DIR}")
-        run_command(f"mv {extracted_dir}/etcd* {ETCD_BIN_DIR}/")
-        log_and_print("✅ etcd 설치 완료")
-    else:
-        log_and_print(f"⚠️ etcd 디렉토리 이미 존재: {extracted_dir}")
+    with tracing.span("download etcd", category="command"):
+        downloader.download(artifact_cache.mirror_url(ETCD_DOWNLOAD_URL), etcd_tarball, mode=0o644)
+
+    # 필요한 바이너리만 설치 경로로 바로 풀고, 같은 파일은 건너뜁니다.
+    with tracing.span("extract etcd", category="command"):
+        results = tar_extract.extract(etcd_tarball, {binary: os.path.join(ETCD_BIN_DIR, binary)
+                                                     for binary in ETCD_BINARIES})
+    log_and_print(f"✅ etcd 설치 완료: {tar_extract.summarize(results)}")
 
 # 디렉토리 및 인증서 복사
 def setup_directories_and_certs():
@@ -97,6 +103,9 @@ def setup_directories_and_certs():
     os.makedirs(ETCD_SSL_DIR, exist_ok=True)
     os.makedirs(ETCD_DATA_DIR, exist_ok=True)
     run_command(f"chmod 700 {ETCD_DATA_DIR}")
+    if ETCD_WAL_DIR:
+        os.makedirs(ETCD_WAL_DIR, exist_ok=True)
+        run_command(f"chmod 700 {ETCD_WAL_DIR}")
 
     cert_files = ["ca.crt", "etcd-server.key", "etcd-server.crt"]
     for cert in cert_files:
@@ -108,8 +117,23 @@ def setup_directories_and_certs():
             run_command(f"cp {src} {dest}")
             log_and_print(f"✅ {cert} 복사 완료")
 
+# 클러스터 공통 etcd 설정 읽기
+# 디스크 사전 점검과 피어 RTT 측정은 Bastion 의 etcd_profile.py 가 모든 master 에서 미리 하고,
+# 가장 나쁜 값으로 정한 같은 설정을 모든 멤버에 배포합니다. (멤버마다 heartbeat/election timeout 이 같아야 함)
+def load_tuning():
+    try:
+        with open(ETCD_TUNING_FILE, encoding="utf-8") as f:
+            tuning = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RuntimeError(f"클러스터 공통 etcd 설정을 읽지 못했습니다: {ETCD_TUNING_FILE} "
+                           f"(Bastion 에서 etcd_profile.py 를 먼저 실행하세요): {e}")
+    for flag, value in tuning["flags"].items():
+        reason = tuning["reasons"].get(flag)
+        log_and_print(f"⚙️ --{flag}={value}" + (f" ({reason})" if reason else ""))
+    return tuning["flags"]
+
 # systemd 서비스 파일 생성
-def create_systemd_service():
+def create_systemd_service(flags):
     log_and_print("🔄 systemd 서비스 파일 생성 중...")
     internal_ip = subprocess.getoutput(
         "ip addr show ens33 | grep -w 'inet' | awk '{print $2}' | cut -d/ -f1 | head -n 1").strip()
@@ -118,6 +142,7 @@ def create_systemd_service():
     initial_cluster = ",".join([
         f"{node['name']}=https://{node['ip']}:2380" for node in MASTER_NODES
     ])
+    wal_dir_option = f"--wal-dir={ETCD_WAL_DIR} " if ETCD_WAL_DIR else ""
 
     service_content = f"""[Unit]
 Description=etcd
@@ -140,7 +165,13 @@ ExecStart=/usr/local/bin/etcd \
   --advertise-client-urls https://{internal_ip}:2379 \
   --initial-cluster-token {CLUSTER_NAME} \
   --initial-cluster-state new \
-  --data-dir={ETCD_DATA_DIR} \
+  --data-dir={ETCD_DATA_DIR} {wal_dir_option}\
+  --heartbeat-interval={flags['heartbeat-interval']} \
+  --election-timeout={flags['election-timeout']} \
+  --snapshot-count={flags['snapshot-count']} \
+  --quota-backend-bytes={flags['quota-backend-bytes']} \
+  --auto-compaction-mode={flags['auto-compaction-mode']} \
+  --auto-compaction-retention={flags['auto-compaction-retention']} \
   --initial-cluster {initial_cluster}
 Restart=on-failure
 RestartSec=5
@@ -161,13 +192,32 @@ def start_etcd_service():
     run_command("systemctl start etcd")
     log_and_print("✅ etcd 서비스 시작 완료")
 
+# unit 파일 반영
+# 이미 실행 중인 etcd 는 systemctl start 로는 새 플래그를 읽지 않으므로 다시 읽고 재시작합니다.
+# 재시작까지 성공해야 단계 지문이 기록되므로, 실패하면 다음 실행에서 다시 시도합니다.
+def apply_systemd_service(flags):
+    create_systemd_service(flags)
+    if subprocess.call(["systemctl", "is-active", "--quiet", "etcd"]) == 0:
+        log_and_print("🔄 etcd 설정 변경: 재시작 중...")
+        run_command("systemctl daemon-reload && systemctl restart etcd")
+        log_and_print("✅ etcd 재시작 완료")
+
 # 메인 함수
 def main():
     log_and_print("=== etcd 설정 시작 ===")
     setup_environment_variables()
-    install_etcd()
+    step_state.run_step("install_etcd",
+                        {"version": ETCD_VERSION, "url": ETCD_DOWNLOAD_URL, "binaries": ETCD_BINARIES}, install_etcd,
+                        postcondition=lambda: os.path.exists(os.path.join(ETCD_BIN_DIR, "etcd")),
+                        log=log_and_print)
     setup_directories_and_certs()
-    create_systemd_service()
+    # 공통 설정이 같으면 다시 실행해도 unit 파일을 다시 쓰지 않습니다.
+    flags = load_tuning()
+    step_state.run_step("etcd_systemd_service",
+                        {"flags": flags, "data_dir": ETCD_DATA_DIR, "wal_dir": ETCD_WAL_DIR,
+                         "cluster": MASTER_NODES, "cluster_name": CLUSTER_NAME},
+                        lambda: apply_systemd_service(flags),
+                        postcondition=lambda: os.path.exists(SYSTEMD_SERVICE_FILE), log=log_and_print)
     start_etcd_service()
     log_and_print("=== etcd 설정 완료 ===")
 
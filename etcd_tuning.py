@@ -0,0 +1,284 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import socket
+import statistics
+import tempfile
+import time
+
+# 설정
+RTT_PORT = 22  # etcd 가 아직 없으므로 피어의 sshd 로 TCP 연결 시간을 잽니다.
+RTT_SAMPLES = 10
+RTT_TIMEOUT = 2
+FSYNC_SAMPLES = 2000  # p99.9 를 의미 있게 보려면 1000 회 이상 필요합니다.
+FSYNC_BLOCK_SIZE = 2300  # etcd 권장 fio 점검과 같은 레코드 크기
+WAL_SEGMENT_BYTES = 64 * 1024 * 1024  # etcd WAL 세그먼트처럼 미리 할당한 파일에 순차 기록
+FSYNC_THRESHOLD_MS = float(os.environ.get("HARDWAY_ETCD_FSYNC_P99_MS", "10"))  # 사전 점검 p99 기준
+PREFLIGHT_MODES = ("warn", "fail")  # warn: 경고만, fail: etcd 단계 실패
+
+# etcd 기본값과 한계 (etcd tuning 문서 기준)
+DEFAULT_HEARTBEAT_MS = 100
+DEFAULT_ELECTION_MS = 1000
+MAX_ELECTION_MS = 50000
+ELECTION_HEARTBEAT_RATIO = 10
+DEFAULT_SNAPSHOT_COUNT = 100000
+LOW_MEMORY_SNAPSHOT_COUNT = 10000
+LOW_MEMORY_BYTES = 4 * 1024 ** 3
+MIN_QUOTA_BYTES = 2 * 1024 ** 3
+MAX_QUOTA_BYTES = 8 * 1024 ** 3  # etcd 권장 최대값
+RECOMMENDED_RTT_MS = 50
+AUTO_COMPACTION_MODE = "periodic"
+AUTO_COMPACTION_RETENTION = "1h"
+MEASUREMENT_PREFIX = "ETCD_MEASUREMENT "  # --measure 출력 줄 앞에 붙여 다른 로그와 구분합니다.
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[ETCD TUNING]: {message}", flush=True)
+
+
+# 사전 점검 모드 확인 (대소문자는 구분하지 않고, warn/fail 이 아니면 ValueError)
+def preflight_mode(value):
+    mode = value.strip().lower()
+    if mode not in PREFLIGHT_MODES:
+        raise ValueError(f"잘못된 사전 점검 모드: {value!r} (warn 또는 fail)")
+    return mode
+
+
+FSYNC_PREFLIGHT_MODE = preflight_mode(os.environ.get("HARDWAY_ETCD_FSYNC_PREFLIGHT", "warn"))
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+# 피어까지 왕복 시간 (TCP 연결 시간, ms)
+# 연결할 수 없는 피어는 None 으로 돌려줍니다.
+def measure_peer_rtt(ip, port=RTT_PORT, samples=RTT_SAMPLES):
+    times = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        try:
+            with socket.create_connection((ip, port), timeout=RTT_TIMEOUT):
+                times.append((time.perf_counter() - started) * 1000)
+        except OSError:
+            continue
+    if not times:
+        return None
+    return {"median": statistics.median(times), "max": max(times), "samples": len(times)}
+
+
+# WAL 과 같은 방식의 쓰기 + fdatasync 지연 (ms)
+# 미리 할당한 세그먼트 파일에 레코드를 순차로 쓰고 레코드마다 fdatasync 합니다.
+def measure_fsync_latency(directory, samples=FSYNC_SAMPLES, block_size=FSYNC_BLOCK_SIZE):
+    os.makedirs(directory, exist_ok=True)
+    block = os.urandom(block_size)
+    times = []
+    fd, path = tempfile.mkstemp(prefix=".wal-probe-", dir=directory)
+    try:
+        os.posix_fallocate(fd, 0, max(WAL_SEGMENT_BYTES, samples * block_size))
+        os.fsync(fd)
+        started_all = time.perf_counter()
+        for _ in range(samples):
+            started = time.perf_counter()
+            os.write(fd, block)
+            os.fdatasync(fd)
+            times.append((time.perf_counter() - started) * 1000)
+        elapsed = time.perf_counter() - started_all
+    finally:
+        os.close(fd)
+        os.unlink(path)
+    return {"p50": percentile(times, 0.50), "p99": percentile(times, 0.99), "p99.9": percentile(times, 0.999),
+            "max": max(times), "samples": len(times), "syncs_per_second": samples / elapsed}
+
+
+# 디렉토리가 있는 장치 이름 (/proc/self/mountinfo 기준, 모르면 장치 번호)
+def device_of(directory):
+    device = os.stat(directory).st_dev
+    try:
+        with open("/proc/self/mountinfo", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                major, minor = (int(part) for part in fields[2].split(":"))
+                if os.makedev(major, minor) == device:
+                    return fields[fields.index("-") + 2]
+    except (OSError, ValueError):
+        pass
+    return f"{os.major(device)}:{os.minor(device)}"
+
+
+# etcd 디스크 사전 점검
+# 각 디렉토리의 fdatasync 지연을 재고, p99 가 기준을 넘으면 mode 에 따라 경고하거나 RuntimeError 를 냅니다.
+def preflight(directories, threshold_ms=FSYNC_THRESHOLD_MS, mode=FSYNC_PREFLIGHT_MODE, log=log_message):
+    mode = preflight_mode(mode)
+    results = {}
+    for role, directory in directories.items():
+        os.makedirs(directory, exist_ok=True)
+        result = measure_fsync_latency(directory)
+        result["device"] = device_of(directory)
+        results[role] = result
+        log(f"📏 {role} {directory} ({result['device']}) fdatasync: p50 {result['p50']:.2f}ms, "
+            f"p99 {result['p99']:.2f}ms, p99.9 {result['p99.9']:.2f}ms, {result['syncs_per_second']:.0f} syncs/s")
+
+    devices = {result["device"] for result in results.values()}
+    if len(results) > 1 and len(devices) == 1:
+        log(f"⚠️ {', '.join(results)} 가 같은 장치({devices.pop()})에 있습니다. WAL 은 전용 디스크를 권장합니다.")
+
+    slow = [role for role, result in results.items() if result["p99"] > threshold_ms]
+    if slow:
+        message = f"fdatasync p99 가 기준 {threshold_ms:g}ms 를 넘습니다: {', '.join(slow)}"
+        if mode == "fail":
+            raise RuntimeError(message)
+        log(f"⚠️ {message}")
+    else:
+        log(f"✅ 디스크 사전 점검 통과 (p99 기준 {threshold_ms:g}ms)")
+    return results
+
+
+def _memory_bytes():
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _round_up(value, step):
+    return int(math.ceil(value / step) * step)
+
+
+# 측정값으로 etcd 설정 결정
+# 반환값: {"flags": {옵션: 값}, "reasons": {옵션: 이유}}
+def derive_profile(rtts, fsync, memory_bytes, free_bytes):
+    flags, reasons = {}, {}
+    measured = [rtt["max"] for rtt in rtts.values() if rtt]
+    worst_rtt = max(measured) if measured else None
+
+    # heartbeat: 피어 왕복 + 리더의 WAL fsync 를 한 주기 안에 마칠 수 있어야 합니다.
+    if worst_rtt is None:
+        heartbeat = DEFAULT_HEARTBEAT_MS
+        reasons["heartbeat-interval"] = "피어 RTT 를 측정하지 못해 기본값 사용"
+    else:
+        needed = 1.5 * worst_rtt + fsync["p99"]
+        heartbeat = max(DEFAULT_HEARTBEAT_MS, _round_up(needed, 10))
+        reasons["heartbeat-interval"] = (f"최대 RTT {worst_rtt:.1f}ms x 1.5 + fsync p99 {fsync['p99']:.1f}ms "
+                                         f"= {needed:.1f}ms, 최소 {DEFAULT_HEARTBEAT_MS}ms")
+    flags["heartbeat-interval"] = heartbeat
+
+    # election timeout: heartbeat 의 10배 이상 (etcd 권장), 최대 50s
+    election = min(MAX_ELECTION_MS, max(DEFAULT_ELECTION_MS, heartbeat * ELECTION_HEARTBEAT_RATIO))
+    flags["election-timeout"] = election
+    reasons["election-timeout"] = (f"heartbeat {heartbeat}ms x {ELECTION_HEARTBEAT_RATIO}, "
+                                   f"범위 {DEFAULT_ELECTION_MS}~{MAX_ELECTION_MS}ms")
+
+    # snapshot-count: 스냅샷 전까지 raft 로그를 메모리에 두므로 메모리가 작으면 줄입니다.
+    if memory_bytes is not None and memory_bytes < LOW_MEMORY_BYTES:
+        flags["snapshot-count"] = LOW_MEMORY_SNAPSHOT_COUNT
+        reasons["snapshot-count"] = f"메모리 {memory_bytes / 1024 ** 3:.1f}GiB < {LOW_MEMORY_BYTES // 1024 ** 3}GiB"
+    else:
+        flags["snapshot-count"] = DEFAULT_SNAPSHOT_COUNT
+        reasons["snapshot-count"] = "메모리 충분, etcd 기본값"
+
+    # quota-backend-bytes: 데이터 디렉토리 여유 공간의 1/4 (2GiB~8GiB)
+    # 압축 전 히스토리와 defrag 중 임시 공간이 필요하므로 여유 공간 전체를 쓰지 않습니다.
+    quota = min(MAX_QUOTA_BYTES, max(MIN_QUOTA_BYTES, free_bytes // 4))
+    flags["quota-backend-bytes"] = quota
+    reasons["quota-backend-bytes"] = (f"여유 공간 {free_bytes / 1024 ** 3:.1f}GiB / 4, "
+                                      f"범위 {MIN_QUOTA_BYTES // 1024 ** 3}~{MAX_QUOTA_BYTES // 1024 ** 3}GiB")
+
+    # auto-compaction: kube-apiserver 가 5분마다 압축하지만, 멈췄을 때도 히스토리가 쿼터를 채우지 않도록 합니다.
+    flags["auto-compaction-mode"] = AUTO_COMPACTION_MODE
+    flags["auto-compaction-retention"] = AUTO_COMPACTION_RETENTION
+    reasons["auto-compaction-retention"] = (f"{AUTO_COMPACTION_MODE} {AUTO_COMPACTION_RETENTION}: "
+                                            "apiserver 압축이 멈춰도 히스토리 증가를 제한")
+    return {"flags": flags, "reasons": reasons}
+
+
+def _log_rtts(rtts, log):
+    for peer, rtt in rtts.items():
+        if rtt is None:
+            log(f"⚠️ 피어 {peer}: RTT 측정 실패 (포트 {RTT_PORT})")
+        else:
+            log(f"📏 피어 {peer}: RTT median {rtt['median']:.2f}ms, max {rtt['max']:.2f}ms")
+            if rtt["max"] > RECOMMENDED_RTT_MS:
+                log(f"⚠️ 피어 {peer} RTT 가 {RECOMMENDED_RTT_MS}ms 를 넘습니다.")
+
+
+def _log_flags(profile, log):
+    for flag, value in profile["flags"].items():
+        reason = profile["reasons"].get(flag)
+        log(f"⚙️ --{flag}={value}" + (f" ({reason})" if reason else ""))
+
+
+# 측정 후 설정 결정, 값과 이유를 로그로 남김 (노드 한 대 기준)
+# fsync: preflight 로 이미 잰 WAL 디렉토리 결과가 있으면 다시 재지 않습니다.
+def tune(peer_ips, data_dir, log=log_message, fsync=None):
+    rtts = {ip: measure_peer_rtt(ip) for ip in peer_ips}
+    fsync = fsync or measure_fsync_latency(data_dir)
+    _log_rtts(rtts, log)
+    log(f"📏 WAL fdatasync: p50 {fsync['p50']:.2f}ms, p99 {fsync['p99']:.2f}ms")
+
+    profile = derive_profile(rtts, fsync, _memory_bytes(), shutil.disk_usage(data_dir).free)
+    _log_flags(profile, log)
+    profile["measurements"] = {"rtt_ms": rtts, "fsync_ms": fsync}
+    return profile
+
+
+# 노드 한 대의 측정값 (etcd_profile.py 가 각 master 에서 실행해 모읍니다)
+# 디스크 사전 점검을 먼저 하므로 mode 가 fail 이면 기준을 넘는 노드에서 RuntimeError 가 납니다.
+def measure(peer_ips, directories, threshold_ms=FSYNC_THRESHOLD_MS, mode=FSYNC_PREFLIGHT_MODE, log=log_message):
+    disk = preflight(directories, threshold_ms, mode, log)
+    rtts = {ip: measure_peer_rtt(ip) for ip in peer_ips}
+    _log_rtts(rtts, log)
+    return {"rtt_ms": rtts, "fsync_ms": disk.get("wal-dir", disk["data-dir"]), "memory_bytes": _memory_bytes(),
+            "free_bytes": shutil.disk_usage(directories["data-dir"]).free}
+
+
+# 클러스터 공통 설정 결정
+# etcd 는 모든 멤버의 heartbeat/election timeout 이 같아야 하므로, 모든 노드의 측정값 중 가장 나쁜 값
+# (최대 RTT, 가장 느린 fsync p99, 가장 작은 메모리/여유 공간) 으로 한 번만 계산합니다.
+# measurements: {노드: measure() 결과}
+def cluster_profile(measurements, log=log_message):
+    rtts = {f"{host}->{peer}": rtt for host, measured in measurements.items()
+            for peer, rtt in measured["rtt_ms"].items()}
+    slowest, fsync = max(((host, measured["fsync_ms"]) for host, measured in measurements.items()),
+                         key=lambda item: item[1]["p99"])
+    memories = [measured["memory_bytes"] for measured in measurements.values() if measured["memory_bytes"]]
+    free_bytes = min(measured["free_bytes"] for measured in measurements.values())
+    log(f"📏 가장 느린 WAL fdatasync: {slowest} p99 {fsync['p99']:.2f}ms")
+
+    profile = derive_profile(rtts, fsync, min(memories) if memories else None, free_bytes)
+    _log_flags(profile, log)
+    profile["measurements"] = measurements
+    return profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="측정값 기반 etcd 설정 계산")
+    parser.add_argument("--data-dir", default="/var/lib/etcd")
+    parser.add_argument("--wal-dir")
+    parser.add_argument("--preflight", action="store_true", help="디스크 fdatasync 사전 점검만 실행")
+    parser.add_argument("--measure", action="store_true",
+                        help="사전 점검과 피어 RTT 측정 결과를 JSON 한 줄로 출력 (etcd_profile.py 용)")
+    parser.add_argument("--threshold-ms", type=float, default=FSYNC_THRESHOLD_MS)
+    parser.add_argument("--mode", type=preflight_mode, choices=PREFLIGHT_MODES, default=FSYNC_PREFLIGHT_MODE)
+    parser.add_argument("peers", nargs="*")
+    args = parser.parse_args()
+    directories = {"data-dir": args.data_dir, **({"wal-dir": args.wal_dir} if args.wal_dir else {})}
+    try:
+        if args.measure:
+            print(MEASUREMENT_PREFIX + json.dumps(measure(args.peers, directories, args.threshold_ms, args.mode)))
+            raise SystemExit(0)
+        results = preflight(directories, args.threshold_ms, args.mode)
+    except RuntimeError as e:
+        log_message(f"❌ {e}")
+        raise SystemExit(1)
+    if not args.preflight:
+        fsync = results.get("wal-dir", results["data-dir"])
+        print(json.dumps(tune(args.peers, args.data_dir, fsync=fsync), indent=2, ensure_ascii=False))
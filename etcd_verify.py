@@ -1,6 +1,7 @@
 import os
 import subprocess
 import time
+import tracing
 
 # 기본 설정
 LOG_FILE = "/root/hardway/etcd_verification.log"
@@ -25,14 +26,15 @@ def log_and_print(message):
 
 # 명령 실행 함수
 def run_command(command):
-    try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output = result.stdout.decode().strip()
-        log_and_print(output)
-        return output
-    except subprocess.CalledProcessError as e:
-        log_and_print(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
-        return None
+    with tracing.span(command, category="command"):
+        try:
+            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            output = result.stdout.decode().strip()
+            log_and_print(output)
+            return output
+        except subprocess.CalledProcessError as e:
+            log_and_print(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
+            return None
 
 # etcd 클러스터 상태 확인
 def check_etcd_status():
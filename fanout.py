@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import getpass
+import hashlib
+import os
+import secrets
+import time
+
+import artifact_cache
+import artifact_relay
+import async_engine
+import bundle
+import cert_create
+import cni_setup
+import control_plane_setup
+import etcd_setup
+import worker_node_setup
+
+# 설정
+SSH_USER = "root"
+MASTER_NODES = ["172.31.1.2", "172.31.1.3", "172.31.1.4"]
+WORKER_NODES = ["172.31.1.5", "172.31.1.6", "172.31.1.7"]
+SEED_COUNT = 2  # Bastion 이 직접 전송하는 노드 수
+FANOUT = 2  # 각 노드가 전달하는 자식 노드 수
+RELAY_PORT = 8099
+RELAY_IDLE_TIMEOUT = 120
+MAX_CONCURRENCY = 64
+
+# 노드 스크립트가 다운로드 전에 확인하는 위치로 미리 배포할 릴리스 아티팩트
+MASTER_ARTIFACTS = [
+    {"url": etcd_setup.ETCD_DOWNLOAD_URL,
+     "dest": os.path.join(etcd_setup.DOWNLOAD_DIR, os.path.basename(etcd_setup.ETCD_DOWNLOAD_URL)),
+     "mode": "0644"},
+] + [
+    {"url": f"{control_plane_setup.DOWNLOAD_URL}{binary}",
+     "dest": os.path.join(control_plane_setup.DOWNLOAD_DIR, binary), "mode": "0755"}
+    for binary in control_plane_setup.BINARIES
+]
+WORKER_ARTIFACTS = [
+    {"url": worker_node_setup.CNI_PLUGIN_URL, "dest": worker_node_setup.CNI_TARBALL, "mode": "0644"},
+] + [
+    {"url": f"{worker_node_setup.DOWNLOAD_URL}{binary}",
+     "dest": os.path.join(worker_node_setup.STAGING_DIR, binary), "mode": "0755"}
+    for binary in worker_node_setup.BINARIES
+]
+
+# Bastion 에서만 쓰는 아티팩트 (캐시 준비용)
+BASTION_ARTIFACT_URLS = [cert_create.KUBECTL_URL, cni_setup.HELM_URL]
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[FANOUT]: {message}", flush=True)
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 전달 트리 구성
+# 앞쪽 seeds 개 노드는 Bastion 에서 직접 받고, 이후 노드는 앞선 노드에서 fanout 개씩 나눠 받습니다.
+# 트리 깊이는 log_fanout(N) 에 비례합니다.
+def build_tree(hosts, seeds=SEED_COUNT, fanout=FANOUT):
+    seeds = max(1, seeds)
+    return {host: (None if index < seeds else hosts[(index - seeds) // fanout])
+            for index, host in enumerate(hosts)}
+
+
+async def _run(backend, host, command):
+    output = async_engine.NullOutput(host)
+    status = await backend.run(host, command, output)
+    if status != 0:
+        raise RuntimeError(f"{command} 실패 (종료 코드 {status}): {' | '.join(output.tail)}")
+
+
+# 노드 한 대에 아티팩트 전달
+# 부모 노드가 준비되면 부모에게서 받고, 부모가 실패했으면 Bastion 에서 직접 받습니다.
+async def _deliver(backend, host, tree, artifacts, ready, succeeded, token):
+    try:
+        relay = (f"{artifact_relay.TOKEN_ENV}={token} "
+                 f"python3 {await bundle.ensure_bundle(backend, host)} artifact_relay")
+        parent = tree[host]
+        if parent is not None:
+            await ready[parent].wait()
+            if parent not in succeeded:
+                log_message(f"⚠️ {host}: 부모 {parent} 실패, Bastion 에서 직접 받습니다.")
+                parent = None
+
+        await _run(backend, host, f"mkdir -p {artifact_relay.RELAY_DIR}")
+        for artifact in artifacts:
+            staged = f"{artifact_relay.RELAY_DIR}/{artifact['name']}"
+            if parent is not None:
+                try:
+                    await _run(backend, host, f"{relay} fetch http://{parent}:{RELAY_PORT}/{artifact['name']} "
+                                              f"{staged} {artifact['sha256']}")
+                except RuntimeError as e:
+                    log_message(f"⚠️ {host}: {parent}에서 받지 못해 Bastion 에서 직접 받습니다. ({e})")
+                    parent = None
+            if parent is None:
+                try:
+                    await _run(backend, host, f"{relay} verify {staged} {artifact['sha256']}")
+                except RuntimeError:
+                    await backend.put(host, artifact["path"], f"{staged}.part")
+                    await _run(backend, host, f"mv {staged}.part {staged} && "
+                                              f"{relay} verify {staged} {artifact['sha256']}")
+            await _run(backend, host, f"install -D -m {artifact['mode']} {staged} {artifact['dest']}")
+
+        if host in tree.values():
+            await _run(backend, host,
+                       f"setsid nohup {relay} serve --port {RELAY_PORT} --bind {host} "
+                       f"--idle-timeout {RELAY_IDLE_TIMEOUT} "
+                       f"> /dev/null 2>&1 < /dev/null &")
+        succeeded.add(host)
+        log_message(f"✅ {host}: {len(artifacts)}개 수신 완료 (출처: {parent or 'bastion'})")
+        return async_engine.make_result(host, "ok")
+    finally:
+        ready[host].set()
+
+
+# 릴레이 서버는 각 노드의 클러스터 IP 에만 열고, 이번 실행에서 만든 토큰을 가진 요청만 받습니다.
+async def _distribute(backend, artifacts, hosts, seeds, fanout, max_concurrency):
+    tree = build_tree(hosts, seeds, fanout)
+    ready = {host: asyncio.Event() for host in hosts}
+    succeeded = set()
+    token = secrets.token_urlsafe(32)
+    # 트리 순서대로 작업을 만들어 부모가 항상 자식보다 먼저 실행 슬롯을 얻도록 합니다.
+    engine = async_engine.Engine(backend, max_concurrency=max(max_concurrency, 1))
+    results = await engine.run_on_hosts(
+        hosts, lambda backend, host: _deliver(backend, host, tree, artifacts, ready, succeeded, token))
+
+    relays = sorted(set(tree.values()) - {None})
+    await asyncio.gather(*(backend.run(host, f"pkill -f 'artifact_relay serve --port {RELAY_PORT}' || true",
+                                       async_engine.NullOutput(host)) for host in relays),
+                         return_exceptions=True)
+    return results
+
+
+# 아티팩트 배포
+# artifacts: [{"path": 로컬 경로, "dest": 노드의 최종 경로, "mode": "0644"}, ...]
+def distribute(artifacts, hosts, username, password,
+               seeds=SEED_COUNT, fanout=FANOUT, max_concurrency=MAX_CONCURRENCY):
+    artifacts = [dict(artifact, sha256=sha256_of(artifact["path"])) for artifact in artifacts]
+    for artifact in artifacts:
+        artifact["name"] = f"{artifact['sha256'][:16]}-{os.path.basename(artifact['dest'])}"
+
+    started = time.time()
+    backend = async_engine.ParamikoBackend(username, password, max_workers=max_concurrency)
+    try:
+        results = asyncio.run(_distribute(backend, artifacts, hosts, seeds, fanout, max_concurrency))
+    finally:
+        backend.close()
+
+    failed = [host for host, result in results.items() if result["status"] != "ok"]
+    log_message(f"📋 {len(hosts)}대 배포 완료 ({time.time() - started:.1f}s), 실패 {len(failed)}대 {failed or ''}")
+    return results
+
+
+# 클러스터 구성에 쓰는 모든 릴리스 아티팩트 URL (Bastion 미러가 받아 줄 수 있는 목록)
+def release_urls():
+    return [artifact["url"] for artifact in MASTER_ARTIFACTS + WORKER_ARTIFACTS] + BASTION_ARTIFACT_URLS
+
+
+# 모든 릴리스 아티팩트를 Bastion 캐시에 받아 두기 (오프라인 설치 준비)
+def populate_cache():
+    urls = release_urls()
+    for url in urls:
+        artifact_cache.fetch(url)
+    log_message(f"✅ 아티팩트 {len(urls)}개 캐시 준비 완료: {artifact_cache.CACHE_DIR}")
+
+
+# 릴리스 바이너리 사전 배포
+# 실패한 노드는 각 설치 스크립트가 기존처럼 직접 내려받으므로 전체 작업을 막지 않습니다.
+def stage_release_artifacts(username, password):
+    for hosts, artifacts in [(MASTER_NODES, MASTER_ARTIFACTS), (WORKER_NODES, WORKER_ARTIFACTS)]:
+        local_artifacts = [dict(artifact, path=artifact_cache.fetch(artifact["url"])) for artifact in artifacts]
+        distribute(local_artifacts, hosts, username, password)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="트리 방식 아티팩트 배포")
+    parser.add_argument("artifacts", nargs="*", metavar="SRC:DEST[:MODE]",
+                        help="배포할 파일 (생략하면 릴리스 바이너리를 사전 배포합니다)")
+    parser.add_argument("--hosts", nargs="+", default=MASTER_NODES + WORKER_NODES)
+    parser.add_argument("--seeds", type=int, default=SEED_COUNT)
+    parser.add_argument("--fanout", type=int, default=FANOUT)
+    parser.add_argument("--populate-cache", action="store_true", help="릴리스 아티팩트를 Bastion 캐시에 받기만 합니다")
+    args = parser.parse_args()
+
+    if args.populate_cache:
+        populate_cache()
+        return
+    # main.py 와 같은 방식으로 비밀번호를 받습니다.
+    password = os.environ.get("HARDWAY_SSH_PASSWORD") or getpass.getpass("\nSSH 비밀번호 입력: ")
+    if not args.artifacts:
+        stage_release_artifacts(SSH_USER, password)
+        return
+
+    artifacts = []
+    for spec in args.artifacts:
+        src, dest, *mode = spec.split(":")
+        artifacts.append({"path": src, "dest": dest, "mode": mode[0] if mode else "0644"})
+    distribute(artifacts, args.hosts, SSH_USER, password, seeds=args.seeds, fanout=args.fanout)
+
+
+if __name__ == "__main__":
+    main()
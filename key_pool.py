@@ -0,0 +1,169 @@
+import argparse
+import fcntl
+import json
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+
+from cryptography.hazmat.primitives import serialization
+
+import pki
+
+# 설정
+POOL_DIR = os.environ.get("HARDWAY_KEY_POOL_DIR", "/root/hardway/key-pool")
+PASSPHRASE_FILE = "/root/hardway/state/key-pool.passphrase"  # HARDWAY_KEY_POOL_PASSPHRASE 가 없을 때 사용
+LOW_WATERMARK = int(os.environ.get("HARDWAY_KEY_POOL_LOW", "8"))  # 이보다 적게 남으면 별도 프로세스로 보충 시작
+HIGH_WATERMARK = int(os.environ.get("HARDWAY_KEY_POOL_HIGH", "32"))  # 보충할 때 이 개수까지 채움
+
+_lock = threading.Lock()
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[KEY POOL]: {message}", flush=True)
+
+
+# 보관용 암호 (환경 변수 우선, 없으면 0600 파일에 한 번 생성)
+def _passphrase():
+    passphrase = os.environ.get("HARDWAY_KEY_POOL_PASSPHRASE")
+    if passphrase:
+        return passphrase.encode("utf-8")
+    if not os.path.exists(PASSPHRASE_FILE):
+        os.makedirs(os.path.dirname(PASSPHRASE_FILE), exist_ok=True)
+        pki.write_file(PASSPHRASE_FILE, secrets.token_hex(32).encode("ascii"), 0o600)
+    with open(PASSPHRASE_FILE, "rb") as f:
+        return f.read().strip()
+
+
+def _profile_dir(profile):
+    path = os.path.join(POOL_DIR, profile)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def _metrics_path(profile):
+    return os.path.join(_profile_dir(profile), "metrics.json")
+
+
+def _keys(profile):
+    return sorted(name for name in os.listdir(_profile_dir(profile)) if name.endswith(".pem"))
+
+
+def depth(profile=pki.KEY_PROFILE):
+    return len(_keys(profile))
+
+
+def _update_metrics(profile, **increments):
+    with _lock:
+        path = _metrics_path(profile)
+        try:
+            with open(path, encoding="utf-8") as f:
+                metrics = json.load(f)
+        except (OSError, ValueError):
+            metrics = {"hits": 0, "misses": 0, "generated": 0}
+        for name, value in increments.items():
+            metrics[name] = metrics.get(name, 0) + value
+        pki.write_file(path, json.dumps(metrics, indent=2).encode("utf-8"), 0o600)
+
+
+# 풀 상태 (깊이, hit/miss 횟수, hit 비율)
+def metrics(profile=pki.KEY_PROFILE):
+    try:
+        with open(_metrics_path(profile), encoding="utf-8") as f:
+            counters = json.load(f)
+    except (OSError, ValueError):
+        counters = {"hits": 0, "misses": 0, "generated": 0}
+    requests = counters["hits"] + counters["misses"]
+    return dict(counters, profile=profile, depth=depth(profile), low_watermark=LOW_WATERMARK,
+                high_watermark=HIGH_WATERMARK, hit_rate=(counters["hits"] / requests if requests else None))
+
+
+# 풀을 high watermark 까지 채움 (키 생성은 프로세스 풀에서 병렬로 수행)
+# 프로필별 잠금 파일로 여러 프로세스가 동시에 보충하지 않도록 합니다. 이미 보충 중이면 바로 돌아갑니다.
+def refill(profile=pki.KEY_PROFILE, target=HIGH_WATERMARK):
+    directory = _profile_dir(profile)
+    with open(os.path.join(directory, ".refill.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            log_message(f"⏭️ {profile} 키 보충이 이미 진행 중입니다.")
+            return 0
+        missing = target - depth(profile)
+        if missing <= 0:
+            return 0
+        started = time.time()
+        encryption = serialization.BestAvailableEncryption(_passphrase())
+        for key in pki.generate_keys(missing, profile):
+            data = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, encryption)
+            pki.write_file(os.path.join(directory, f"{time.time_ns()}-{secrets.token_hex(4)}.pem"), data, 0o600)
+        _update_metrics(profile, generated=missing)
+        log_message(f"✅ {profile} 키 {missing}개 보충 완료 ({time.time() - started:.1f}s, 현재 {depth(profile)}개)")
+        return missing
+
+
+# 백그라운드 보충
+# 키를 꺼낸 프로세스(예: cert_create_worker 단계)가 보충을 기다리지 않고 끝날 수 있도록
+# "key_pool.py fill" 을 분리된 세션의 별도 프로세스로 실행합니다. 출력은 풀 디렉토리의 refill.log 에 남깁니다.
+def refill_async(profile=pki.KEY_PROFILE):
+    with open(os.path.join(_profile_dir(profile), "refill.log"), "ab") as log:
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__), "fill", "--profile", profile],
+                                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                start_new_session=True, env=dict(os.environ, HARDWAY_KEY_POOL_DIR=POOL_DIR))
+
+
+# 풀에서 키 하나 꺼내기
+# rename 으로 먼저 선점하므로 여러 프로세스가 동시에 꺼내도 같은 키를 두 번 쓰지 않습니다.
+# 풀의 키는 refill 이 직접 생성한 것이므로 RSA 키 검증을 건너뜁니다. (검증 비용이 생성 비용과 비슷함)
+def _claim(profile):
+    directory = _profile_dir(profile)
+    for name in _keys(profile):
+        path = os.path.join(directory, name)
+        claimed = f"{path}.claimed-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            continue
+        try:
+            with open(claimed, "rb") as f:
+                return serialization.load_pem_private_key(f.read(), password=_passphrase(),
+                                                         unsafe_skip_rsa_key_validation=True)
+        finally:
+            os.unlink(claimed)
+    return None
+
+
+# 키 count 개 가져오기
+# 풀에 있는 만큼은 바로 쓰고(hit), 모자라면 그 자리에서 생성합니다(miss).
+def take(count, profile=pki.KEY_PROFILE):
+    keys = []
+    while len(keys) < count:
+        key = _claim(profile)
+        if key is None:
+            break
+        keys.append(key)
+    hits = len(keys)
+    keys.extend(pki.generate_keys(count - hits, profile))
+    _update_metrics(profile, hits=hits, misses=count - hits)
+    if hits < count:
+        log_message(f"⚠️ 풀 부족: {count - hits}개는 즉시 생성했습니다. ({profile})")
+    if depth(profile) < LOW_WATERMARK:
+        refill_async(profile)
+    return keys
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="사전 생성 키 풀")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fill_parser = subparsers.add_parser("fill", help="high watermark 까지 키를 채웁니다")
+    fill_parser.add_argument("--profile", choices=pki.KEY_PROFILES, default=pki.KEY_PROFILE)
+    fill_parser.add_argument("--target", type=int, default=HIGH_WATERMARK)
+    status_parser = subparsers.add_parser("status", help="풀 깊이와 hit/miss 통계 출력 (JSON)")
+    status_parser.add_argument("--profile", choices=pki.KEY_PROFILES, default=pki.KEY_PROFILE)
+    args = parser.parse_args()
+    if args.command == "fill":
+        refill(args.profile, args.target)
+    else:
+        print(json.dumps(metrics(args.profile), indent=2))
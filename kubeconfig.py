@@ -0,0 +1,79 @@
+import argparse
+import base64
+import os
+import tempfile
+import time
+
+# 설정
+DEFAULT_CONTEXT = "default"
+KUBECONFIG_MODE = 0o600
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+# kubeconfig 문서 생성
+# kubectl config set-cluster / set-credentials / set-context / use-context --embed-certs=true 결과와 같은 구조입니다.
+def render(cluster_name, server, ca_pem, user, client_cert_pem, client_key_pem, context=DEFAULT_CONTEXT):
+    return f"""apiVersion: v1
+kind: Config
+clusters:
+- cluster:
+    certificate-authority-data: {_b64(ca_pem)}
+    server: {server}
+  name: {cluster_name}
+contexts:
+- context:
+    cluster: {cluster_name}
+    user: {user}
+  name: {context}
+current-context: {context}
+preferences: {{}}
+users:
+- name: {user}
+  user:
+    client-certificate-data: {_b64(client_cert_pem)}
+    client-key-data: {_b64(client_key_pem)}
+"""
+
+
+# 원자적 저장 (개인 키가 들어 있으므로 0600)
+def write(path, content, mode=KUBECONFIG_MODE):
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# 인증서 파일로 kubeconfig 생성
+def write_kubeconfig(path, cluster_name, server, ca_path, user, cert_path, key_path, context=DEFAULT_CONTEXT):
+    write(path, render(cluster_name, server, _read(ca_path), user, _read(cert_path), _read(key_path), context))
+    return path
+
+
+# kubeconfig 생성 속도 측정
+def benchmark(count):
+    ca_pem = os.urandom(1100)
+    with tempfile.TemporaryDirectory() as output_dir:
+        started = time.perf_counter()
+        for index in range(count):
+            write(os.path.join(output_dir, f"node{index:04d}.kubeconfig"),
+                  render("bench", "https://127.0.0.1:6443", ca_pem, f"system:node:node{index:04d}",
+                         os.urandom(1200), os.urandom(1700)))
+        elapsed = time.perf_counter() - started
+    print(f"kubeconfig {count}개 생성: {elapsed:.3f}s ({count / elapsed:.0f}/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="kubeconfig 생성 속도 측정")
+    parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+    benchmark(args.count)
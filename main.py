@@ -1,71 +1,287 @@
-import paramiko
 import getpass
 import os
-import threading
+import shlex
+import sys
+import argparse
+import subprocess
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import async_engine
+import bundle
+import remote_stream
+import tracing
+
+# 노드에서 trace 파일을 임시로 저장하는 위치
+REMOTE_TRACE_DIR = "/root/hardway/trace"
+# Bastion 에 설정되어 있으면 노드 스크립트에도 그대로 넘기는 환경 변수
+FORWARDED_ENV = [
+    "HARDWAY_ARTIFACT_MIRROR",  # 아티팩트 미러 주소
+    "HARDWAY_ALLOW_UNVERIFIED",  # 공개된 체크섬이 없는 파일 설치 허용
+    "HARDWAY_ETCD_DATA_DIR",  # etcd data-dir
+    "HARDWAY_ETCD_WAL_DIR",  # etcd WAL 전용 디렉토리
+    "HARDWAY_ETCD_FSYNC_P99_MS",  # etcd 디스크 사전 점검 p99 기준
+    "HARDWAY_ETCD_FSYNC_PREFLIGHT",  # etcd 디스크 사전 점검 모드 (warn/fail)
+]
 
 def log_message(message):
     print(f"\n[LOG]: {message}")
 
-def run_remote_script(host, username, password, script_name):
-    try:
-        log_message(f"🚀 {host}에서 {script_name} 실행 준비 중...")
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(host, username=username, password=password)
-
-        # 파일 전송 준비
-        sftp = ssh.open_sftp()
-        local_script_path = os.path.join(os.getcwd(), script_name)
-        remote_script_path = f"/root/{script_name}"
+# --trace 사용 시 병합 대상 trace 파일을 모으는 디렉토리
+def trace_dir():
+    return os.path.dirname(tracing.TRACE_FILE) if tracing.TRACE_FILE else None
 
-        log_message(f"🚀 {host}로 {script_name} 전송 중...")
-        sftp.put(local_script_path, remote_script_path)
-        sftp.close()
-        log_message(f"✅ {host}로 {script_name} 전송 완료: {remote_script_path}")
+# 원격 스크립트 전송 및 실행 (호스트 1대)
+# use_bundle: 노드 스크립트 전체를 묶은 번들을 해시가 바뀐 경우에만 올리고, 그 안의 진입점을 실행합니다.
+#             끄면 스크립트와 그 스크립트가 사용하는 모듈만 /root/ 로 매번 전송합니다.
+async def run_remote_script_async(backend, host, script_name, use_bundle=True):
+    try:
+        entry_point = os.path.splitext(script_name)[0]
+        if use_bundle:
+            remote_bundle_path = await bundle.ensure_bundle(backend, host)
+            command = f"python3 -u {remote_bundle_path} {entry_point}"
+        else:
+            for module in bundle.collect_modules([entry_point]):
+                local_path = os.path.join(bundle.SOURCE_DIR, f"{module}.py")
+                log_message(f"🚀 {host}로 {module}.py 전송 중...")
+                await backend.put(host, local_path, f"/root/{module}.py")
+            log_message(f"✅ {host}로 {script_name} 전송 완료: /root/{script_name}")
+            command = f"python3 -u /root/{script_name}"
 
-        # 스크립트 실행 전 권한 설정
-        ssh.exec_command(f"chmod +x {remote_script_path}")
+        remote_trace_path = f"{REMOTE_TRACE_DIR}/{entry_point}.json"
+        if trace_dir():
+            command = f"HARDWAY_TRACE_FILE={remote_trace_path} HARDWAY_TRACE_HOST={host} {command}"
+        forwarded = [f"{name}={shlex.quote(os.environ[name])}" for name in FORWARDED_ENV if os.environ.get(name)]
+        if forwarded:
+            command = f"{' '.join(forwarded)} {command}"
 
         # 스크립트 실행
         log_message(f"🚀 {host}에서 {script_name} 실행 중...")
-        stdin, stdout, stderr = ssh.exec_command(f"python3 {remote_script_path}")
+        output = remote_stream.HostOutput(host, script_name)
+        try:
+            # -u: 원격 출력이 버퍼링되지 않고 즉시 전달되도록 합니다.
+            exit_status = await backend.run(host, command, output)
+        finally:
+            output.close()
 
-        output = stdout.read().decode('utf-8', errors='replace').strip()
-        error = stderr.read().decode('utf-8', errors='replace').strip()
+        if trace_dir():
+            try:
+                await backend.get(host, remote_trace_path, os.path.join(trace_dir(), f"{host}-{entry_point}.json"))
+            except Exception as e:
+                log_message(f"⚠️ {host} trace 파일 수집 실패: {e}")
 
-        if output:
-            log_message(f"✅ {host}: {output}")
-        if error:
-            log_message(f"❌ {host} 실행 오류: {error}")
+        if exit_status == 0:
+            log_message(f"✅ {host}에서 {script_name} 실행 완료 (로그: {output.log_path})")
+        else:
+            log_message(f"❌ {host}에서 {script_name} 실행 오류 (종료 코드 {exit_status}, 로그: {output.log_path})")
 
-        ssh.close()
+        return async_engine.make_result(host, "ok" if exit_status == 0 else "failed", exit_status, output.log_path)
     except Exception as e:
         log_message(f"❌ {host}에서 {script_name} 실행 실패: {e}")
+        return async_engine.make_result(host, "failed", error=str(e))
 
-def run_remote_scripts_concurrently(hosts, username, password, script_name):
-    threads = []
-    for host in hosts:
-        thread = threading.Thread(target=run_remote_script, args=(host, username, password, script_name))
-        thread.start()
-        threads.append(thread)
+# 호스트별 병렬 실행
+# max_concurrency: 동시에 실행할 최대 호스트 수
+# max_unavailable: 지정하면 이 개수만큼씩 끊어서 순차적으로 실행합니다 (rolling batch)
+# max_failures: 실패가 이 개수에 도달하면 진행 중인 작업을 취소하고 남은 호스트는 건너뜁니다
+# host_timeout: 호스트 하나에 허용하는 최대 시간 (초)
+def run_remote_scripts_concurrently(hosts, username, password, script_name,
+                                    max_concurrency=async_engine.MAX_CONCURRENCY, max_unavailable=None,
+                                    max_failures=None, host_timeout=async_engine.HOST_TIMEOUT, use_bundle=True):
+    backend = async_engine.ParamikoBackend(username, password, max_workers=max_concurrency)
+    engine = async_engine.Engine(backend, max_concurrency, host_timeout)
 
-    for thread in threads:
-        thread.join()
+    async def task(backend, host):
+        with tracing.span(script_name, category="host", host=host):
+            return await run_remote_script_async(backend, host, script_name, use_bundle)
 
-def run_local_script(script_name):
+    try:
+        results = asyncio.run(engine.run_on_hosts(
+            hosts, task, max_unavailable=max_unavailable, max_failures=max_failures))
+    finally:
+        backend.close()
+
+    summary = {status: sum(1 for r in results.values() if r["status"] == status)
+               for status in ("ok", "failed", "skipped")}
+    log_message(f"📋 {script_name}: 성공 {summary['ok']}, 실패 {summary['failed']}, 건너뜀 {summary['skipped']}")
+    return results
+
+def run_remote_script(host, username, password, script_name, **options):
+    return run_remote_scripts_concurrently([host], username, password, script_name, **options)[host]
+
+def all_succeeded(results):
+    return all(result["status"] == "ok" for result in results.values())
+
+# extra_env: 스크립트에 추가로 넘길 환경 변수 (예: SSH 비밀번호)
+def run_local_script(script_name, extra_env=None):
     try:
         script_path = os.path.join(os.getcwd(), script_name)
         log_message(f"🔧 Bastion 서버에서 {script_path} 실행 중...")
-        os.system(f"python3 {script_path}")
+        env = dict(os.environ, **(extra_env or {}))
+        if trace_dir():
+            env["HARDWAY_TRACE_FILE"] = os.path.join(trace_dir(), f"bastion-{os.path.splitext(script_name)[0]}.json")
+            env["HARDWAY_TRACE_HOST"] = tracing.TRACE_HOST
+        result = subprocess.run([sys.executable, script_path], env=env)
+        if result.returncode != 0:
+            log_message(f"❌ {script_name} 종료 코드: {result.returncode}")
+        return result.returncode == 0
     except Exception as e:
         log_message(f"❌ {script_name} 실행 실패: {e}")
+        return False
 
 # 서버 설정
 MASTER_NODES = ["172.31.1.2", "172.31.1.3", "172.31.1.4"]
 WORKER_NODES = ["172.31.1.5", "172.31.1.6", "172.31.1.7"]
 
+# 단계 정의 (의존성 그래프)
+# deps 에 적힌 단계가 모두 성공해야 해당 단계가 실행됩니다.
+def build_steps(password, remote_options=None):
+    remote_options = remote_options or {}
+
+    def on_hosts(hosts, script_name):
+        return all_succeeded(run_remote_scripts_concurrently(hosts, "root", password, script_name, **remote_options))
+
+    return {
+        "1": {"name": "VIP 설정 (Pacemaker/Corosync)", "deps": [],
+              "run": lambda: run_local_script("pcs_setup.py")},
+        "2": {"name": "인증서 생성", "deps": [],
+              "run": lambda: run_local_script("cert_create.py")},
+        "3": {"name": "인증서 전송", "deps": ["2"],
+              "run": lambda: run_local_script("cert_transfer.py")},
+        "4": {"name": "ETCD 클러스터 구성", "deps": ["3", "13"],
+              "run": lambda: (run_local_script("etcd_profile.py", {"HARDWAY_SSH_PASSWORD": password})
+                              and on_hosts(MASTER_NODES, "etcd_setup.py"))},
+        "5": {"name": "ETCD 상태 검증", "deps": ["4"],
+              "run": lambda: on_hosts(MASTER_NODES, "etcd_verify.py")},
+        "6": {"name": "Control Plane 설정", "deps": ["1", "4", "13"],
+              "run": lambda: on_hosts(MASTER_NODES, "control_plane_setup.py")},
+        "7": {"name": "Worker Node 인증서 생성 및 전송", "deps": ["6"],
+              "run": lambda: run_local_script("cert_create_worker.py")},
+        "8": {"name": "Main Worker 노드 설정", "deps": ["3", "7", "13"],
+              "run": lambda: on_hosts(WORKER_NODES[:1], "worker_node_setup.py")},
+        "9": {"name": "CNI 세팅 (Bastion Cilium)", "deps": ["6", "8"],
+              "run": lambda: run_local_script("cni_setup.py")},
+        "10": {"name": "TLS Bootstrapping 설정", "deps": ["6"],
+               "run": lambda: run_local_script("tls_setup.py")},
+        "11": {"name": "Sub Worker Node 인증서 전송", "deps": ["2"],
+               "run": lambda: run_local_script("cert_sub_worker_node_transfer.py")},
+        "12": {"name": "Sub Worker Node 초기 세팅", "deps": ["10", "11", "13"],
+               "run": lambda: on_hosts(WORKER_NODES[1:], "sub_worker_node_setup.py")},
+        "13": {"name": "릴리스 바이너리 팬아웃 배포", "deps": [],
+               "run": lambda: stage_release_artifacts(password)},
+    }
+
+# 릴리스 바이너리 사전 배포
+# 실패해도 각 노드 스크립트가 직접 내려받으므로 뒤 단계를 막지 않습니다.
+def stage_release_artifacts(password):
+    if not run_local_script("fanout.py", {"HARDWAY_SSH_PASSWORD": password}):
+        log_message("⚠️ 사전 배포 실패, 각 노드에서 직접 다운로드합니다.")
+    return True
+
+def run_traced_step(step):
+    with tracing.span(step["name"], category="step"):
+        return step["run"]()
+
+# 의존성 그래프 기반 실행
+# 선행 단계가 모두 끝난 단계들을 동시에 실행합니다. 선택되지 않은 선행 단계는 이미 완료된 것으로 간주합니다.
+def run_step_graph(steps, selected=None):
+    selected = set(steps) if selected is None else set(selected)
+    pending = set(selected)
+    succeeded, failed, blocked = set(), set(), set()
+    running = {}
+    started_at = time.time()
+
+    with ThreadPoolExecutor(max_workers=len(selected) or 1) as executor:
+        while pending or running:
+            for step_id in sorted(pending, key=int):
+                deps = [dep for dep in steps[step_id]["deps"] if dep in selected]
+                if any(dep in failed or dep in blocked for dep in deps):
+                    pending.discard(step_id)
+                    blocked.add(step_id)
+                    log_message(f"⏭️ [{step_id}] {steps[step_id]['name']} 건너뜀 (선행 단계 실패)")
+                elif all(dep in succeeded for dep in deps):
+                    pending.discard(step_id)
+                    log_message(f"🚀 [{step_id}] {steps[step_id]['name']} 시작")
+                    running[executor.submit(run_traced_step, steps[step_id])] = (step_id, time.time())
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step_id, step_started = running.pop(future)
+                elapsed = time.time() - step_started
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    log_message(f"❌ [{step_id}] 예외 발생: {e}")
+                    ok = False
+                if ok:
+                    succeeded.add(step_id)
+                    log_message(f"✅ [{step_id}] {steps[step_id]['name']} 완료 ({elapsed:.1f}s)")
+                else:
+                    failed.add(step_id)
+                    log_message(f"❌ [{step_id}] {steps[step_id]['name']} 실패 ({elapsed:.1f}s)")
+
+    log_message(f"📋 전체 소요 시간: {time.time() - started_at:.1f}s / "
+                f"성공 {len(succeeded)}, 실패 {len(failed)}, 건너뜀 {len(blocked)}")
+    return not failed and not blocked
+
+# trace 저장 및 병합
+def finish_trace():
+    if trace_dir():
+        tracing.flush()
+        tracing.merge(trace_dir())
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kubernetes Hardway 클러스터 설정")
+    parser.add_argument("--all", action="store_true",
+                        help="대화형 메뉴 없이 의존성 순서에 따라 전체 단계를 실행합니다.")
+    parser.add_argument("--steps", help="실행할 단계 번호 목록 (예: 1,2,3). --all 과 함께 사용합니다.")
+    parser.add_argument("--max-concurrency", type=int, default=async_engine.MAX_CONCURRENCY,
+                        help="원격 스크립트를 동시에 실행할 최대 호스트 수")
+    parser.add_argument("--max-unavailable", type=int,
+                        help="rolling batch 크기 (한 번에 작업하는 호스트 수)")
+    parser.add_argument("--max-failures", type=int,
+                        help="이 개수만큼 실패하면 남은 호스트 작업을 중단합니다")
+    parser.add_argument("--no-bundle", action="store_true",
+                        help="노드 번들 대신 스크립트 파일을 개별 전송합니다")
+    parser.add_argument("--trace", metavar="DIR",
+                        help="단계/명령/전송 구간을 기록하고 DIR 에 Chrome trace(trace.json) 와 요약을 남깁니다")
+    parser.add_argument("--host-timeout", type=int, default=async_engine.HOST_TIMEOUT,
+                        help="호스트 하나에 허용하는 최대 시간 (초)")
+    return parser.parse_args()
+
+def get_password():
+    # 비대화형 실행을 위해 환경 변수를 우선 사용합니다.
+    password = os.environ.get("HARDWAY_SSH_PASSWORD")
+    if password:
+        return password
+    return getpass.getpass("\nSSH 비밀번호 입력: ")
+
 def main():
-    password = getpass.getpass("\nSSH 비밀번호 입력: ")
+    args = parse_args()
+    password = get_password()
+    if args.trace:
+        tracing.TRACE_HOST = "bastion"
+        tracing.TRACE_FILE = os.path.join(os.path.abspath(args.trace), "bastion-main.json")
+    remote_options = {
+        "max_concurrency": args.max_concurrency,
+        "max_unavailable": args.max_unavailable,
+        "max_failures": args.max_failures,
+        "host_timeout": args.host_timeout,
+        "use_bundle": not args.no_bundle,
+    }
+    steps = build_steps(password, remote_options)
+
+    if args.all:
+        selected = args.steps.split(",") if args.steps else None
+        if selected and not set(selected) <= set(steps):
+            log_message(f"❌ 알 수 없는 단계 번호: {args.steps}")
+            sys.exit(2)
+        succeeded = run_step_graph(steps, selected)
+        finish_trace()
+        sys.exit(0 if succeeded else 1)
 
     while True:
         print("\n========= Kubernetes Hardway 클러스터 설정 =========")
@@ -81,35 +297,18 @@ def main():
         print("10. TLS Bootstrapping 설정")
         print("11. Sub Worker Node 인증서 전송")
         print("12. Sub Worker Node 초기 세팅")
-        print("13. 종료")
+        print("13. 릴리스 바이너리 팬아웃 배포")
+        print("14. 전체 실행 (의존성 기반 병렬)")
+        print("15. 종료")
         print("===================================================")
-        choice = input("실행할 작업을 선택하세요 (1-13): ")
-
-        if choice == "1":
-            run_local_script("pcs_setup.py")
-        elif choice == "2":
-            run_local_script("cert_create.py")
-        elif choice == "3":
-            run_local_script("cert_transfer.py")
-        elif choice == "4":
-            run_remote_scripts_concurrently(MASTER_NODES, "root", password, "etcd_setup.py")
-        elif choice == "5":
-            run_remote_scripts_concurrently(MASTER_NODES, "root", password, "etcd_verify.py")
-        elif choice == "6":
-            run_remote_scripts_concurrently(MASTER_NODES, "root", password, "control_plane_setup.py")
-        elif choice == "7":
-            run_local_script("cert_create_worker.py")
-        elif choice == "8":
-            run_remote_script(WORKER_NODES[0], "root", password, "worker_node_setup.py")
-        elif choice == "9":
-            run_local_script("cni_setup.py")
-        elif choice == "10":
-            run_local_script("tls_setup.py")
-        elif choice == "11":
-            run_local_script("cert_sub_worker_node_transfer.py")
-        elif choice == "12":
-            run_remote_scripts_concurrently(WORKER_NODES[1:], "root", password, "sub_worker_node_setup.py")
-        elif choice == "13":
+        choice = input("실행할 작업을 선택하세요 (1-15): ")
+
+        if choice in steps:
+            steps[choice]["run"]()
+        elif choice == "14":
+            run_step_graph(steps)
+        elif choice == "15":
+            finish_trace()
             log_message("클러스터 설정 종료.")
             break
         else:
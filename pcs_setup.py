@@ -1,4 +1,5 @@
-from paramiko import SSHClient, AutoAddPolicy
+import ssh_pool
+import tracing
 
 # 사용자 설정
 SSH_USER = "root"
@@ -64,33 +65,23 @@ def log_message(message):
 
 # SSH 명령 실행 함수
 def run_ssh_command(host, username, password, command):
-    ssh = SSHClient()
-    ssh.set_missing_host_key_policy(AutoAddPolicy())
-    try:
-        ssh.connect(host, username=username, password=password)
-        stdin, stdout, stderr = ssh.exec_command(command)
-        output = stdout.read().decode().strip()
-        error = stderr.read().decode().strip()
-        if output:
-            log_message(output)
-        if error:
-            log_message(f"Error on {host}: {error}")
-        return output
-    finally:
-        ssh.close()
+    with tracing.span(command, category="command", host=host):
+        exit_status, output, error = ssh_pool.run_command(host, username, password, command)
+    if output:
+        log_message(output)
+    if error:
+        log_message(f"Error on {host}: {error}")
+    return output
 
 # 파일 전송 함수
 def send_file(host, username, password, local_path, remote_path):
-    ssh = SSHClient()
-    ssh.set_missing_host_key_policy(AutoAddPolicy())
+    sftp = ssh_pool.open_sftp(host, username, password)
     try:
-        ssh.connect(host, username=username, password=password)
-        sftp = ssh.open_sftp()
-        sftp.put(local_path, remote_path)
+        with tracing.span(f"sftp {local_path}", category="transfer", host=host):
+            sftp.put(local_path, remote_path)
         log_message(f"File {local_path} sent to {host}:{remote_path}")
-        sftp.close()
     finally:
-        ssh.close()
+        sftp.close()
 
 # 초기 설정 실행 함수
 def initial_setup():
@@ -131,13 +122,9 @@ def generate_and_distribute_authkey():
     remote_authkey_path = "/etc/corosync/authkey"
 
     # Retrieve authkey from the leader node
-    ssh = SSHClient()
-    ssh.set_missing_host_key_policy(AutoAddPolicy())
-    ssh.connect(leader_node['ip'], username=SSH_USER, password=SSH_PASSWORD)
-    sftp = ssh.open_sftp()
+    sftp = ssh_pool.open_sftp(leader_node['ip'], SSH_USER, SSH_PASSWORD)
     sftp.get(remote_authkey_path, local_authkey_path)
     sftp.close()
-    ssh.close()
 
     # Send authkey to other nodes
     for master in MASTER_NODES[1:]:
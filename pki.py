@@ -0,0 +1,271 @@
+import argparse
+import datetime
+import ipaddress
+import os
+import socket
+import ssl
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from cryptography.x509.oid import NameOID
+
+# 설정
+# 키 알고리즘 프로필: rsa-2048, rsa-4096, ecdsa-p256, ed25519
+KEY_PROFILES = ["rsa-2048", "rsa-4096", "ecdsa-p256", "ed25519"]
+KEY_PROFILE = os.environ.get("HARDWAY_KEY_PROFILE", "rsa-2048")
+CA_DAYS = 3650
+CERT_DAYS = 365
+CA_COMMON_NAME = "KUBERNETES-CA"
+KEYGEN_WORKERS = os.cpu_count() or 1  # 키 생성 프로세스 수 (Bastion 코어 수)
+
+# cert_dir 별로 한 번만 읽어 둔 CA (키, 인증서)
+_ca_cache = {}
+
+
+# 개인 키 생성
+def generate_key(profile=KEY_PROFILE):
+    if profile == "rsa-2048":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if profile == "rsa-4096":
+        return rsa.generate_private_key(public_exponent=65537, key_size=4096)
+    if profile == "ecdsa-p256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if profile == "ed25519":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"지원하지 않는 키 프로필: {profile} (가능한 값: {', '.join(KEY_PROFILES)})")
+
+
+# service account 서명 키 프로필
+# kube-apiserver 의 service account 토큰 서명(RS256/ES256)은 Ed25519 를 지원하지 않으므로 ECDSA P-256 을 사용합니다.
+def service_account_profile(profile=KEY_PROFILE):
+    return "ecdsa-p256" if profile == "ed25519" else profile
+
+
+def _generate_key_der(profile):
+    return generate_key(profile).private_bytes(serialization.Encoding.DER, serialization.PrivateFormat.PKCS8,
+                                               serialization.NoEncryption())
+
+
+# Ed25519 는 서명 시 해시 알고리즘을 따로 지정하지 않습니다.
+def _signature_hash(key):
+    return None if isinstance(key, ed25519.Ed25519PrivateKey) else hashes.SHA256()
+
+
+# 여러 개의 개인 키를 프로세스 풀에서 병렬 생성
+# 완료되는 순서대로 키를 돌려주므로 받는 즉시 서명을 시작할 수 있습니다.
+# 프로세스 간에는 DER 바이트로 주고받고, 방금 생성한 키이므로 RSA 키 검증 없이 읽습니다.
+# (검증 비용이 생성 비용과 비슷해서, 검증하면 부모 프로세스에서 생성을 한 번 더 하는 셈입니다.)
+def generate_keys(count, profile=KEY_PROFILE, max_workers=KEYGEN_WORKERS):
+    if count <= 1 or max_workers <= 1:
+        for _ in range(count):
+            yield generate_key(profile)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, count)) as executor:
+        futures = [executor.submit(_generate_key_der, profile) for _ in range(count)]
+        for future in as_completed(futures):
+            yield serialization.load_der_private_key(future.result(), password=None,
+                                                     unsafe_skip_rsa_key_validation=True)
+
+
+def key_to_pem(key):
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                             serialization.NoEncryption())
+
+
+def cert_to_pem(cert):
+    return cert.public_bytes(serialization.Encoding.PEM)
+
+
+def make_name(common_name, organization=None):
+    attributes = [x509.NameAttribute(NameOID.COMMON_NAME, common_name)]
+    if organization:
+        attributes.append(x509.NameAttribute(NameOID.ORGANIZATION_NAME, organization))
+    return x509.Name(attributes)
+
+
+def _builder(subject, issuer, public_key, days):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (x509.CertificateBuilder()
+            .subject_name(subject)
+            .issuer_name(issuer)
+            .public_key(public_key)
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(minutes=5))
+            .not_valid_after(now + datetime.timedelta(days=days))
+            .add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False))
+
+
+# 자체 서명 CA 생성
+# keyCertSign/cRLSign 은 항상 넣고, keyEncipherment 는 RSA 키일 때만 넣습니다. (EC/Ed25519 에는 허용되지 않음)
+def create_ca(common_name=CA_COMMON_NAME, days=CA_DAYS, key=None, profile=KEY_PROFILE):
+    key = key or generate_key(profile)
+    name = make_name(common_name)
+    cert = (_builder(name, name, key.public_key(), days)
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .add_extension(x509.KeyUsage(digital_signature=True, content_commitment=False,
+                                         key_encipherment=isinstance(key, rsa.RSAPrivateKey),
+                                         data_encipherment=False, key_agreement=False, key_cert_sign=True,
+                                         crl_sign=True, encipher_only=False, decipher_only=False), critical=True)
+            .sign(key, _signature_hash(key)))
+    return key, cert
+
+
+# CA 로 공개 키에 서명 (CSR 서명 등 개인 키가 없는 경우)
+# dns_names / ip_addresses 를 넘기면 subjectAltName 이 추가됩니다. (openssl v3_req 구성과 같은 확장)
+# keyEncipherment 는 RSA 키에만 의미가 있으므로 RSA 일 때만 넣습니다.
+def sign_public_key(ca_key, ca_cert, public_key, common_name, organization=None, dns_names=(), ip_addresses=(),
+                    days=CERT_DAYS):
+    builder = (_builder(make_name(common_name, organization), ca_cert.subject, public_key, days)
+               .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()),
+                              critical=False)
+               .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=False)
+               .add_extension(x509.KeyUsage(digital_signature=True, content_commitment=True,
+                                            key_encipherment=isinstance(public_key, rsa.RSAPublicKey),
+                                            data_encipherment=False, key_agreement=False, key_cert_sign=False,
+                                            crl_sign=False, encipher_only=False, decipher_only=False),
+                              critical=False))
+    alt_names = ([x509.DNSName(name) for name in dns_names]
+                 + [x509.IPAddress(ipaddress.ip_address(ip)) for ip in ip_addresses])
+    if alt_names:
+        builder = builder.add_extension(x509.SubjectAlternativeName(alt_names), critical=False)
+    return builder.sign(ca_key, _signature_hash(ca_key))
+
+
+# CA 로 서명한 인증서 발급
+def issue(ca_key, ca_cert, common_name, organization=None, dns_names=(), ip_addresses=(),
+          days=CERT_DAYS, key=None, profile=KEY_PROFILE):
+    key = key or generate_key(profile)
+    return key, sign_public_key(ca_key, ca_cert, key.public_key(), common_name, organization, dns_names,
+                                ip_addresses, days)
+
+
+# 파일 원자적 저장
+def write_file(path, data, mode=0o644):
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+# <name>.key / <name>.crt 저장 (개인 키는 0600)
+def write_pair(cert_dir, name, key, cert):
+    os.makedirs(cert_dir, exist_ok=True)
+    write_file(os.path.join(cert_dir, f"{name}.key"), key_to_pem(key), 0o600)
+    write_file(os.path.join(cert_dir, f"{name}.crt"), cert_to_pem(cert))
+
+
+def load_pair(cert_dir, name):
+    with open(os.path.join(cert_dir, f"{name}.key"), "rb") as f:
+        key = serialization.load_pem_private_key(f.read(), password=None)
+    with open(os.path.join(cert_dir, f"{name}.crt"), "rb") as f:
+        cert = x509.load_pem_x509_certificate(f.read())
+    return key, cert
+
+
+# CA 생성 후 저장
+def init_ca(cert_dir, common_name=CA_COMMON_NAME, days=CA_DAYS, key=None, profile=KEY_PROFILE):
+    key, cert = create_ca(common_name, days, key, profile)
+    write_pair(cert_dir, "ca", key, cert)
+    _ca_cache[cert_dir] = (key, cert)
+    return key, cert
+
+
+# 저장된 CA 읽기 (프로세스당 한 번)
+def load_ca(cert_dir):
+    if cert_dir not in _ca_cache:
+        _ca_cache[cert_dir] = load_pair(cert_dir, "ca")
+    return _ca_cache[cert_dir]
+
+
+# CA 로 인증서를 발급하고 <name>.key / <name>.crt 로 저장
+def issue_to_dir(cert_dir, name, common_name, organization=None, dns_names=(), ip_addresses=(), days=CERT_DAYS,
+                 key=None, profile=KEY_PROFILE):
+    ca_key, ca_cert = load_ca(cert_dir)
+    key, cert = issue(ca_key, ca_cert, common_name, organization, dns_names, ip_addresses, days, key, profile)
+    write_pair(cert_dir, name, key, cert)
+    return key, cert
+
+
+# 키 생성 벤치마크: 순차 생성과 프로세스 풀 생성 비교
+def benchmark(counts, profile=KEY_PROFILE, max_workers=KEYGEN_WORKERS):
+    print(f"{profile} 키 생성 (프로세스 {max_workers}개)")
+    print(f"{'identities':>10} {'serial(s)':>10} {'pool(s)':>10} {'speedup':>8} {'first key(s)':>13}")
+    for count in counts:
+        started = time.perf_counter()
+        for _ in generate_keys(count, profile, max_workers=1):
+            pass
+        serial = time.perf_counter() - started
+
+        started = time.perf_counter()
+        first = None
+        for _ in generate_keys(count, profile, max_workers):
+            first = first or time.perf_counter() - started
+        pooled = time.perf_counter() - started
+        print(f"{count:>10} {serial:>10.2f} {pooled:>10.2f} {serial / pooled:>7.1f}x {first:>13.3f}")
+
+
+def _handshake_server(context, listener, count):
+    for _ in range(count):
+        connection, _ = listener.accept()
+        try:
+            with context.wrap_socket(connection, server_side=True) as tls:
+                tls.recv(1)
+        except (ssl.SSLError, OSError):
+            pass
+
+
+# TLS 핸드셰이크 처리량 벤치마크 (localhost)
+# 프로필마다 CA 와 서버 인증서를 만들고, 세션 재사용 없이 전체 핸드셰이크를 count 번 수행합니다.
+def handshake_benchmark(profiles=KEY_PROFILES, count=500):
+    print(f"{'profile':<12} {'keygen(ms)':>10} {'handshakes/s':>13}")
+    for profile in profiles:
+        with tempfile.TemporaryDirectory() as cert_dir:
+            started = time.perf_counter()
+            key = generate_key(profile)
+            keygen = (time.perf_counter() - started) * 1000
+
+            ca_key, ca_cert = create_ca(key=generate_key(profile))
+            write_pair(cert_dir, "ca", ca_key, ca_cert)
+            write_pair(cert_dir, "server", *issue(ca_key, ca_cert, "localhost", dns_names=["localhost"],
+                                                  ip_addresses=["127.0.0.1"], key=key))
+
+            server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            server_context.load_cert_chain(os.path.join(cert_dir, "server.crt"), os.path.join(cert_dir, "server.key"))
+            client_context = ssl.create_default_context(cafile=os.path.join(cert_dir, "ca.crt"))
+
+            with socket.create_server(("127.0.0.1", 0)) as listener:
+                server = threading.Thread(target=_handshake_server, args=(server_context, listener, count), daemon=True)
+                server.start()
+                started = time.perf_counter()
+                for _ in range(count):
+                    with socket.create_connection(listener.getsockname()) as sock:
+                        with client_context.wrap_socket(sock, server_hostname="localhost") as tls:
+                            tls.sendall(b"x")
+                elapsed = time.perf_counter() - started
+                server.join()
+        print(f"{profile:<12} {keygen:>10.1f} {count / elapsed:>13.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PKI 도구")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    benchmark_parser = subparsers.add_parser("benchmark", help="키 생성 병렬화 벤치마크")
+    benchmark_parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    benchmark_parser.add_argument("--profile", choices=KEY_PROFILES, default=KEY_PROFILE)
+    benchmark_parser.add_argument("--workers", type=int, default=KEYGEN_WORKERS)
+    handshake_parser = subparsers.add_parser("handshake", help="키 프로필별 TLS 핸드셰이크 처리량 벤치마크")
+    handshake_parser.add_argument("--profiles", nargs="+", choices=KEY_PROFILES, default=KEY_PROFILES)
+    handshake_parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+    if args.command == "benchmark":
+        benchmark(args.counts, args.profile, args.workers)
+    else:
+        handshake_benchmark(args.profiles, args.count)
@@ -0,0 +1,98 @@
+import os
+import select
+import sys
+import threading
+import time
+from collections import deque
+
+# 설정
+LOG_DIR = "/root/hardway/logs"
+READ_CHUNK = 32768  # 채널에서 한 번에 읽는 최대 바이트
+MAX_LINE_BYTES = 4096  # 한 줄 최대 길이 (초과분은 잘라냅니다)
+TAIL_LINES = 200  # 호스트별로 메모리에 남겨두는 마지막 출력 줄 수
+POLL_INTERVAL = 0.2
+
+_console_lock = threading.Lock()
+
+
+# 줄 단위 버퍼
+# 개행이 오기 전까지의 조각만 보관하며, MAX_LINE_BYTES 를 넘으면 잘라서 내보냅니다.
+class LineBuffer:
+    def __init__(self, emit):
+        self.emit = emit
+        self.partial = bytearray()
+        self.truncated = False
+
+    def feed(self, data):
+        while data:
+            newline = data.find(b"\n")
+            chunk, data = (data, b"") if newline < 0 else (data[:newline], data[newline + 1:])
+            room = MAX_LINE_BYTES - len(self.partial)
+            if len(chunk) > room:
+                chunk = chunk[:max(room, 0)]
+                self.truncated = True
+            self.partial += chunk
+            if newline >= 0:
+                self._flush_line()
+
+    def close(self):
+        if self.partial:
+            self._flush_line()
+
+    def _flush_line(self):
+        line = self.partial.decode("utf-8", errors="replace").rstrip("\r")
+        if self.truncated:
+            line += " …(truncated)"
+        self.partial = bytearray()
+        self.truncated = False
+        self.emit(line)
+
+
+# 호스트별 출력 대상
+# 콘솔(호스트 접두어 + 타임스탬프)과 호스트별 로그 파일에 동시에 기록합니다.
+class HostOutput:
+    def __init__(self, host, script_name):
+        self.host = host
+        self.tail = deque(maxlen=TAIL_LINES)
+        os.makedirs(LOG_DIR, exist_ok=True)
+        log_name = f"{host}-{os.path.splitext(script_name)[0]}.log"
+        self.log_path = os.path.join(LOG_DIR, log_name)
+        self.log_file = open(self.log_path, "a", encoding="utf-8", errors="replace")
+
+    def write_line(self, line, is_error=False):
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        marker = "❗" if is_error else ""
+        formatted = f"[{timestamp}] [{self.host}] {marker}{line}"
+        with _console_lock:
+            print(formatted, file=sys.stdout, flush=True)
+        self.log_file.write(formatted + "\n")
+        self.log_file.flush()
+        self.tail.append(formatted)
+
+    def close(self):
+        self.log_file.close()
+
+
+# 채널 출력 스트리밍
+# stdout/stderr 를 도착하는 대로 줄 단위로 내보내고 원격 종료 코드를 반환합니다.
+def stream_channel(channel, output):
+    stdout_buffer = LineBuffer(lambda line: output.write_line(line))
+    stderr_buffer = LineBuffer(lambda line: output.write_line(line, is_error=True))
+
+    while True:
+        received = False
+        if channel.recv_ready():
+            stdout_buffer.feed(channel.recv(READ_CHUNK))
+            received = True
+        if channel.recv_stderr_ready():
+            stderr_buffer.feed(channel.recv_stderr(READ_CHUNK))
+            received = True
+        if received:
+            continue
+        if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+            break
+        select.select([channel], [], [], POLL_INTERVAL)
+
+    stdout_buffer.close()
+    stderr_buffer.close()
+    return channel.recv_exit_status()
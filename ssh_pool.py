@@ -0,0 +1,112 @@
+import atexit
+import threading
+import paramiko
+
+# 설정
+KEEPALIVE_INTERVAL = 30  # 초 단위 keep-alive 주기
+CONNECT_TIMEOUT = 10
+RETRYABLE_ERRORS = (paramiko.SSHException, EOFError, OSError)
+
+# 호스트별 연결 저장소
+# (host, username) -> paramiko.SSHClient
+# 하나의 Transport 위에서 exec/sftp/scp 채널을 여러 개 열어 사용합니다.
+# sshd 의 MaxSessions(기본 10)를 넘는 동시 채널은 열 수 없습니다.
+_connections = {}
+_host_locks = {}
+_registry_lock = threading.Lock()
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[SSH]: {message}")
+
+
+def _lock_for(key):
+    with _registry_lock:
+        return _host_locks.setdefault(key, threading.Lock())
+
+
+# 연결 상태 확인 함수
+def _is_healthy(client):
+    transport = client.get_transport()
+    if transport is None or not transport.is_active():
+        return False
+    try:
+        transport.send_ignore()
+        return True
+    except RETRYABLE_ERRORS:
+        return False
+
+
+# 연결 획득 함수 (없거나 끊어진 경우 재연결)
+def get_client(host, username, password):
+    key = (host, username)
+    with _lock_for(key):
+        client = _connections.get(key)
+        if client is not None and _is_healthy(client):
+            return client
+
+        if client is not None:
+            log_message(f"♻️ {host} 연결이 끊어져 재연결합니다.")
+            client.close()
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(host, username=username, password=password, timeout=CONNECT_TIMEOUT)
+        client.get_transport().set_keepalive(KEEPALIVE_INTERVAL)
+        _connections[key] = client
+        return client
+
+
+def get_transport(host, username, password):
+    return get_client(host, username, password).get_transport()
+
+
+# 연결 폐기 함수
+def invalidate(host, username):
+    key = (host, username)
+    with _lock_for(key):
+        client = _connections.pop(key, None)
+    if client is not None:
+        client.close()
+
+
+# 채널을 여는 도중 연결이 끊어진 경우 한 번 재연결 후 다시 시도합니다.
+def _with_retry(host, username, password, action):
+    for attempt in range(2):
+        client = get_client(host, username, password)
+        try:
+            return action(client)
+        except RETRYABLE_ERRORS:
+            if attempt:
+                raise
+            invalidate(host, username)
+
+
+def exec_command(host, username, password, command, timeout=None):
+    return _with_retry(host, username, password,
+                       lambda client: client.exec_command(command, timeout=timeout))
+
+
+# 명령 실행 후 (종료 코드, 표준 출력, 표준 에러) 반환
+def run_command(host, username, password, command, timeout=None):
+    stdin, stdout, stderr = exec_command(host, username, password, command, timeout=timeout)
+    output = stdout.read().decode("utf-8", errors="replace").strip()
+    error = stderr.read().decode("utf-8", errors="replace").strip()
+    return stdout.channel.recv_exit_status(), output, error
+
+
+def open_sftp(host, username, password):
+    return _with_retry(host, username, password, lambda client: client.open_sftp())
+
+
+# 모든 연결 종료
+def close_all():
+    with _registry_lock:
+        clients = list(_connections.values())
+        _connections.clear()
+    for client in clients:
+        client.close()
+
+
+atexit.register(close_all)
@@ -0,0 +1,99 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import tracing
+
+# 설정
+# Bastion 과 각 노드에서 단계별 입력 지문(fingerprint)을 기록하는 파일
+STATE_FILE = os.environ.get("HARDWAY_STATE_FILE", "/root/hardway/state/steps.json")
+
+_lock = threading.Lock()
+
+
+# 파일 내용 해시 (파일이 없으면 None)
+def file_digest(path):
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 입력값 지문 생성
+# 설정값, 템플릿 내용, 바이너리 버전, 인증서 해시 등을 dict/list 로 넘기면 됩니다.
+def fingerprint(inputs):
+    canonical = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# 상태 파일 잠금
+# 같은 호스트에서 여러 단계 프로세스가 동시에 기록하므로 스레드 잠금과 함께 잠금 파일에 flock 을 잡습니다.
+@contextlib.contextmanager
+def _locked():
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with _lock, open(f"{STATE_FILE}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+# 같은 디렉토리의 고유한 임시 파일에 쓴 뒤 rename 으로 교체
+def _save_state(state):
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(STATE_FILE)}.", dir=os.path.dirname(STATE_FILE))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, STATE_FILE)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def record(step, inputs):
+    with _locked():
+        state = load_state()
+        state[step] = fingerprint(inputs)
+        _save_state(state)
+
+
+def forget(step):
+    with _locked():
+        state = load_state()
+        if state.pop(step, None) is not None:
+            _save_state(state)
+
+
+# 지문이 같고 사후 조건(postcondition)도 만족하면 이미 수렴된 단계로 봅니다.
+def is_converged(step, inputs, postcondition=None):
+    if load_state().get(step) != fingerprint(inputs):
+        return False
+    return postcondition is None or bool(postcondition())
+
+
+# 단계 실행
+# 변경이 없으면 건너뛰고 False, 실행했으면 True 를 반환합니다.
+def run_step(step, inputs, func, postcondition=None, log=print):
+    with tracing.span(step, category="step"):
+        if is_converged(step, inputs, postcondition):
+            log(f"⏭️ {step}: 입력 변경 없음, 건너뜀")
+            return False
+        func()
+        record(step, inputs)
+        return True
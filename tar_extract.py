@@ -0,0 +1,78 @@
+import argparse
+import hashlib
+import os
+import tarfile
+import time
+
+# 설정
+CHUNK_SIZE = 1024 * 1024
+
+
+# 로그 작성 함수
+def log_message(message):
+    print(f"[EXTRACT]: {message}", flush=True)
+
+
+def _sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 필요한 파일만 골라 압축 해제
+# wanted: {아카이브 안의 파일 이름(경로 제외): 설치 경로}
+# 압축 파일을 처음부터 한 번만 읽으면서 필요한 멤버만 설치 경로 옆 임시 파일로 풀고,
+# 디스크의 파일과 sha256 이 같으면 그대로 두고 다르면 rename 으로 교체합니다.
+def extract(archive_path, wanted, mode=None):
+    results = {}
+    with tarfile.open(archive_path, "r|*") as archive:
+        for member in archive:
+            name = os.path.basename(member.name.rstrip("/"))
+            if not member.isfile() or name not in wanted or wanted[name] in results:
+                continue
+            dest = wanted[name]
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            current = _sha256_of(dest) if os.path.exists(dest) and os.path.getsize(dest) == member.size else None
+
+            tmp_path = f"{dest}.extract-tmp"
+            digest = hashlib.sha256()
+            source = archive.extractfile(member)
+            with open(tmp_path, "wb") as f:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+            if digest.hexdigest() == current:
+                os.unlink(tmp_path)
+                results[dest] = "unchanged"
+            else:
+                os.chmod(tmp_path, mode if mode is not None else member.mode & 0o777)
+                os.replace(tmp_path, dest)
+                results[dest] = "written"
+
+            if len(results) == len(wanted):
+                break  # 필요한 파일을 모두 찾으면 나머지는 읽지 않습니다.
+
+    missing = sorted(name for name, dest in wanted.items() if dest not in results)
+    if missing:
+        raise FileNotFoundError(f"{os.path.basename(archive_path)} 에 없는 파일: {', '.join(missing)}")
+    return results
+
+
+# 결과 요약 문자열
+def summarize(results):
+    written = sorted(os.path.basename(dest) for dest, status in results.items() if status == "written")
+    unchanged = len(results) - len(written)
+    return f"설치 {len(written)}개{' (' + ', '.join(written) + ')' if written else ''}, 변경 없음 {unchanged}개"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="압축 파일에서 필요한 파일만 설치")
+    parser.add_argument("archive")
+    parser.add_argument("dest_dir")
+    parser.add_argument("names", nargs="+")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    results = extract(args.archive, {name: os.path.join(args.dest_dir, name) for name in args.names})
+    log_message(f"✅ {summarize(results)} ({time.perf_counter() - started:.2f}s)")
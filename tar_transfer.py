@@ -0,0 +1,155 @@
+import hashlib
+import io
+import json
+import os
+import shlex
+import tarfile
+import threading
+import time
+
+import ssh_pool
+import tracing
+
+# 설정
+OWNER_UID = 0
+OWNER_GID = 0
+DIR_MODE = 0o755
+
+# 노드에서 실행되는 압축 해제기 (python3 -c 로 실행, 표준 입력으로 tar 를 받음)
+# 모든 파일을 임시 이름으로 먼저 쓰고 fsync/chown/chmod 한 뒤, 전부 성공했을 때만 rename 으로 교체합니다.
+UNPACKER = """import json, os, sys, tarfile
+staged = []
+try:
+    with tarfile.open(fileobj=sys.stdin.buffer, mode="r|") as archive:
+        for member in archive:
+            path = "/" + member.name.lstrip("/")
+            if not member.isfile() or ".." in path.split("/"):
+                raise ValueError("unsupported member: " + member.name)
+            os.makedirs(os.path.dirname(path), mode=%(dir_mode)d, exist_ok=True)
+            tmp_path = path + ".hardway-tmp"
+            staged.append((tmp_path, path))
+            with open(tmp_path, "wb") as f:
+                f.write(archive.extractfile(member).read())
+                f.flush()
+                os.fsync(f.fileno())
+            os.chown(tmp_path, member.uid, member.gid)
+            os.chmod(tmp_path, member.mode)
+except BaseException as e:
+    for tmp_path, _ in staged:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    sys.exit("unpack failed: %%s" %% e)
+for tmp_path, path in staged:
+    os.replace(tmp_path, path)
+print(json.dumps({"written": [path for _, path in staged]}))
+""" % {"dir_mode": DIR_MODE}
+REMOTE_COMMAND = f"python3 -c {shlex.quote(UNPACKER)}"
+
+# 노드의 파일 상태 조회기 (표준 입력으로 경로 목록 JSON 을 받아 {경로: [sha256, 권한]} 출력, 없으면 null)
+DIGESTER = """import hashlib, json, os, sys
+result = {}
+for path in json.load(sys.stdin):
+    try:
+        with open(path, "rb") as f:
+            result[path] = [hashlib.sha256(f.read()).hexdigest(), os.fstat(f.fileno()).st_mode & 0o777]
+    except OSError:
+        result[path] = None
+print(json.dumps(result))
+"""
+REMOTE_DIGEST_COMMAND = f"python3 -c {shlex.quote(DIGESTER)}"
+
+
+# 전송할 파일 목록으로 tar 생성 (메모리)
+# files: [(노드의 절대 경로, 내용 bytes, 권한)]
+def build_archive(files, uid=OWNER_UID, gid=OWNER_GID):
+    buffer = io.BytesIO()
+    mtime = time.time()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.PAX_FORMAT) as archive:
+        for dest_path, data, mode in files:
+            info = tarfile.TarInfo(dest_path.lstrip("/"))
+            info.size = len(data)
+            info.mode = mode
+            info.uid, info.gid = uid, gid
+            info.mtime = mtime
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+# 로컬 파일 읽기: [(로컬 경로, 노드의 경로)] -> [(노드의 경로, 내용, 권한)]
+# 권한은 로컬 파일과 같게 맞춥니다. (scp.put 과 같은 동작)
+def read_files(sources):
+    files = []
+    for src_path, dest_path in sources:
+        with open(src_path, "rb") as f:
+            files.append((dest_path, f.read(), os.fstat(f.fileno()).st_mode & 0o777))
+    return files
+
+
+# timeout: 채널의 읽기/쓰기 한 번에 대한 제한 시간 (paramiko)
+# deadline: time.monotonic() 기준 전체 마감 시각. 지나면 채널을 닫고 TimeoutError 를 냅니다.
+#           (조금씩 계속 전송되어 timeout 에 걸리지 않는 경우도 끊습니다.)
+def _exec(host, username, password, command, data, timeout, deadline=None):
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"{host} 전송 마감 시간 초과")
+        timeout = min(timeout or remaining, remaining)
+    stdin, stdout, stderr = ssh_pool.exec_command(host, username, password, command, timeout=timeout)
+    expired = threading.Event()
+    watchdog = None
+    if deadline is not None:
+        watchdog = threading.Timer(max(0, deadline - time.monotonic()),
+                                   lambda: (expired.set(), stdout.channel.close()))
+        watchdog.daemon = True
+        watchdog.start()
+    try:
+        stdin.write(data)
+        stdin.flush()
+        stdin.channel.shutdown_write()
+        output = stdout.read().decode("utf-8", errors="replace").strip()
+        error = stderr.read().decode("utf-8", errors="replace").strip()
+        status = stdout.channel.recv_exit_status()
+    except Exception as e:
+        if expired.is_set():
+            raise TimeoutError(f"{host} 전송 마감 시간 초과") from e
+        raise
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+    if expired.is_set():
+        raise TimeoutError(f"{host} 전송 마감 시간 초과")
+    return status, output, error
+
+
+# 노드 하나로 파일 묶음 전송
+# 채널 하나에서 tar 를 보내고 압축 해제까지 끝내므로 파일 수와 상관없이 왕복은 한 번입니다.
+def send(host, username, password, files, timeout=None, deadline=None):
+    archive = build_archive(files)
+    with tracing.span(f"tar {len(files)} files", category="transfer", host=host, bytes=len(archive)):
+        status, output, error = _exec(host, username, password, REMOTE_COMMAND, archive, timeout, deadline)
+    if status != 0:
+        raise RuntimeError(f"{host} 파일 설치 실패 (종료 코드 {status}): {error}")
+    return json.loads(output)["written"]
+
+
+# 노드에 있는 파일들의 sha256 과 권한을 한 번의 호출로 조회
+def remote_digests(host, username, password, paths, timeout=None, deadline=None):
+    with tracing.span(f"digest {len(paths)} files", category="transfer", host=host):
+        status, output, error = _exec(host, username, password, REMOTE_DIGEST_COMMAND,
+                                      json.dumps(list(paths)).encode("utf-8"), timeout, deadline)
+    if status != 0:
+        raise RuntimeError(f"{host} 파일 상태 조회 실패 (종료 코드 {status}): {error}")
+    return json.loads(output)
+
+
+# 내용이나 권한이 다른 파일만 전송
+# 반환값: (전송한 경로 목록, 이미 같은 경로 목록)
+def sync(host, username, password, files, timeout=None, deadline=None):
+    remote = remote_digests(host, username, password, [dest_path for dest_path, _, _ in files], timeout, deadline)
+    changed = [(dest_path, data, mode) for dest_path, data, mode in files
+               if remote.get(dest_path) != [hashlib.sha256(data).hexdigest(), mode]]
+    if changed:
+        send(host, username, password, changed, timeout, deadline)
+    changed_paths = {dest_path for dest_path, _, _ in changed}
+    return ([dest_path for dest_path, _, _ in changed],
+            [dest_path for dest_path, _, _ in files if dest_path not in changed_paths])
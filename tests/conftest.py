@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 스크립트들은 저장소 최상위에 평평하게 있으므로 import 경로에 추가합니다.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
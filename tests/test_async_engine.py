@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import async_engine
+
+
+def _hosts(count):
+    return [f"10.0.0.{index}" for index in range(count)]
+
+
+def _run(engine, hosts, task, **kwargs):
+    return asyncio.run(engine.run_on_hosts(hosts, task, **kwargs))
+
+
+# 제한 시간을 넘긴 호스트만 실패하고, 나머지는 기다리지 않고 끝나야 합니다.
+def test_host_timeout_fails_only_slow_host():
+    async def task(backend, host):
+        await asyncio.sleep(10 if host == "10.0.0.0" else 0)
+        status = await backend.run(host, "true", async_engine.NullOutput(host))
+        return async_engine.make_result(host, "ok", status)
+
+    engine = async_engine.Engine(async_engine.LoopbackBackend(), host_timeout=0.2)
+    started = time.perf_counter()
+    results = _run(engine, _hosts(3), task)
+
+    assert time.perf_counter() - started < 2
+    assert results["10.0.0.0"]["status"] == "failed"
+    assert results["10.0.0.0"]["error"] == "timeout after 0.2s"
+    assert [results[host]["status"] for host in _hosts(3)[1:]] == ["ok", "ok"]
+
+
+# 실패가 max_failures 에 도달하면 진행 중인 작업은 취소되고 skipped 로 남아야 합니다.
+def test_in_flight_tasks_are_cancelled_when_breaker_trips():
+    cancelled = []
+
+    async def task(backend, host):
+        if host == "10.0.0.0":
+            raise RuntimeError("boom")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(host)
+            raise
+        return async_engine.make_result(host, "ok", 0)
+
+    engine = async_engine.Engine(async_engine.LoopbackBackend())
+    started = time.perf_counter()
+    results = _run(engine, _hosts(4), task, max_failures=1)
+
+    assert time.perf_counter() - started < 2
+    assert results["10.0.0.0"] == async_engine.make_result("10.0.0.0", "failed", error="boom")
+    assert sorted(cancelled) == _hosts(4)[1:]
+    assert all(results[host]["status"] == "skipped" for host in _hosts(4)[1:])
+
+
+# 첫 배치에서 차단기가 열리면 이후 배치는 시작하지 않아야 합니다.
+def test_breaker_stops_later_batches():
+    started_hosts = []
+
+    async def task(backend, host):
+        started_hosts.append(host)
+        exit_status = await backend.run(host, "check", async_engine.NullOutput(host))
+        return async_engine.make_result(host, "ok" if exit_status == 0 else "failed", exit_status)
+
+    backend = async_engine.LoopbackBackend(handler=lambda host, command: (1 if host == "10.0.0.1" else 0, []))
+    results = _run(async_engine.Engine(backend), _hosts(6), task, max_unavailable=2, max_failures=1)
+
+    assert sorted(started_hosts) == _hosts(2)
+    assert results["10.0.0.1"]["status"] == "failed"
+    assert all(results[host]["status"] == "skipped" for host in _hosts(6)[2:])
+
+
+# max_unavailable 개씩 끊어서, 앞 배치가 모두 끝나야 다음 배치가 시작되어야 합니다.
+def test_rolling_batches_respect_batch_size():
+    events, running, peak = [], set(), [0]
+
+    async def task(backend, host):
+        events.append(("start", host))
+        running.add(host)
+        peak[0] = max(peak[0], len(running))
+        await backend.run(host, "true", async_engine.NullOutput(host))
+        running.discard(host)
+        events.append(("end", host))
+        return async_engine.make_result(host, "ok", 0)
+
+    hosts = _hosts(7)
+    results = _run(async_engine.Engine(async_engine.LoopbackBackend(latency=0.01)), hosts, task, max_unavailable=3)
+
+    assert peak[0] == 3
+    assert all(result["status"] == "ok" for result in results.values())
+    for previous, batch in [(hosts[0:3], hosts[3:6]), (hosts[3:6], hosts[6:7])]:
+        first_start = min(events.index(("start", host)) for host in batch)
+        assert all(events.index(("end", host)) < first_start for host in previous)
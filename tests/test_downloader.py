@@ -0,0 +1,120 @@
+import hashlib
+import importlib
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import downloader
+
+
+# 로컬 HTTP 서버 대역 (Range 지원, 파일마다 첫 응답은 절반만 보내고 끊어 이어받기를 확인)
+class RangeHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return self.send_error(404)
+        size = os.path.getsize(path)
+        start = int(self.headers["Range"][len("bytes="):].split("-")[0]) if self.headers.get("Range") else 0
+        if start >= size:
+            return self.send_error(416)
+        with self.server.lock:
+            cut = self.path not in self.server.interrupted and not self.path.endswith(".sha256")
+            self.server.interrupted.add(self.path)
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.send_header("Content-Length", str(size - start))
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            self.wfile.write(f.read(size // 2 if cut else size - start))
+        self.server.ranges.append(self.headers.get("Range"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, "RETRY_DELAY", 0)
+    directory = tmp_path / "served"
+    directory.mkdir()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), lambda *args: RangeHandler(*args, directory=str(directory)))
+    server.lock, server.interrupted, server.ranges = threading.Lock(), set(), []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield directory, f"http://127.0.0.1:{server.server_address[1]}", server
+    server.shutdown()
+    server.server_close()
+
+
+def _publish(directory, name, data, checksum=None):
+    (directory / name).write_bytes(data)
+    if checksum is not None:
+        (directory / f"{name}.sha256").write_text(f"{checksum}  {name}\n")
+
+
+def test_resumed_download_is_verified_and_installed(served, tmp_path):
+    directory, base, server = served
+    data = os.urandom(4 * 1024 * 1024)
+    _publish(directory, "kubelet", data, hashlib.sha256(data).hexdigest())
+    dest = tmp_path / "bin" / "kubelet"
+
+    assert downloader.download(f"{base}/kubelet", str(dest)) is True
+    assert dest.read_bytes() == data
+    assert os.stat(dest).st_mode & 0o777 == 0o755
+    assert f"bytes={len(data) // 2}-" in server.ranges  # 끊긴 곳부터 이어받음
+    assert not os.path.exists(f"{dest}.part")
+    assert downloader.download(f"{base}/kubelet", str(dest)) is False  # 이미 최신
+
+
+def test_resumed_download_with_wrong_checksum_is_rejected(served, tmp_path):
+    directory, base, server = served
+    _publish(directory, "kubelet", os.urandom(1024 * 1024), "0" * 64)
+    dest = tmp_path / "bin" / "kubelet"
+
+    with pytest.raises(ValueError, match="sha256 불일치"):
+        downloader.download(f"{base}/kubelet", str(dest))
+    assert server.ranges[-1] is not None  # 이어받은 뒤 확인에서 실패
+    assert not dest.exists() and not os.path.exists(f"{dest}.part")
+
+
+def test_download_all_installs_changed_files_only(served, tmp_path):
+    directory, base, _ = served
+    jobs = []
+    for name in ["kubectl", "kube-proxy", "kubelet"]:
+        data = name.encode("ascii") * 1000
+        _publish(directory, name, data, hashlib.sha256(data).hexdigest())
+        jobs.append({"url": f"{base}/{name}", "dest": str(tmp_path / "bin" / name)})
+
+    assert downloader.download_all(jobs) == sorted(job["dest"] for job in jobs)
+    assert downloader.download_all(jobs) == []
+
+
+def test_file_without_published_checksum_is_refused(served, tmp_path):
+    directory, base, _ = served
+    _publish(directory, "helm", b"helm")
+    dest = tmp_path / "bin" / "helm"
+
+    with pytest.raises(ValueError, match="HARDWAY_ALLOW_UNVERIFIED"):
+        downloader.download(f"{base}/helm", str(dest))
+    assert not dest.exists()
+
+
+@pytest.fixture
+def allow_unverified(monkeypatch):
+    monkeypatch.setenv("HARDWAY_ALLOW_UNVERIFIED", "1")
+    yield importlib.reload(downloader)
+    monkeypatch.delenv("HARDWAY_ALLOW_UNVERIFIED")
+    importlib.reload(downloader)
+
+
+def test_file_without_published_checksum_installs_when_allowed(allow_unverified, served, tmp_path):
+    directory, base, _ = served
+    _publish(directory, "helm", b"helm")
+    dest = tmp_path / "bin" / "helm"
+
+    assert allow_unverified.ALLOW_UNVERIFIED is True
+    assert allow_unverified.download(f"{base}/helm", str(dest)) is True
+    assert dest.read_bytes() == b"helm"
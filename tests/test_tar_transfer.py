@@ -0,0 +1,91 @@
+import functools
+import os
+import stat
+import subprocess
+
+import pytest
+
+import tar_transfer
+
+
+# ssh_pool.exec_command 대역: 원격 명령을 로컬 셸에서 실행합니다.
+# 표준 입력을 모두 받은 뒤(shutdown_write) 명령을 실행하고, paramiko 채널처럼 결과를 돌려줍니다.
+class LocalChannel:
+    def __init__(self, command):
+        self.command = command
+        self.input = b""
+        self.result = None
+
+    def shutdown_write(self):
+        self.result = subprocess.run(self.command, shell=True, input=self.input, capture_output=True)
+
+    def recv_exit_status(self):
+        return self.result.returncode
+
+    def close(self):
+        pass
+
+
+class LocalStream:
+    def __init__(self, channel, name=None):
+        self.channel = channel
+        self.name = name
+
+    def write(self, data):
+        self.channel.input += data
+
+    def flush(self):
+        pass
+
+    def read(self):
+        return getattr(self.channel.result, self.name)
+
+
+@pytest.fixture
+def commands(monkeypatch):
+    executed = []
+
+    def exec_command(host, username, password, command, timeout=None):
+        executed.append(command)
+        channel = LocalChannel(command)
+        return LocalStream(channel), LocalStream(channel, "stdout"), LocalStream(channel, "stderr")
+
+    monkeypatch.setattr(tar_transfer.ssh_pool, "exec_command", exec_command)
+    # root 가 아니어도 chown 할 수 있도록 현재 사용자로 압축합니다.
+    monkeypatch.setattr(tar_transfer, "build_archive",
+                        functools.partial(tar_transfer.build_archive, uid=os.getuid(), gid=os.getgid()))
+    return executed
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_sync_skips_unchanged_files(tmp_path, commands):
+    files = [(str(tmp_path / "ssl" / "ca.crt"), b"ca", 0o644), (str(tmp_path / "ssl" / "node.key"), b"key", 0o600)]
+
+    changed, unchanged = tar_transfer.sync("node", "root", "pw", files)
+    assert changed == [path for path, _, _ in files] and unchanged == []
+    assert (tmp_path / "ssl" / "node.key").read_bytes() == b"key"
+    assert _mode(tmp_path / "ssl" / "node.key") == 0o600
+
+    commands.clear()
+    changed, unchanged = tar_transfer.sync("node", "root", "pw", files)
+    assert changed == [] and unchanged == [path for path, _, _ in files]
+    assert commands == [tar_transfer.REMOTE_DIGEST_COMMAND]  # 조회만 하고 전송하지 않음
+
+
+def test_sync_corrects_mode_and_content_changes(tmp_path, commands):
+    files = [(str(tmp_path / "ca.crt"), b"ca", 0o644), (str(tmp_path / "node.key"), b"key", 0o600),
+             (str(tmp_path / "node.crt"), b"crt", 0o644)]
+    tar_transfer.sync("node", "root", "pw", files)
+    os.chmod(tmp_path / "node.key", 0o644)
+    (tmp_path / "node.crt").write_bytes(b"edited")
+
+    changed, unchanged = tar_transfer.sync("node", "root", "pw", files)
+
+    assert sorted(changed) == sorted([str(tmp_path / "node.key"), str(tmp_path / "node.crt")])
+    assert unchanged == [str(tmp_path / "ca.crt")]
+    assert _mode(tmp_path / "node.key") == 0o600
+    assert (tmp_path / "node.crt").read_bytes() == b"crt"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".hardway-tmp")]
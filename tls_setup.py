@@ -1,5 +1,6 @@
 import subprocess
 import time
+import tracing
 
 
 # 로그 작성 함수
@@ -13,12 +14,13 @@ def log_message(message):
 
 # 명령 실행 함수
 def run_command(command):
-    try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        log_message(result.stdout.decode().strip())
-    except subprocess.CalledProcessError as e:
-        log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
-        raise
+    with tracing.span(command, category="command"):
+        try:
+            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            log_message(result.stdout.decode().strip())
+        except subprocess.CalledProcessError as e:
+            log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
+            raise
 
 
 def create_bootstrap_token():
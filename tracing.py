@@ -0,0 +1,114 @@
+import argparse
+import atexit
+import contextlib
+import glob
+import json
+import os
+import socket
+import threading
+import time
+
+# 설정
+# HARDWAY_TRACE_FILE 이 지정된 경우에만 구간(span)을 기록합니다.
+TRACE_FILE = os.environ.get("HARDWAY_TRACE_FILE")
+TRACE_HOST = os.environ.get("HARDWAY_TRACE_HOST") or socket.gethostname()
+MERGED_TRACE_NAME = "trace.json"
+
+_events = []
+_lock = threading.Lock()
+
+
+# 구간 기록
+# host 를 지정하면 해당 호스트의 행(row)에 기록됩니다. 기본값은 현재 호스트입니다.
+@contextlib.contextmanager
+def span(name, category="step", host=None, **args):
+    if not TRACE_FILE:
+        yield
+        return
+
+    started = time.time()
+    status = "ok"
+    try:
+        yield
+    except BaseException as e:
+        status = f"error: {e.__class__.__name__}"
+        raise
+    finally:
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": int(started * 1e6),
+            "dur": int((time.time() - started) * 1e6),
+            "pid": host or TRACE_HOST,
+            "tid": threading.get_native_id(),
+            "args": dict(args, status=status),
+        }
+        with _lock:
+            _events.append(event)
+
+
+# 기록된 구간을 파일로 저장 (프로세스 종료 시 자동 호출)
+def flush():
+    if not TRACE_FILE:
+        return
+    with _lock:
+        events = list(_events)
+    if not events:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(TRACE_FILE)), exist_ok=True)
+    tmp_path = f"{TRACE_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events}, f, ensure_ascii=False)
+    os.replace(tmp_path, TRACE_FILE)
+
+
+atexit.register(flush)
+
+
+# 가장 오래 걸린 구간 표 출력
+def print_summary(events, top=20):
+    slowest = sorted((e for e in events if e.get("ph") == "X"), key=lambda e: e["dur"], reverse=True)[:top]
+    print(f"\n{'duration(s)':>12}  {'host':<16} {'category':<10} name")
+    for event in slowest:
+        name = event["name"] if len(event["name"]) <= 80 else event["name"][:77] + "..."
+        print(f"{event['dur'] / 1e6:>12.2f}  {event['args'].get('host', ''):<16} {event['cat']:<10} {name}")
+
+
+# 호스트별 trace 파일 병합 (Chrome trace-event 형식)
+# chrome://tracing 또는 https://ui.perfetto.dev 에서 열 수 있습니다.
+def merge(trace_dir, top=20):
+    output_path = os.path.join(trace_dir, MERGED_TRACE_NAME)
+    events = []
+    for path in sorted(glob.glob(os.path.join(trace_dir, "*.json"))):
+        if os.path.abspath(path) == os.path.abspath(output_path):
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                events.extend(json.load(f).get("traceEvents", []))
+        except (OSError, ValueError) as e:
+            print(f"\n[LOG]: ⚠️ trace 파일을 읽지 못해 건너뜁니다: {path} ({e})")
+
+    # Chrome trace 는 숫자 pid 를 사용하므로 호스트 이름을 번호로 바꾸고 이름은 메타데이터로 남깁니다.
+    hosts = sorted({str(event["pid"]) for event in events})
+    host_ids = {host: index + 1 for index, host in enumerate(hosts)}
+    for event in events:
+        host = str(event["pid"])
+        event["pid"] = host_ids[host]
+        event.setdefault("args", {})["host"] = host
+    metadata = [{"name": "process_name", "ph": "M", "pid": host_ids[host], "args": {"name": host}}
+                for host in hosts]
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    print(f"\n[LOG]: 📈 trace 병합 완료: {output_path} (구간 {len(events)}개, 호스트 {len(hosts)}대)")
+    print_summary(events, top)
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="trace 파일 병합 및 요약")
+    parser.add_argument("trace_dir")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    merge(args.trace_dir, args.top)
@@ -1,6 +1,11 @@
 import os
 import subprocess
 import time
+import artifact_cache
+import downloader
+import step_state
+import tar_extract
+import tracing
 
 # 설정
 WORKER_NODE = {
@@ -14,10 +19,19 @@ BINARIES = [
     "kube-proxy",
     "kubelet"
 ]
+KUBE_VERSION = "v1.29.7"
+DOWNLOAD_URL = f"https://storage.googleapis.com/kubernetes-release/release/{KUBE_VERSION}/bin/linux/amd64/"
 CNI_PLUGIN_URL = "https://github.com/containernetworking/plugins/releases/download/v1.6.2/cni-plugins-linux-amd64-v1.6.2.tgz"
+# 설치할 CNI 플러그인 (CNI 릴리스 전체가 아니라 이 목록만 압축 파일에서 풀어 설치합니다)
+# Cilium 은 자체 cilium-cni 바이너리를 설치하므로 릴리스에서 꼭 필요한 것은 loopback 뿐입니다.
+# bridge/host-local 은 Cilium 배포 전 기본 브리지 네트워크용, portmap 은 hostPort 체이닝용으로 함께 둡니다.
+# 다른 플러그인이 필요하면 여기에 추가하세요. 단계 지문에 포함되므로 다음 실행에서 설치됩니다.
+CNI_PLUGINS = ["bridge", "host-local", "loopback", "portmap"]
 INSTALL_DIR = "/usr/local/bin"
 KUBE_DIR = "/etc/kubernetes"
 CNI_DIR = "/opt/cni/bin"
+STAGING_DIR = "/tmp"  # 다운로드 파일 위치 (fanout.py 로 미리 배포되어 있으면 다운로드를 건너뜁니다)
+CNI_TARBALL = f"{STAGING_DIR}/cni-plugins.tgz"
 CERTS_DIR = "/etc/kubernetes/ssl"
 SOURCE_CERTS_DIR = "/home/ubuntu/hardway/certs"  # 원본 인증서 디렉토리
 LOG_FILE = "/root/worker01_setup.log"
@@ -33,12 +47,13 @@ def log_message(message):
 
 # 명령 실행 함수
 def run_command(command):
-    try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        log_message(result.stdout.decode().strip())
-    except subprocess.CalledProcessError as e:
-        log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
-        raise
+    with tracing.span(command, category="command"):
+        try:
+            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            log_message(result.stdout.decode().strip())
+        except subprocess.CalledProcessError as e:
+            log_message(f"❌ 명령 실행 실패: {command}\n{e.stderr.decode().strip()}")
+            raise
 
 
 # 디렉토리 확인 및 생성 함수
@@ -85,7 +100,23 @@ def install_docker():
     else:
         run_command(f"apt-get install -y {DOCKER_PACKAGE}")
         log_message("✅ Docker 설치 완료")
+
+
+# swap 비활성화
+# 재부팅하면 swap 이 다시 켜지고 kubelet(failSwapOn)이 시작하지 않으므로, 설치 단계와 별도로 매번 실행합니다.
+def disable_swap():
     run_command("swapoff -a")
+    log_message("✅ swap 비활성화 완료")
+
+
+# 패키지 설치 여부 확인
+def package_installed(package):
+    return subprocess.call(["dpkg", "-s", package], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) == 0
+
+
+# 서비스 동작 여부 확인
+def service_active(service):
+    return subprocess.call(["systemctl", "is-active", "--quiet", service]) == 0
 
 
 # Docker 서비스 설정 함수
@@ -102,31 +133,33 @@ def install_binaries():
     log_message("🔄 Kubernetes 바이너리 설치 중...")
     ensure_directory(INSTALL_DIR)
 
-    for binary in BINARIES:
-        binary_path = os.path.join(INSTALL_DIR, binary)
-        if os.path.exists(binary_path):
-            log_message(f"✅ {binary} 이미 설치되어 있습니다: {binary_path}")
-            continue
-
-        run_command(
-            f"wget -q -P /tmp https://storage.googleapis.com/kubernetes-release/release/v1.29.7/bin/linux/amd64/{binary}")
-        run_command(f"chmod +x /tmp/{binary}")
-        run_command(f"mv /tmp/{binary} {INSTALL_DIR}/")
-        log_message(f"✅ {binary} 설치 완료: {binary_path}")
+    # 모든 바이너리를 동시에 받아 공개된 sha256 으로 확인한 뒤 설치합니다.
+    # 이미 설치된 파일이 공개된 sha256 과 같으면 그대로 두고, 다르면 (예: KUBE_VERSION 변경) 교체합니다.
+    # STAGING_DIR 에 미리 배포된 파일이 있으면 내려받지 않고 그 파일을 사용합니다.
+    jobs = [{"url": artifact_cache.mirror_url(DOWNLOAD_URL + binary), "dest": os.path.join(INSTALL_DIR, binary),
+             "staged": os.path.join(STAGING_DIR, binary)} for binary in BINARIES]
+    with tracing.span(f"download {len(jobs)} binaries", category="command"):
+        installed = downloader.download_all(jobs)
+    for job in jobs:
+        if os.path.exists(job["staged"]):
+            os.remove(job["staged"])
+    log_message(f"✅ 바이너리 {len(installed)}개 설치, {len(jobs) - len(installed)}개 최신 유지")
 
 
 # CNI 플러그인 설치 함수
 def install_cni_plugins():
     log_message("🔄 CNI 플러그인 설치 중...")
     ensure_directory(CNI_DIR)
-    cni_tarball = "/tmp/cni-plugins.tgz"
+    cni_tarball = CNI_TARBALL
 
-    if not os.path.exists(cni_tarball):
-        run_command(f"wget -q -O {cni_tarball} {CNI_PLUGIN_URL}")
-        log_message("✅ CNI 플러그인 다운로드 완료")
+    # 미리 배포된 압축 파일이 있고 sha256 이 맞으면 다시 내려받지 않습니다.
+    with tracing.span("download cni plugins", category="command"):
+        downloader.download(artifact_cache.mirror_url(CNI_PLUGIN_URL), cni_tarball, mode=0o644)
 
-    run_command(f"tar -xzvf {cni_tarball} -C {CNI_DIR}")
-    log_message("✅ CNI 플러그인 설치 완료")
+    # 필요한 플러그인만 CNI_DIR 로 바로 풀고, 같은 파일은 건너뜁니다.
+    with tracing.span("extract cni plugins", category="command"):
+        results = tar_extract.extract(cni_tarball, {plugin: os.path.join(CNI_DIR, plugin) for plugin in CNI_PLUGINS})
+    log_message(f"✅ CNI 플러그인 설치 완료: {tar_extract.summarize(results)}")
 
 
 # kube-proxy 설정 파일 생성 함수
@@ -229,10 +262,17 @@ def start_services():
 # 메인 함수
 def main():
     log_message("=== Worker Node 1 설정 시작 ===")
-    install_docker()
-    setup_docker_service()
-    install_binaries()
-    install_cni_plugins()
+    step_state.run_step("install_docker", {"package": DOCKER_PACKAGE}, install_docker,
+                        postcondition=lambda: package_installed(DOCKER_PACKAGE), log=log_message)
+    disable_swap()
+    step_state.run_step("setup_docker_service", {"package": DOCKER_PACKAGE}, setup_docker_service,
+                        postcondition=lambda: service_active("docker"), log=log_message)
+    step_state.run_step("install_binaries", {"version": KUBE_VERSION, "binaries": BINARIES}, install_binaries,
+                        postcondition=lambda: all(os.path.exists(os.path.join(INSTALL_DIR, b)) for b in BINARIES),
+                        log=log_message)
+    step_state.run_step("install_cni_plugins", {"url": CNI_PLUGIN_URL, "plugins": CNI_PLUGINS}, install_cni_plugins,
+                        postcondition=lambda: all(os.path.exists(os.path.join(CNI_DIR, p)) for p in CNI_PLUGINS),
+                        log=log_message)
     ensure_directory(KUBE_DIR)
     copy_certificates_and_configs()
     create_kube_proxy_config()